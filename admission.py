@@ -0,0 +1,94 @@
+"""
+Admission control: shed low-value updates when the process falls behind.
+
+Three signals describe how far behind the bot is:
+
+- queue wait: time from the webhook request arriving to the update being
+  admitted for its handlers (smoothed);
+- pool wait: time spent waiting for a database connection (smoothed);
+- backlog: updates accepted but not finished yet.
+
+Each is divided by its threshold (ADMISSION_QUEUE_WAIT_MS,
+ADMISSION_POOL_WAIT_MS, ADMISSION_MAX_IN_FLIGHT) and the largest ratio is
+the pressure. At pressure 1 read-only commands (/leaderboard, /status, /help)
+are answered from cached state instead of the database; at pressure 2 they
+are dropped and /start is deferred with a short reply. Answers for runs in
+progress are always admitted, so their latency holds while everything else
+gives way.
+"""
+
+import contextvars
+import time
+from typing import Optional
+
+from app.config import settings
+from app.metrics import ADMISSION_PRESSURE
+
+# Decisions
+ADMIT = "admit"
+DEGRADE = "degrade"  # answer without the database
+SHED = "shed"  # drop
+
+# Read-only commands, the first to give way
+LOW_VALUE_KINDS = ("leaderboard", "status", "help")
+NEW_RUN_KINDS = ("start", "restart")
+PROTECTED_KINDS = ("answer",)
+
+# Weight of each new sample in the smoothed waits
+SMOOTHING = 0.1
+
+received_at: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("update_received_at", default=None)
+
+
+class AdmissionController:
+    def __init__(self):
+        self.queue_wait = 0.0
+        self.pool_wait = 0.0
+        self.in_flight = 0
+
+    def update_started(self):
+        """Called when the webhook accepts an update"""
+        self.in_flight += 1
+        received_at.set(time.perf_counter())
+
+    def update_finished(self):
+        self.in_flight -= 1
+
+    def observe_queue_wait(self, seconds: float):
+        self.queue_wait += SMOOTHING * (seconds - self.queue_wait)
+
+    def observe_pool_wait(self, seconds: float):
+        self.pool_wait += SMOOTHING * (seconds - self.pool_wait)
+
+    def pressure(self) -> float:
+        ratios = [
+            self.queue_wait * 1000 / settings.admission_queue_wait_ms,
+            self.pool_wait * 1000 / settings.admission_pool_wait_ms,
+        ]
+        if settings.admission_max_in_flight:
+            ratios.append(self.in_flight / settings.admission_max_in_flight)
+        return max(ratios)
+
+    def decide(self, kind: str) -> str:
+        """Admit, degrade or shed an update of the given kind, measuring its queue wait"""
+        started = received_at.get()
+        if started is not None:
+            self.observe_queue_wait(time.perf_counter() - started)
+            received_at.set(None)
+
+        if not settings.admission_control_enabled or kind in PROTECTED_KINDS:
+            return ADMIT
+        pressure = self.pressure()
+        if pressure < 1:
+            return ADMIT
+        if kind in NEW_RUN_KINDS:
+            return ADMIT if pressure < 2 else DEGRADE
+        if kind in LOW_VALUE_KINDS:
+            return DEGRADE if pressure < 2 else SHED
+        # Messages no handler answers
+        return SHED
+
+
+# Global admission controller instance
+admission = AdmissionController()
+ADMISSION_PRESSURE.set_function(admission.pressure)
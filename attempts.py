@@ -0,0 +1,28 @@
+"""
+Packed per-gate timings for attempts.
+
+An attempt stores the milliseconds spent on each passed gate as consecutive
+little-endian uint16 values, so a run to gate 80 costs 160 bytes in one row
+rather than 80 rows in ``games``. Times are capped at 65535 ms, well above
+the question timeout.
+"""
+
+import struct
+from typing import Iterable, List, Optional
+
+MAX_GATE_TIME_MS = 0xFFFF
+
+
+def pack_gate_times(times_ms: Iterable[int]) -> bytes:
+    values = [min(max(int(ms), 0), MAX_GATE_TIME_MS) for ms in times_ms]
+    return struct.pack(f"<{len(values)}H", *values)
+
+
+def unpack_gate_times(data: Optional[bytes]) -> List[int]:
+    if not data:
+        return []
+    return list(struct.unpack(f"<{len(data) // 2}H", data))
+
+
+def append_gate_times(data: Optional[bytes], times_ms: Iterable[int]) -> bytes:
+    return bytes(data or b"") + pack_gate_times(times_ms)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the game operations in crud.py.
+
+Builds a dataset of N players (each with one attempt, plus a game row while
+active) in the target database, then times each operation and counts the SQL
+statements it issues.
+Results are emitted as one JSON object per line so runs before and after a
+crud.py change can be diffed or loaded into a notebook.
+
+Usage:
+    python benchmark_crud.py --database-url sqlite:///bench.db --sizes 1000 100000
+    python benchmark_crud.py --database-url postgresql://localhost/gates_bench --sizes 1000000 --reuse
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:BENCHMARK")
+os.environ.setdefault("WEBHOOK_URL", "http://benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite:///benchmark.db")
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.instrumentation import count_statements, instrument_engine
+from app.attempts import pack_gate_times
+from app.models import Base, Player, Game, Attempt, Question, GameState, GameStatus, EliminationReason
+from app.question_cache import question_cache, option_order, to_shown
+from app.seed_questions import SAMPLE_QUESTIONS, generate_additional_questions
+
+FIRST_TELEGRAM_ID = 1_000_000
+CHUNK_SIZE = 10_000
+
+
+def build_dataset(engine, size: int):
+    """Recreate the schema with the seed questions and ``size`` players, each with one attempt"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    now = datetime.utcnow()
+    rng = random.Random(size)
+    with engine.begin() as conn:
+        conn.execute(Question.__table__.insert(), SAMPLE_QUESTIONS + generate_additional_questions())
+        question_ids = {
+            row.gate_number: row.id
+            for row in conn.execute(select(Question.id, Question.gate_number))
+        }
+
+    # Players only reach gates that have a question
+    last_gate = max(question_ids)
+    for offset in range(0, size, CHUNK_SIZE):
+        players = []
+        attempts = []
+        games = []
+        for i in range(offset, min(offset + CHUNK_SIZE, size)):
+            state = rng.choices(
+                [GameState.ACTIVE, GameState.ELIMINATED, GameState.COMPLETED],
+                weights=[20, 79, 1]
+            )[0]
+            gate = last_gate if state == GameState.COMPLETED else rng.randint(1, last_gate)
+            players.append({
+                "id": i + 1,
+                "telegram_id": FIRST_TELEGRAM_ID + i,
+                "username": f"bench{i}",
+                "current_gate": gate,
+                "game_state": state,
+                "elimination_reason": EliminationReason.WRONG_ANSWER if state == GameState.ELIMINATED else None,
+                "start_time": now,
+                "last_activity": now,
+            })
+            passed = gate if state == GameState.COMPLETED else gate - 1
+            attempts.append({
+                "id": i + 1,
+                "player_id": i + 1,
+                "started_at": now,
+                "ended_at": None if state == GameState.ACTIVE else now,
+                "final_gate": gate,
+                "outcome": state,
+                "elimination_reason": EliminationReason.WRONG_ANSWER if state == GameState.ELIMINATED else None,
+                "gate_times": pack_gate_times(rng.randint(500, 20000) for _ in range(passed)),
+            })
+            # Only runs in progress have a games row
+            if state == GameState.ACTIVE:
+                games.append({
+                    "player_id": i + 1,
+                    "attempt_id": i + 1,
+                    "gate_number": gate,
+                    "question_id": question_ids[gate],
+                    "start_time": now,
+                    "timeout_at": now + timedelta(days=1),
+                    "status": GameStatus.ACTIVE,
+                })
+        with engine.begin() as conn:
+            conn.execute(Player.__table__.insert(), players)
+            conn.execute(Attempt.__table__.insert(), attempts)
+            if games:
+                conn.execute(Game.__table__.insert(), games)
+
+
+def dataset_size(engine) -> int:
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        return db.query(func.count(Player.id)).scalar()
+    except Exception:
+        return -1
+    finally:
+        db.close()
+
+
+class CrudBenchmark:
+    def __init__(self, session_factory, size: int, answers: Dict[int, str]):
+        self.session_factory = session_factory
+        self.size = size
+        self.answers = answers
+        self.rng = random.Random(42)
+
+    def random_telegram_id(self) -> int:
+        return FIRST_TELEGRAM_ID + self.rng.randrange(self.size)
+
+    def wrong_answer(self, gate: int) -> str:
+        return next(option for option in "ABCD" if option != self.answers[gate])
+
+    def start_game_answering(self, correct: bool) -> Callable:
+        """Prepare a new run and the button, as shown to it, answering gate 1 right or wrong"""
+        def prepare(db):
+            telegram_id = self.start_game(db)
+            game = crud.get_active_game(db, crud.get_player(db, telegram_id).id)
+            stored = self.answers[1] if correct else self.wrong_answer(1)
+            return telegram_id, to_shown(stored, option_order(game.player_id, game.attempt_id, 1))
+        return prepare
+
+    def run(self, name: str, iterations: int, prepare: Callable, operation: Callable) -> dict:
+        """Time ``operation(db, prepared)`` after an untimed ``prepare(db)``"""
+        timings: List[float] = []
+        statements: List[int] = []
+        for _ in range(iterations):
+            db = self.session_factory()
+            try:
+                prepared = prepare(db)
+                db.expire_all()
+                with count_statements(name) as count:
+                    started = time.perf_counter()
+                    operation(db, prepared)
+                    timings.append(time.perf_counter() - started)
+                statements.append(count.total)
+            finally:
+                db.close()
+
+        timings.sort()
+        return {
+            "operation": name,
+            "iterations": iterations,
+            "mean_ms": round(statistics.mean(timings) * 1000, 3),
+            "p50_ms": round(timings[len(timings) // 2] * 1000, 3),
+            "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 3),
+            "statements_per_op": round(statistics.mean(statements), 2),
+        }
+
+    def start_game(self, db) -> int:
+        telegram_id = self.random_telegram_id()
+        crud.start_new_game(db, telegram_id, None)
+        return telegram_id
+
+    def expire_games(self, db, count: int = 100):
+        """Push the deadline of ``count`` active games into the past"""
+        past = datetime.utcnow() - timedelta(seconds=1)
+        for _ in range(count):
+            crud.start_new_game(db, self.random_telegram_id(), None)
+        ids = [row.id for row in db.query(Game.id).filter(
+            Game.status == GameStatus.ACTIVE
+        ).order_by(Game.id.desc()).limit(count)]
+        db.query(Game).filter(Game.id.in_(ids)).update({Game.timeout_at: past}, synchronize_session=False)
+        db.commit()
+
+    def suite(self, iterations: int) -> List[dict]:
+        no_prepare = lambda db: None
+        return [
+            self.run("start_new_game", iterations, lambda db: self.random_telegram_id(),
+                     lambda db, telegram_id: crud.start_new_game(db, telegram_id, None)),
+            self.run("check_answer_correct", iterations, self.start_game_answering(True),
+                     lambda db, prepared: crud.check_answer(db, *prepared)),
+            self.run("check_answer_wrong", iterations, self.start_game_answering(False),
+                     lambda db, prepared: crud.check_answer(db, *prepared)),
+            self.run("advance_gate", iterations, self.start_game,
+                     lambda db, telegram_id: crud.advance_gate(db, telegram_id)),
+            self.run("eliminate_player", iterations, self.start_game,
+                     lambda db, telegram_id: crud.eliminate_player(db, telegram_id, EliminationReason.WRONG_ANSWER)),
+            self.run("get_leaderboard", iterations, no_prepare,
+                     lambda db, _: crud.get_leaderboard(db, limit=10)),
+            self.run("get_game_stats", max(1, iterations // 10), no_prepare,
+                     lambda db, _: crud.get_game_stats(db)),
+            self.run("expire_timed_out_games", max(1, iterations // 10), self.expire_games,
+                     lambda db, _: crud.expire_timed_out_games(db)),
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crud.py game operations")
+    parser.add_argument("--database-url", action="append", dest="database_urls",
+                        help="database to benchmark (repeatable); defaults to DATABASE_URL")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000], help="players (and games) per dataset")
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per operation")
+    parser.add_argument("--reuse", action="store_true", help="keep an existing dataset of the same size")
+    parser.add_argument("--output", help="append JSON lines to this file instead of stdout")
+    args = parser.parse_args()
+
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for database_url in args.database_urls or [os.environ["DATABASE_URL"]]:
+            engine = create_engine(database_url)
+            instrument_engine(engine)
+            backend = engine.dialect.name
+
+            for size in args.sizes:
+                if not (args.reuse and dataset_size(engine) == size):
+                    started = time.perf_counter()
+                    build_dataset(engine, size)
+                    print(f"Built {size} player dataset on {backend} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+                Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                db = Session()
+                try:
+                    answers = {q.gate_number: q.correct_answer.upper() for q in db.query(Question).all()}
+                    # Question selection reads the cache, so fill it from the database under test
+                    question_cache.load(db)
+                finally:
+                    db.close()
+
+                for result in CrudBenchmark(Session, size, answers).suite(args.iterations):
+                    result.update({
+                        "backend": backend,
+                        "dataset_size": size,
+                        "timestamp": datetime.utcnow().isoformat(),
+                    })
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+            engine.dispose()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Query latency of the game event log, plain table versus monthly partitions.
+
+Fills two copies of ``game_events`` on Postgres with the same N events
+spread over the last M months: one laid out as the plain table, one
+partitioned by month as ``app.partitions`` creates it. Then it times the
+queries the bot and its maintenance jobs run against recent events, and
+reports table and index sizes. Results are JSON lines, like benchmark_crud.
+
+Usage:
+    python benchmark_partitions.py --database-url postgresql://localhost/gates_bench --rows 10000000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:BENCHMARK")
+os.environ.setdefault("WEBHOOK_URL", "http://benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/gates_bench")
+
+from sqlalchemy import Enum, MetaData, create_engine, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.clock import clock
+from app.models import GameEvent
+from app.partitions import create_partitioned_events, ensure_partitions, month_start, partition_name
+
+PLAIN_TABLE = "bench_events_plain"
+PARTITIONED_TABLE = "bench_events_partitioned"
+
+QUERIES = {
+    # Events of one player's current run
+    "player_last_day": (
+        "SELECT * FROM {table} WHERE player_id = :player_id "
+        "AND occurred_at >= now() - interval '1 day' ORDER BY id"
+    ),
+    # Dashboard style window over everyone
+    "count_last_hour": "SELECT count(*) FROM {table} WHERE occurred_at >= now() - interval '1 hour'",
+    # Reconciliation of one player over the current month
+    "player_this_month": (
+        "SELECT count(*) FROM {table} WHERE player_id = :player_id "
+        "AND occurred_at >= date_trunc('month', now())"
+    ),
+    "append_one": (
+        "INSERT INTO {table} (player_id, event_type, gate_number, occurred_at) "
+        "VALUES (:player_id, 'ANSWERED', 1, now())"
+    ),
+}
+
+
+def create_tables(engine, months: int):
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {PLAIN_TABLE}, {PARTITIONED_TABLE} CASCADE"))
+
+        plain = GameEvent.__table__.to_metadata(MetaData(), name=PLAIN_TABLE)
+        for column in plain.columns:
+            if isinstance(column.type, Enum):
+                column.type.create(conn, checkfirst=True)
+        conn.execute(CreateTable(plain))
+        for index in plain.indexes:
+            index.name = index.name.replace(GameEvent.__tablename__, PLAIN_TABLE, 1)
+            conn.execute(CreateIndex(index))
+
+        create_partitioned_events(conn, PARTITIONED_TABLE)
+        current = month_start(clock.now().date())
+        for offset in range(-months, 1):
+            month = month_start(current, offset)
+            conn.execute(text(
+                f"CREATE TABLE {partition_name(PARTITIONED_TABLE, month)} PARTITION OF {PARTITIONED_TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{month_start(month, 1).isoformat()}')"
+            ))
+        ensure_partitions(conn, PARTITIONED_TABLE, 1)
+
+
+def fill(engine, rows: int, players: int, months: int, chunk: int = 1_000_000):
+    """Insert the same generated events into both tables"""
+    for table in (PLAIN_TABLE, PARTITIONED_TABLE):
+        for offset in range(0, rows, chunk):
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"INSERT INTO {table} (player_id, event_type, gate_number, question_id, correct, latency_ms, occurred_at) "
+                    "SELECT (hashint4(n) & 2147483647) % :players + 1, 'ANSWERED', n % 100 + 1, n % 100 + 1, "
+                    "n % 10 <> 0, n % 30000, now() - (((hashint4(n + 1) & 2147483647) % :span) * interval '1 second') "
+                    "FROM generate_series(:first, :last) AS n"
+                ), {
+                    "players": players,
+                    "span": months * 30 * 86400,
+                    "first": offset + 1,
+                    "last": min(offset + chunk, rows),
+                })
+        with engine.begin() as conn:
+            conn.execute(text(f"ANALYZE {table}"))
+
+
+def sizes(engine) -> dict:
+    current = partition_name(PARTITIONED_TABLE, month_start(clock.now().date()))
+    with engine.connect() as conn:
+        result = {}
+        for name in (PLAIN_TABLE, current):
+            result[name] = conn.execute(
+                text("SELECT pg_total_relation_size(to_regclass(:name))"), {"name": name}
+            ).scalar()
+        # A partitioned parent has no storage itself; sum its partitions
+        result[PARTITIONED_TABLE] = conn.execute(text(
+            "SELECT sum(pg_total_relation_size(inhrelid)) FROM pg_inherits "
+            "WHERE inhparent = to_regclass(:name)"
+        ), {"name": PARTITIONED_TABLE}).scalar()
+    return result
+
+
+def time_query(engine, table: str, name: str, iterations: int, players: int) -> dict:
+    rng = random.Random(7)
+    sql = text(QUERIES[name].format(table=table))
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            with conn.begin():
+                result = conn.execute(sql, {"player_id": rng.randint(1, players)})
+                if result.returns_rows:
+                    result.fetchall()
+            timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "query": name,
+        "table": table,
+        "iterations": iterations,
+        "mean_ms": round(statistics.mean(timings) * 1000, 3),
+        "p50_ms": round(timings[len(timings) // 2] * 1000, 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark game_events queries, plain versus partitioned")
+    parser.add_argument("--database-url", default=os.environ["DATABASE_URL"], help="Postgres database")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="events per table")
+    parser.add_argument("--players", type=int, default=500_000)
+    parser.add_argument("--months", type=int, default=12, help="months of history")
+    parser.add_argument("--iterations", type=int, default=200, help="timed runs per query")
+    parser.add_argument("--reuse", action="store_true", help="keep the tables of a previous run")
+    parser.add_argument("--output", help="append JSON lines to this file instead of stdout")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if engine.dialect.name != "postgresql":
+        parser.error("partitioning is only available on Postgres")
+
+    if not args.reuse:
+        started = time.perf_counter()
+        create_tables(engine, args.months)
+        fill(engine, args.rows, args.players, args.months)
+        print(f"Loaded {args.rows} events per table in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    try:
+        common = {"rows": args.rows, "months": args.months, "timestamp": datetime.utcnow().isoformat()}
+        out.write(json.dumps({"sizes_bytes": sizes(engine), **common}) + "\n")
+        for name in QUERIES:
+            for table in (PLAIN_TABLE, PARTITIONED_TABLE):
+                result = time_query(engine, table, name, args.iterations, args.players)
+                out.write(json.dumps({**result, **common}) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Clock used for game deadlines and the timeout checker.
+
+``clock`` reads real UTC time by default. Simulations swap in a
+``SimulatedTimeSource`` whose time only moves when the driver advances it, so
+hours of timeouts can be replayed in seconds and deterministically.
+"""
+
+import asyncio
+import heapq
+import itertools
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from app.config import settings
+
+
+class SystemTimeSource:
+    def now(self) -> datetime:
+        return datetime.utcnow()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+
+class SimulatedTimeSource:
+    """Virtual time; sleepers wake only when the driver advances the clock"""
+
+    def __init__(self, start: Optional[datetime] = None, settle_steps: int = 3):
+        self._now = start or datetime.utcnow()
+        self.settle_steps = settle_steps
+        self._sleepers: List[Tuple[datetime, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    def now(self) -> datetime:
+        return self._now
+
+    async def sleep(self, seconds: float):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (self._now + timedelta(seconds=seconds), next(self._sequence), future))
+        await future
+
+    async def advance(self, seconds: float):
+        """Move time forward, waking sleepers in deadline order"""
+        # Let tasks started since the last step reach their first sleep
+        for _ in range(self.settle_steps):
+            await asyncio.sleep(0)
+        target = self._now + timedelta(seconds=seconds)
+        while self._sleepers and self._sleepers[0][0] <= target:
+            wake_at, _, future = heapq.heappop(self._sleepers)
+            self._now = max(self._now, wake_at)
+            if not future.done():
+                future.set_result(None)
+            # Let the woken task run until it sleeps again
+            for _ in range(self.settle_steps):
+                await asyncio.sleep(0)
+        self._now = target
+
+
+class Clock:
+    def __init__(self):
+        self.source = SystemTimeSource()
+
+    def use(self, source):
+        """Switch the time source, e.g. to a SimulatedTimeSource"""
+        self.source = source
+
+    @property
+    def simulated(self) -> bool:
+        return isinstance(self.source, SimulatedTimeSource)
+
+    def now(self) -> datetime:
+        """Current naive UTC time"""
+        return self.source.now()
+
+    def deadline(self, seconds: float) -> datetime:
+        return self.now() + timedelta(seconds=seconds)
+
+    async def sleep(self, seconds: float):
+        await self.source.sleep(seconds)
+
+
+# Global clock instance
+clock = Clock()
+if settings.clock_mode == "simulated":
+    clock.use(SimulatedTimeSource())
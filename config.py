@@ -1,5 +1,6 @@
+import hashlib
 import os
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseSettings
 
 
@@ -7,20 +8,122 @@ class Settings(BaseSettings):
     # Telegram Bot Configuration
     telegram_bot_token: str
     webhook_url: str
+    telegram_api_base_url: Optional[str] = None
+    # Bot API HTTP client: size the pool against handler concurrency (UPDATE_WORKERS)
+    telegram_connection_pool_size: int = 64
+    telegram_get_updates_pool_size: int = 1
+    telegram_http_version: str = "1.1"  # "1.1" or "2" (needs httpx[http2])
+    telegram_keepalive_seconds: float = 30.0
+    telegram_connect_timeout: float = 5.0
+    telegram_read_timeout: float = 5.0
+    telegram_write_timeout: float = 5.0
+    telegram_pool_timeout: float = 1.0
     
     # Database Configuration
     database_url: str
     
+    # Read replica (optional) for leaderboard, stats and admin reads
+    read_replica_url: Optional[str] = None
+    replica_max_lag_seconds: float = 5.0
+    replica_lag_check_interval: float = 2.0
+    
     # Redis Configuration (optional)
     redis_url: Optional[str] = None
     
+    # Hot Game State (live runs served from memory/Redis, written behind to Postgres)
+    hot_state_backend: Optional[str] = None  # None, "memory" or "redis"
+    hot_state_flush_interval_ms: int = 200
+    hot_state_flush_batch_size: int = 1000
+    
     # Security
     secret_key: str
+    webhook_secret_token: Optional[str] = None
     
     # Game Configuration
     question_timeout: int = 30
+    timeout_check_interval: float = 5.0
+    clock_mode: str = "system"  # "system" or "simulated"
     total_gates: int = 100
     prize_pool_percentage: int = 69
+    # "buttons" (edited message with A-D buttons) or "quiz_poll" (Telegram quiz
+    # polls that close themselves after QUESTION_TIMEOUT seconds)
+    gate_delivery: str = "buttons"
+    
+    # Leader Election (which replica runs timeout checks and maintenance)
+    leader_election: str = "auto"  # "auto", "postgres", "redis" or "none"
+    leader_lease_ttl_seconds: float = 10.0
+    leader_renew_interval_seconds: float = 2.0
+    
+    # Cache Invalidation across replicas
+    invalidation_bus: str = "auto"  # "auto", "postgres", "redis" or "local"
+    
+    # Game Event Log (append-only run history, written in batches)
+    event_log_enabled: bool = False
+    event_log_flush_interval_ms: int = 250
+    event_log_flush_batch_size: int = 5000
+    event_log_max_buffer: int = 50000
+    # Monthly game_events partitions on Postgres; months past retention are
+    # archived to EVENT_ARCHIVE_DIR (kept in place when it is not set)
+    event_partition_months_ahead: int = 2
+    event_retention_months: int = 6
+    event_archive_dir: Optional[str] = None
+    partition_maintenance_interval_hours: float = 6.0
+    
+    # Flood Control: per-user token buckets checked before any handler runs.
+    # Kind of update -> [burst, seconds]; kinds without an entry use "default"
+    rate_limit_backend: str = "memory"  # "memory", "redis" or "none"
+    rate_limits: Dict[str, List[float]] = {
+        "start": [3, 60],
+        "restart": [3, 60],
+        "status": [10, 60],
+        "leaderboard": [10, 60],
+        "help": [5, 60],
+        "answer": [5, 1],
+        "default": [20, 60],
+    }
+    
+    # Load Shedding: read-only commands give way when any signal passes its threshold
+    admission_control_enabled: bool = True
+    admission_queue_wait_ms: float = 250.0
+    admission_pool_wait_ms: float = 100.0
+    admission_max_in_flight: int = 500  # 0 disables the backlog signal
+    
+    # Update Lanes: webhook updates are queued by priority and handled by a
+    # fixed pool of workers; a lane with weight w gets w turns per round
+    update_lanes_enabled: bool = True
+    update_lane_weights: Dict[str, int] = {"answer": 8, "new_game": 2, "read": 1}
+    update_workers: int = 32
+    update_lane_capacity: int = 5000  # queued updates per lane before the webhook answers 503
+    
+    # Graceful Drain: on shutdown stop accepting updates, finish those in
+    # flight, then on the next start extend the deadlines that ran during the
+    # downtime. Keep DRAIN_EXTEND_DEADLINES off when other replicas keep serving
+    drain_timeout_seconds: float = 20.0
+    drain_extend_deadlines: bool = True
+    drain_max_extension_seconds: float = 300.0
+    delete_webhook_on_shutdown: bool = False
+    
+    # Warm Start: done before /ready reports ready
+    warmup_db_connections: int = 5
+    warmup_render_questions: bool = True
+    warmup_telegram_connections: int = 4
+    
+    # Query Instrumentation
+    slow_query_threshold_ms: int = 100
+    n_plus_one_threshold: int = 5
+    sql_statement_budgets: Dict[str, int] = {}
+    sql_strict_budgets: bool = False
+    
+    # Tracing Configuration
+    trace_export_path: Optional[str] = None
+    trace_collector_url: Optional[str] = None
+    trace_sample_rate: float = 0.01
+    trace_slow_threshold_ms: int = 1000
+    
+    # Update Capture (record-and-replay)
+    update_capture_dir: Optional[str] = None
+    update_capture_max_mb: int = 64
+    update_capture_max_files: int = 20
     
     # Admin Configuration
     admin_telegram_ids: List[int] = []
@@ -40,6 +143,16 @@ class Settings(BaseSettings):
         # Handle Railway's DATABASE_URL format
         if self.database_url and self.database_url.startswith('postgres://'):
             self.database_url = self.database_url.replace('postgres://', 'postgresql://', 1)
+        if self.read_replica_url and self.read_replica_url.startswith('postgres://'):
+            self.read_replica_url = self.read_replica_url.replace('postgres://', 'postgresql://', 1)
+    
+    @property
+    def webhook_secret(self) -> str:
+        """Secret token Telegram sends back in the X-Telegram-Bot-Api-Secret-Token header"""
+        if self.webhook_secret_token:
+            return self.webhook_secret_token
+        # Derive a stable token (allowed charset A-Z, a-z, 0-9, _ and -) from the secret key
+        return hashlib.sha256(f"webhook:{self.secret_key}".encode()).hexdigest()
 
 
 # Global settings instance
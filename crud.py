@@ -1,17 +1,23 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, desc
 from typing import List, Optional
-from datetime import datetime, timedelta
-from app.models import Player, Question, Game, GameState, EliminationReason, GameStatus
+from app.models import Player, Question, Game, Attempt, GameState, EliminationReason, GameStatus, GameEventType
 from app.schemas import PlayerCreate, QuestionCreate
 from app.config import settings
+from app.clock import clock
+from app.instrumentation import crud_operation
+from app.game_events import record_event, elapsed_ms
+from app.attempts import append_gate_times
+from app.question_cache import question_cache, option_order, to_original
 
 
 # Player CRUD operations
+@crud_operation
 def get_player(db: Session, telegram_id: int) -> Optional[Player]:
     return db.query(Player).filter(Player.telegram_id == telegram_id).first()
 
 
+@crud_operation
 def create_player(db: Session, player: PlayerCreate) -> Player:
     db_player = Player(**player.dict())
     db.add(db_player)
@@ -20,6 +26,7 @@ def create_player(db: Session, player: PlayerCreate) -> Player:
     return db_player
 
 
+@crud_operation
 def update_player(db: Session, telegram_id: int, **kwargs) -> Optional[Player]:
     player = get_player(db, telegram_id)
     if player:
@@ -30,19 +37,23 @@ def update_player(db: Session, telegram_id: int, **kwargs) -> Optional[Player]:
     return player
 
 
+@crud_operation
 def get_active_players(db: Session) -> List[Player]:
     return db.query(Player).filter(Player.game_state == GameState.ACTIVE).all()
 
 
+@crud_operation
 def get_leaderboard(db: Session, limit: int = 10) -> List[Player]:
     return db.query(Player).order_by(desc(Player.current_gate)).limit(limit).all()
 
 
-# Question CRUD operations
-def get_question(db: Session, gate_number: int) -> Optional[Question]:
-    return db.query(Question).filter(Question.gate_number == gate_number).first()
+@crud_operation
+def count_active_players(db: Session) -> int:
+    return db.query(Player).filter(Player.game_state == GameState.ACTIVE).count()
 
 
+# Question CRUD operations
+@crud_operation
 def create_question(db: Session, question: QuestionCreate) -> Question:
     db_question = Question(**question.dict())
     db.add(db_question)
@@ -51,17 +62,22 @@ def create_question(db: Session, question: QuestionCreate) -> Question:
     return db_question
 
 
+@crud_operation
 def get_all_questions(db: Session) -> List[Question]:
-    return db.query(Question).order_by(Question.gate_number).all()
+    return db.query(Question).order_by(Question.gate_number, Question.id).all()
 
 
 # Game CRUD operations
-def create_game(db: Session, player_id: int, gate_number: int, question_id: int) -> Game:
-    timeout_at = datetime.utcnow() + timedelta(seconds=settings.question_timeout)
+@crud_operation
+def create_game(db: Session, player_id: int, gate_number: int, question_id: int,
+                attempt: Optional[Attempt] = None) -> Game:
+    timeout_at = clock.deadline(settings.question_timeout)
     db_game = Game(
         player_id=player_id,
+        attempt=attempt,
         gate_number=gate_number,
         question_id=question_id,
+        start_time=clock.now(),
         timeout_at=timeout_at
     )
     db.add(db_game)
@@ -70,6 +86,7 @@ def create_game(db: Session, player_id: int, gate_number: int, question_id: int)
     return db_game
 
 
+@crud_operation
 def get_active_game(db: Session, player_id: int) -> Optional[Game]:
     return db.query(Game).filter(
         Game.player_id == player_id,
@@ -77,6 +94,7 @@ def get_active_game(db: Session, player_id: int) -> Optional[Game]:
     ).first()
 
 
+@crud_operation
 def update_game_status(db: Session, game_id: int, status: GameStatus) -> Optional[Game]:
     game = db.query(Game).filter(Game.id == game_id).first()
     if game:
@@ -86,14 +104,62 @@ def update_game_status(db: Session, game_id: int, status: GameStatus) -> Optiona
     return game
 
 
+@crud_operation
+def count_active_games(db: Session) -> int:
+    return db.query(Game).filter(Game.status == GameStatus.ACTIVE).count()
+
+
+@crud_operation
 def get_expired_games(db: Session) -> List[Game]:
-    return db.query(Game).filter(
+    # Expiring a run touches its player and attempt; load them in the same query
+    return db.query(Game).options(
+        joinedload(Game.player), joinedload(Game.attempt)
+    ).filter(
         Game.status == GameStatus.ACTIVE,
-        Game.timeout_at < datetime.utcnow()
+        Game.timeout_at < clock.now()
     ).all()
 
 
+@crud_operation
+def finish_run(db: Session, player: Player, game: Optional[Game], outcome: Optional[GameState] = None):
+    """Record the run's end on its attempt and drop its in-flight game row"""
+    if game is None:
+        return
+    attempt = game.attempt
+    if attempt:
+        attempt.final_gate = player.current_gate
+        attempt.outcome = outcome or player.game_state
+        attempt.elimination_reason = player.elimination_reason
+        attempt.ended_at = clock.now()
+    db.delete(game)
+
+
+@crud_operation
+def get_attempts(db: Session, player_id: int, limit: int = 10) -> List[Attempt]:
+    return db.query(Attempt).filter(
+        Attempt.player_id == player_id
+    ).order_by(desc(Attempt.id)).limit(limit).all()
+
+
+@crud_operation
+def expire_timed_out_games(db: Session) -> List[Player]:
+    """End every run past its deadline and eliminate its player"""
+    eliminated = []
+    for game in get_expired_games(db):
+        player = game.player
+        if player and player.game_state == GameState.ACTIVE:
+            player.game_state = GameState.ELIMINATED
+            player.elimination_reason = EliminationReason.TIMEOUT
+            eliminated.append(player)
+            record_event(player.id, GameEventType.ELIMINATED, game.gate_number,
+                         question_id=game.question_id, elimination_reason=EliminationReason.TIMEOUT)
+        finish_run(db, player, game, outcome=GameState.ELIMINATED)
+    db.commit()
+    return eliminated
+
+
 # Game logic operations
+@crud_operation
 def start_new_game(db: Session, telegram_id: int, username: str = None) -> Player:
     """Start a new game for a player"""
     player = get_player(db, telegram_id)
@@ -102,33 +168,48 @@ def start_new_game(db: Session, telegram_id: int, username: str = None) -> Playe
         # Create new player
         player = create_player(db, PlayerCreate(telegram_id=telegram_id, username=username))
     else:
+        # Close the run still in progress, which frees the player's games row
+        finish_run(db, player, get_active_game(db, player.id), outcome=GameState.ELIMINATED)
+        
         # Reset existing player
         player.current_gate = 1
         player.game_state = GameState.ACTIVE
         player.elimination_reason = None
-        player.start_time = datetime.utcnow()
+        player.start_time = clock.now()
         player.completed_at = None
         db.commit()
         db.refresh(player)
     
     # Create first game session
-    question = get_question(db, 1)
+    attempt = Attempt(player_id=player.id, started_at=clock.now())
+    db.add(attempt)
+    # The attempt id seeds which question of each gate's pool this run gets
+    db.flush()
+    question = question_cache.select(1, player.id, attempt.id)
     if question:
-        create_game(db, player.id, 1, question.id)
+        create_game(db, player.id, 1, question.id, attempt=attempt)
+    else:
+        db.commit()
+    record_event(player.id, GameEventType.STARTED, 1, question_id=question.id if question else None)
     
     return player
 
 
-def advance_gate(db: Session, telegram_id: int) -> Optional[Player]:
-    """Advance player to next gate"""
+@crud_operation
+def advance_gate(db: Session, telegram_id: int, active_game: Optional[Game] = None) -> Optional[Player]:
+    """Advance player to next gate, moving the in-flight game row along"""
     player = get_player(db, telegram_id)
     if not player or player.game_state != GameState.ACTIVE:
         return None
     
+    game = active_game or get_active_game(db, player.id)
+    
     # Check if player completed the game
     if player.current_gate >= settings.total_gates:
         player.game_state = GameState.COMPLETED
-        player.completed_at = datetime.utcnow()
+        player.completed_at = clock.now()
+        finish_run(db, player, game)
+        record_event(player.id, GameEventType.COMPLETED, player.current_gate)
         db.commit()
         db.refresh(player)
         return player
@@ -136,16 +217,24 @@ def advance_gate(db: Session, telegram_id: int) -> Optional[Player]:
     # Advance to next gate
     player.current_gate += 1
     
-    # Create new game session for next gate
-    question = get_question(db, player.current_gate)
-    if question:
+    # Move the game session on to the next gate
+    question = question_cache.select(player.current_gate, player.id, game.attempt_id if game else None)
+    if question and game:
+        game.gate_number = player.current_gate
+        game.question_id = question.id
+        game.start_time = clock.now()
+        game.timeout_at = clock.deadline(settings.question_timeout)
+    elif question:
         create_game(db, player.id, player.current_gate, question.id)
+    record_event(player.id, GameEventType.ADVANCED, player.current_gate,
+                 question_id=question.id if question else None)
     
     db.commit()
     db.refresh(player)
     return player
 
 
+@crud_operation
 def eliminate_player(db: Session, telegram_id: int, reason: EliminationReason) -> Optional[Player]:
     """Eliminate player from the game"""
     player = get_player(db, telegram_id)
@@ -154,35 +243,42 @@ def eliminate_player(db: Session, telegram_id: int, reason: EliminationReason) -
     
     player.game_state = GameState.ELIMINATED
     player.elimination_reason = reason
+    record_event(player.id, GameEventType.ELIMINATED, player.current_gate, elimination_reason=reason)
     
-    # Mark current game as failed
-    active_game = get_active_game(db, player.id)
-    if active_game:
-        update_game_status(db, active_game.id, GameStatus.FAILED)
+    # End the run at the current gate
+    finish_run(db, player, get_active_game(db, player.id))
     
     db.commit()
     db.refresh(player)
     return player
 
 
+@crud_operation
 def check_answer(db: Session, telegram_id: int, answer: str) -> bool:
-    """Check if player's answer is correct"""
+    """Check if player's answer is correct; ``answer`` is the letter of the button as shown"""
     player = get_player(db, telegram_id)
     if not player or player.game_state != GameState.ACTIVE:
         return False
     
     active_game = get_active_game(db, player.id)
-    if not active_game or active_game.timeout_at < datetime.utcnow():
+    if not active_game or active_game.timeout_at < clock.now():
         return False
     
     question = active_game.question
-    is_correct = question.correct_answer.upper() == answer.upper()
+    # Options were shown shuffled for this run; map the button back to the stored option
+    answer = to_original(answer, option_order(player.id, active_game.attempt_id, active_game.gate_number))
+    is_correct = question.correct_answer.upper() == answer
+    latency_ms = elapsed_ms(active_game.start_time)
+    record_event(player.id, GameEventType.ANSWERED, active_game.gate_number,
+                 question_id=question.id, answer=answer[:1], correct=is_correct,
+                 latency_ms=latency_ms)
     
     if is_correct:
-        # Mark current game as completed
-        update_game_status(db, active_game.id, GameStatus.COMPLETED)
-        # Advance to next gate
-        advance_gate(db, telegram_id)
+        # Record the gate time on the attempt and advance to next gate
+        attempt = active_game.attempt
+        if attempt:
+            attempt.gate_times = append_gate_times(attempt.gate_times, [latency_ms or 0])
+        advance_gate(db, telegram_id, active_game)
     else:
         # Eliminate player
         eliminate_player(db, telegram_id, EliminationReason.WRONG_ANSWER)
@@ -190,6 +286,7 @@ def check_answer(db: Session, telegram_id: int, answer: str) -> bool:
     return is_correct
 
 
+@crud_operation
 def get_game_stats(db: Session) -> dict:
     """Get game statistics"""
     total_players = db.query(Player).count()
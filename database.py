@@ -1,9 +1,62 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
+from app.admission import admission
 from app.config import settings
+from app.instrumentation import instrument_engine
+from app.metrics import DB_POOL_WAIT, READ_ROUTING, REPLICA_LAG
+
+logger = logging.getLogger(__name__)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool measuring how long checkouts wait for a free connection, a load shedding signal
+
+    Opening a new connection when the pool has room is not waiting for one,
+    so its time is left out.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Seconds the current thread's checkout spent opening connections
+        self._opening = threading.local()
+
+    def _create_connection(self):
+        started = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            self._opening.seconds = getattr(self._opening, "seconds", 0.0) + time.perf_counter() - started
+
+    def connect(self):
+        self._opening.seconds = 0.0
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            waited = max(time.perf_counter() - started - self._opening.seconds, 0.0)
+            DB_POOL_WAIT.observe(waited)
+            admission.observe_pool_wait(waited)
+
 
 # Create database engine
-engine = create_engine(settings.database_url)
+if make_url(settings.database_url).get_backend_name() == "sqlite":
+    engine = create_engine(settings.database_url)
+else:
+    engine = create_engine(settings.database_url, poolclass=TimedQueuePool)
+instrument_engine(engine)
+
+# Optional read-only replica for leaderboard, stats and admin reads
+replica_engine = create_engine(settings.read_replica_url) if settings.read_replica_url else None
+if replica_engine is not None:
+    instrument_engine(replica_engine)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -12,10 +65,88 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+class ReplicaMonitor:
+    """Tracks how far the replica lags behind the primary"""
+
+    def __init__(self):
+        # None until measured, or while the replica is unreachable
+        self.lag_seconds: Optional[float] = None
+
+    def fresh(self, max_lag: float) -> bool:
+        return self.lag_seconds is not None and self.lag_seconds <= max_lag
+
+    def measure(self) -> float:
+        with engine.connect() as conn:
+            primary_lsn = conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar()
+        with replica_engine.connect() as conn:
+            in_recovery, caught_up, replay_age = conn.execute(text(
+                "SELECT pg_is_in_recovery(), "
+                "pg_wal_lsn_diff(CAST(:primary_lsn AS pg_lsn), pg_last_wal_replay_lsn()) <= 0, "
+                "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+            ), {"primary_lsn": primary_lsn}).one()
+        if not in_recovery or caught_up:
+            return 0.0
+        # Behind the primary: age of the last replayed transaction bounds the lag
+        return float(replay_age or 0.0)
+
+    async def run(self):
+        """Background task refreshing the lag every check interval"""
+        while True:
+            try:
+                self.lag_seconds = await asyncio.to_thread(self.measure)
+                REPLICA_LAG.set(self.lag_seconds)
+            except Exception as e:
+                if self.lag_seconds is not None:
+                    logger.warning(f"Read replica unavailable, reading from the primary: {e}")
+                self.lag_seconds = None
+                REPLICA_LAG.set(-1)
+            await asyncio.sleep(settings.replica_lag_check_interval)
+
+
+replica_monitor = ReplicaMonitor()
+
+
+class RoutingSession(Session):
+    """Session reading from the replica while it is within the staleness tolerance
+
+    Sessions that flush changes always use the primary, so a read session
+    that ends up writing stays correct.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if replica_engine is None or self._flushing:
+            return engine
+        if replica_monitor.fresh(self.info.get("max_lag", settings.replica_max_lag_seconds)):
+            READ_ROUTING.inc(target="replica")
+            return replica_engine
+        READ_ROUTING.inc(target="primary")
+        return engine
+
+
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+
+
 def get_db():
     """Dependency to get database session"""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+
+def read_session(max_lag: Optional[float] = None) -> RoutingSession:
+    """Session for reads that tolerate ``max_lag`` seconds of replica lag (default REPLICA_MAX_LAG_SECONDS)"""
+    db = ReadSessionLocal()
+    if max_lag is not None:
+        db.info["max_lag"] = max_lag
+    return db
+
+
+def get_read_db():
+    """Dependency to get a session for reads that tolerate replica lag"""
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
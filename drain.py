@@ -0,0 +1,175 @@
+"""
+Graceful drain on shutdown, and resuming fairly after a deploy.
+
+On shutdown the process:
+
+1. stops accepting updates: the webhook answers 503, so Telegram keeps them
+   and redelivers them to the next process;
+2. stops the timeout checker, so nobody is timed out while nothing can
+   answer;
+3. lets updates already accepted (queued in lanes or being handled) finish,
+   for up to DRAIN_TIMEOUT_SECONDS;
+4. flushes the hot state and event log, which persists every pending
+   deadline;
+5. writes a drain marker to ``runtime_state`` with the time it stopped
+   accepting.
+
+On the next start, before live runs are loaded and the timeout checker
+starts, ``resume`` takes the marker. The downtime is the time from the drain
+starting to now. Every run whose deadline was still open at that point has
+its deadline and gate start pushed back by the downtime, capped at
+DRAIN_MAX_EXTENSION_SECONDS, so it keeps the time it had left. Runs timed out
+after the drain started anyway (an answer handled past its deadline while
+draining, or another replica's timeout checker) are counted and logged as
+deploy-induced eliminations.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import bindparam
+
+from app.admission import admission
+from app.clock import clock
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import DEPLOY_DEADLINE_EXTENSIONS, DEPLOY_ELIMINATIONS, DRAIN_ABANDONED_UPDATES
+from app.models import Attempt, EliminationReason, Game, GameState, GameStatus, RuntimeState
+
+logger = logging.getLogger(__name__)
+
+DRAIN_KEY = "drain"
+
+
+class ResumeReport:
+    def __init__(self, drained_at: datetime, downtime: float, extension: float,
+                 extended: int = 0, eliminated: int = 0):
+        self.drained_at = drained_at
+        self.downtime = downtime
+        # Seconds deadlines were pushed back by; the downtime up to the cap, or 0 when disabled
+        self.extension = extension
+        self.extended = extended
+        self.eliminated = eliminated
+
+    def to_dict(self) -> dict:
+        return {
+            "drained_at": self.drained_at.isoformat(),
+            "downtime_seconds": round(self.downtime, 3),
+            "extension_seconds": round(self.extension, 3),
+            "deadlines_extended": self.extended,
+            "deploy_eliminations": self.eliminated,
+        }
+
+
+class Drain:
+    def __init__(self):
+        self.started_at: Optional[datetime] = None
+        self.last_resume: Optional[ResumeReport] = None
+
+    @property
+    def draining(self) -> bool:
+        return self.started_at is not None
+
+    def begin(self):
+        """Stop accepting updates"""
+        if self.started_at is None:
+            self.started_at = clock.now()
+            logger.info("Draining: no longer accepting updates")
+
+    async def wait_idle(self, timeout: Optional[float] = None) -> int:
+        """Wait for accepted updates to finish; returns how many were still unfinished at the deadline"""
+        timeout = settings.drain_timeout_seconds if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while admission.in_flight > 0 and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        abandoned = max(admission.in_flight, 0)
+        if abandoned:
+            DRAIN_ABANDONED_UPDATES.inc(abandoned)
+            logger.warning(f"Drain deadline passed with {abandoned} updates unfinished")
+        return abandoned
+
+    def save(self, abandoned: int = 0):
+        """Leave the drain marker for the next process; call after flushing the hot state"""
+        db = SessionLocal()
+        try:
+            pending = db.query(Game).filter(Game.status == GameStatus.ACTIVE).count()
+            db.merge(RuntimeState(
+                key=DRAIN_KEY,
+                value=json.dumps({
+                    "drained_at": (self.started_at or clock.now()).isoformat(),
+                    "pending_timeouts": pending,
+                    "abandoned_updates": abandoned,
+                }),
+                updated_at=clock.now(),
+            ))
+            db.commit()
+            logger.info(f"Drain marker saved with {pending} pending timeouts")
+        finally:
+            db.close()
+
+    def resume(self) -> Optional[ResumeReport]:
+        """Take the drain marker and shift open deadlines by the downtime; None without a marker"""
+        db = SessionLocal()
+        try:
+            # Locked and deleted in the same transaction, so replicas starting together apply it once
+            marker = db.query(RuntimeState).filter(RuntimeState.key == DRAIN_KEY).with_for_update().first()
+            if marker is None:
+                return None
+            state = json.loads(marker.value)
+            drained_at = datetime.fromisoformat(state["drained_at"])
+            downtime = max((clock.now() - drained_at).total_seconds(), 0.0)
+            extension = min(downtime, settings.drain_max_extension_seconds) if settings.drain_extend_deadlines else 0.0
+            report = ResumeReport(drained_at, downtime, extension)
+
+            if extension > 0:
+                shift = timedelta(seconds=extension)
+                games = Game.__table__
+                rows = [
+                    {"b_id": game_id, "b_start": start_time + shift if start_time else None, "b_timeout": timeout_at + shift}
+                    for game_id, start_time, timeout_at in db.query(Game.id, Game.start_time, Game.timeout_at).filter(
+                        Game.status == GameStatus.ACTIVE,
+                        Game.timeout_at > drained_at
+                    )
+                ]
+                if rows:
+                    db.execute(
+                        games.update().where(games.c.id == bindparam("b_id")).values(
+                            start_time=bindparam("b_start"),
+                            timeout_at=bindparam("b_timeout"),
+                        ),
+                        rows
+                    )
+                report.extended = len(rows)
+
+            report.eliminated = db.query(Attempt).filter(
+                Attempt.outcome == GameState.ELIMINATED,
+                Attempt.elimination_reason == EliminationReason.TIMEOUT,
+                Attempt.ended_at >= drained_at
+            ).count()
+
+            db.delete(marker)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        DEPLOY_DEADLINE_EXTENSIONS.inc(report.extended)
+        DEPLOY_ELIMINATIONS.inc(report.eliminated)
+        logger.info(
+            f"Resumed after {report.downtime:.1f}s of downtime: {report.extended} deadlines "
+            f"pushed back by {report.extension:.1f}s"
+        )
+        if report.eliminated:
+            logger.warning(f"{report.eliminated} players were timed out during the deploy")
+        self.last_resume = report
+        return report
+
+
+# Global drain instance
+drain = Drain()
@@ -0,0 +1,129 @@
+"""
+Local stand-in for the Telegram Bot API used by the load-testing harness.
+
+Point the bot at it with TELEGRAM_API_BASE_URL=http://127.0.0.1:<port>/bot.
+Every call is recorded with its arrival time and the latency the server
+imposed, and callers can wait for the next call addressed to a chat. Quiz
+polls get ids, so a harness can answer them with ``poll_answer`` updates.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+FAKE_BOT_USER = {"id": 1, "is_bot": True, "first_name": "100 Gates", "username": "gates_load_bot"}
+
+
+class RecordedCall:
+    __slots__ = ("method", "chat_id", "params", "result", "received_at", "latency")
+
+    def __init__(self, method: str, chat_id: Optional[int], params: dict, result, received_at: float, latency: float):
+        self.method = method
+        self.chat_id = chat_id
+        self.params = params
+        self.result = result
+        self.received_at = received_at
+        self.latency = latency
+
+
+class FakeBotApi:
+    """Records Bot API calls and answers them with minimal valid payloads"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.calls_by_method: Counter = Counter()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self._chat_queues: Dict[int, asyncio.Queue] = defaultdict(asyncio.Queue)
+        self._message_ids = itertools.count(1)
+        self._poll_ids = itertools.count(1)
+        self.app = FastAPI(title="Fake Telegram Bot API")
+        self.app.add_api_route("/bot{token}/{method}", self.handle, methods=["GET", "POST"])
+
+    async def wait_for_chat(self, chat_id: int, timeout: float) -> RecordedCall:
+        """Wait for the next message sent to or edited in a chat"""
+        return await asyncio.wait_for(self._chat_queues[chat_id].get(), timeout)
+
+    @staticmethod
+    async def _parse_params(request: Request) -> dict:
+        body = await request.body()
+        if not body:
+            return {}
+        if request.headers.get("content-type", "").startswith("application/json"):
+            return json.loads(body)
+        return {key: values[-1] for key, values in parse_qs(body.decode()).items()}
+
+    def _message(self, chat_id: Optional[int], text: str) -> dict:
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id or 0, "type": "private"},
+            "from": FAKE_BOT_USER,
+            "text": text,
+        }
+
+    def _poll_message(self, chat_id: Optional[int], params: dict) -> dict:
+        options = params.get("options", [])
+        if isinstance(options, str):
+            options = json.loads(options)
+        message = self._message(chat_id, "")
+        del message["text"]
+        message["poll"] = {
+            "id": str(next(self._poll_ids)),
+            "question": params.get("question", ""),
+            "options": [
+                {"text": option["text"] if isinstance(option, dict) else option, "voter_count": 0}
+                for option in options
+            ],
+            "total_voter_count": 0,
+            "is_closed": False,
+            "is_anonymous": str(params.get("is_anonymous", True)).lower() == "true",
+            "type": params.get("type", "regular"),
+            "allows_multiple_answers": False,
+            "correct_option_id": int(params["correct_option_id"]) if "correct_option_id" in params else None,
+            "open_period": int(params["open_period"]) if "open_period" in params else None,
+        }
+        return message
+
+    async def handle(self, token: str, method: str, request: Request):
+        received_at = time.perf_counter()
+        params = await self._parse_params(request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        chat_id = params.get("chat_id")
+        chat_id = int(chat_id) if chat_id is not None else None
+        text = params.get("text", "")
+
+        if method == "getMe":
+            result = FAKE_BOT_USER
+        elif method in ("sendMessage", "editMessageText"):
+            result = self._message(chat_id, text)
+        elif method == "sendPoll":
+            result = self._poll_message(chat_id, params)
+        else:
+            result = True
+
+        latency = time.perf_counter() - received_at
+        call = RecordedCall(method, chat_id, params, result, received_at, latency)
+        self.calls_by_method[method] += 1
+        self.latencies[method].append(latency)
+        if chat_id is not None:
+            self._chat_queues[chat_id].put_nowait(call)
+
+        return JSONResponse({"ok": True, "result": result})
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8081) -> uvicorn.Server:
+        """Start serving in the current event loop and return the server handle"""
+        server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        return server
@@ -0,0 +1,260 @@
+"""
+Append-only log of game events.
+
+Game logic appends events (started, answered, advanced, eliminated,
+completed) to an in-memory buffer and a background task writes the buffer to
+``game_events`` every EVENT_LOG_FLUSH_INTERVAL_MS: with COPY on Postgres and
+a single multi-row INSERT elsewhere. The buffer is bounded; once it holds
+EVENT_LOG_MAX_BUFFER events, handlers wait in ``wait_for_capacity`` until the
+flusher has caught up instead of letting memory grow.
+
+The log is the history of every run, so ``games`` only needs the in-flight
+row. ``derive_runs`` folds the log back into per-player run state, which is
+what ``players`` must agree with; run this module to check (or repair) it:
+
+    python -m app.game_events [--repair]
+"""
+
+import argparse
+import asyncio
+import csv
+import enum
+import io
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Deque, Dict, Iterable, List, Optional
+
+from app.clock import clock
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.metrics import EVENT_LOG_BACKPRESSURE, EVENT_LOG_BUFFERED, EVENT_LOG_WRITTEN
+from app.models import EliminationReason, GameEvent, GameEventType, GameState, Player
+
+logger = logging.getLogger(__name__)
+
+EVENT_COLUMNS = (
+    "player_id", "event_type", "gate_number", "question_id", "answer",
+    "correct", "latency_ms", "elimination_reason", "occurred_at",
+)
+
+
+def elapsed_ms(since: Optional[datetime]) -> Optional[int]:
+    """Milliseconds from ``since`` (naive UTC or aware) to now"""
+    if since is None:
+        return None
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return max(int((clock.now() - since).total_seconds() * 1000), 0)
+
+
+def _copy_value(value):
+    # Postgres enum types created by SQLAlchemy hold the member names
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+
+def write_events(events: List[dict]):
+    """Append a batch of events in one transaction"""
+    with engine.begin() as conn:
+        if conn.dialect.name != "postgresql":
+            conn.execute(GameEvent.__table__.insert(), events)
+            return
+
+        copy_sql = f"COPY game_events ({', '.join(EVENT_COLUMNS)}) FROM STDIN"
+        cursor = conn.connection.cursor()
+        try:
+            if hasattr(cursor, "copy"):
+                # psycopg 3
+                with cursor.copy(copy_sql) as copy:
+                    for event in events:
+                        copy.write_row([_copy_value(event[column]) for column in EVENT_COLUMNS])
+            else:
+                # psycopg2
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for event in events:
+                    writer.writerow([_copy_value(event[column]) for column in EVENT_COLUMNS])
+                buffer.seek(0)
+                cursor.copy_expert(f"{copy_sql} WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+
+class EventLog:
+    def __init__(self, max_buffer: int, batch_size: int):
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self._buffer: Deque[dict] = deque()
+        self._lock = threading.Lock()
+        self._drained = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def append(
+        self,
+        player_id: int,
+        event_type: GameEventType,
+        gate_number: int,
+        question_id: Optional[int] = None,
+        answer: Optional[str] = None,
+        correct: Optional[bool] = None,
+        latency_ms: Optional[int] = None,
+        elimination_reason: Optional[EliminationReason] = None,
+    ):
+        """Buffer an event; never blocks, capacity is enforced by ``wait_for_capacity``"""
+        event = {
+            "player_id": player_id,
+            "event_type": event_type,
+            "gate_number": gate_number,
+            "question_id": question_id,
+            "answer": answer,
+            "correct": correct,
+            "latency_ms": latency_ms,
+            "elimination_reason": elimination_reason,
+            "occurred_at": clock.now(),
+        }
+        with self._lock:
+            self._buffer.append(event)
+
+    async def wait_for_capacity(self):
+        """Backpressure: wait while the buffer is full"""
+        if len(self._buffer) < self.max_buffer:
+            return
+        started = time.perf_counter()
+        while len(self._buffer) >= self.max_buffer:
+            self._drained.clear()
+            await self._drained.wait()
+        EVENT_LOG_BACKPRESSURE.observe(time.perf_counter() - started)
+
+    def _take(self, limit: int) -> List[dict]:
+        with self._lock:
+            return [self._buffer.popleft() for _ in range(min(limit, len(self._buffer)))]
+
+    def _requeue(self, batch: List[dict]):
+        with self._lock:
+            self._buffer.extendleft(reversed(batch))
+
+    async def flush(self) -> int:
+        """Write up to one batch of buffered events; returns events written"""
+        batch = self._take(self.batch_size)
+        if not batch:
+            return 0
+        try:
+            await asyncio.to_thread(write_events, batch)
+        except Exception:
+            # Keep them in order for the next attempt
+            self._requeue(batch)
+            raise
+        EVENT_LOG_WRITTEN.inc(len(batch))
+        self._drained.set()
+        return len(batch)
+
+    async def run_flusher(self):
+        """Background task writing the buffer every flush interval"""
+        interval = settings.event_log_flush_interval_ms / 1000
+        while True:
+            try:
+                while await self.flush() >= self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Error writing game events: {e}")
+            await asyncio.sleep(interval)
+
+
+# Global event log instance
+event_log = EventLog(settings.event_log_max_buffer, settings.event_log_flush_batch_size)
+EVENT_LOG_BUFFERED.set_function(lambda: len(event_log))
+
+
+def record_event(player_id: int, event_type: GameEventType, gate_number: int, **fields):
+    """Append an event when the event log is enabled"""
+    if settings.event_log_enabled:
+        event_log.append(player_id, event_type, gate_number, **fields)
+
+
+async def wait_for_capacity():
+    if settings.event_log_enabled:
+        await event_log.wait_for_capacity()
+
+
+@dataclass
+class DerivedRun:
+    player_id: int
+    gate: int
+    state: GameState
+    elimination_reason: Optional[EliminationReason]
+    started_at: datetime
+    completed_at: Optional[datetime] = None
+
+
+def derive_runs(events: Iterable[GameEvent]) -> Dict[int, DerivedRun]:
+    """Fold events (in id order) into each player's latest run"""
+    runs: Dict[int, DerivedRun] = {}
+    for event in events:
+        if event.event_type == GameEventType.STARTED:
+            runs[event.player_id] = DerivedRun(
+                event.player_id, event.gate_number, GameState.ACTIVE, None, event.occurred_at
+            )
+            continue
+
+        run = runs.get(event.player_id)
+        if run is None:
+            # Run started before the log was enabled
+            continue
+        if event.event_type == GameEventType.ADVANCED:
+            run.gate = event.gate_number
+        elif event.event_type == GameEventType.ELIMINATED:
+            run.gate = event.gate_number
+            run.state = GameState.ELIMINATED
+            run.elimination_reason = event.elimination_reason
+        elif event.event_type == GameEventType.COMPLETED:
+            run.state = GameState.COMPLETED
+            run.completed_at = event.occurred_at
+    return runs
+
+
+def reconcile_players(db, repair: bool = False) -> List[int]:
+    """Compare players with the runs derived from the log; returns mismatched player ids"""
+    events = db.query(GameEvent).order_by(GameEvent.id).yield_per(10000)
+    runs = derive_runs(events)
+
+    mismatched = []
+    for player in db.query(Player).filter(Player.id.in_(list(runs))).yield_per(10000):
+        run = runs[player.id]
+        if (player.current_gate, player.game_state, player.elimination_reason) == (
+            run.gate, run.state, run.elimination_reason
+        ):
+            continue
+        mismatched.append(player.id)
+        if repair:
+            player.current_gate = run.gate
+            player.game_state = run.state
+            player.elimination_reason = run.elimination_reason
+            player.completed_at = run.completed_at
+    if repair:
+        db.commit()
+    return mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check players against the game event log")
+    parser.add_argument("--repair", action="store_true", help="rewrite mismatched players from the log")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        mismatched = reconcile_players(db, repair=args.repair)
+    finally:
+        db.close()
+    action = "Repaired" if args.repair else "Found"
+    print(f"{action} {len(mismatched)} players out of step with the event log")
+
+
+if __name__ == "__main__":
+    main()
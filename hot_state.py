@@ -0,0 +1,602 @@
+"""
+Hot game state for live runs, with Postgres as a write-behind store.
+
+While a run is live only its gate, current question, deadline and state
+matter, so those are kept in memory or Redis and answer checks never touch
+the database. Changed runs are marked dirty and a background flusher writes
+them to ``players``, ``attempts`` and ``games`` in batches: one SELECT, one
+UPDATE each of players, attempts and in-flight games, and one DELETE of the
+games rows of finished runs per batch, however many clicks it covers.
+
+Flushing is idempotent: gates already recorded in ``players.current_gate``
+are skipped, so a batch that committed right before a crash can be flushed
+again safely. On startup ``recover`` loads active runs from Postgres and marks
+every run still in the store dirty, reconciling the two.
+
+With the memory backend, changes not yet flushed are lost on a crash (at most
+one flush interval); the Redis backend keeps them across restarts and can be
+shared by several replicas.
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam
+
+from app.clock import clock
+from app.config import settings
+from app.database import SessionLocal
+from app.game_events import record_event
+from app.invalidation import GAME_RESET, invalidation_bus
+from app.attempts import append_gate_times
+from app.models import Attempt, EliminationReason, Game, GameEventType, GameState, GameStatus, Player
+from app.question_cache import question_cache, option_order, to_original
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import WatchError
+except ImportError:  # Optional dependency, only needed for the Redis backend
+    aioredis = None
+    WatchError = None
+
+logger = logging.getLogger(__name__)
+
+
+def to_timestamp(value: datetime) -> float:
+    """Epoch seconds; naive values are taken as UTC, aware ones converted to it"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc).timestamp()
+    return value.astimezone(timezone.utc).timestamp()
+
+
+def from_timestamp(value: float) -> datetime:
+    return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class RunState:
+    telegram_id: int
+    player_id: int
+    gate: int
+    question_id: int
+    started_at: float
+    deadline: float
+    # Seeds the question picked from each gate's pool
+    attempt_id: Optional[int] = None
+    state: str = GameState.ACTIVE.value
+    elimination_reason: Optional[str] = None
+    completed_at: Optional[float] = None
+    # Gates answered since the last flush: [gate, question_id, started_at, answered_at]
+    passed: List[List[Any]] = field(default_factory=list)
+    version: int = 0
+    dirty: bool = False
+
+    @property
+    def active(self) -> bool:
+        return self.state == GameState.ACTIVE.value
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, data) -> "RunState":
+        return cls(**json.loads(data))
+
+    def copy(self) -> "RunState":
+        return RunState(**{**asdict(self), "passed": [list(p) for p in self.passed]})
+
+
+class AnswerResult:
+    CORRECT = "correct"
+    COMPLETED = "completed"
+    WRONG = "wrong"
+    TIMEOUT = "timeout"
+
+    def __init__(self, outcome: str, gate: int, next_gate: Optional[int] = None):
+        self.outcome = outcome
+        # Gate the answer was given for, and the gate the player moves on to
+        self.gate = gate
+        self.next_gate = next_gate
+        # Filled in for the event log
+        self.player_id: Optional[int] = None
+        self.attempt_id: Optional[int] = None
+        self.question_id: Optional[int] = None
+        # Stored option letter the pressed button maps to
+        self.answer: Optional[str] = None
+        self.next_question_id: Optional[int] = None
+        self.latency_ms: Optional[int] = None
+
+
+# fn(run) -> (new run or None to delete, result)
+UpdateFunction = Callable[[Optional[RunState]], Tuple[Optional[RunState], Any]]
+
+
+class MemoryRunStore:
+    """Run store in process memory; updates are atomic within the event loop"""
+
+    def __init__(self):
+        self._runs: Dict[int, RunState] = {}
+        self._dirty: set = set()
+
+    async def get(self, telegram_id: int) -> Optional[RunState]:
+        run = self._runs.get(telegram_id)
+        return run.copy() if run else None
+
+    async def put(self, run: RunState):
+        self._runs[run.telegram_id] = run.copy()
+        if run.dirty:
+            self._dirty.add(run.telegram_id)
+
+    async def delete(self, telegram_id: int):
+        self._runs.pop(telegram_id, None)
+        self._dirty.discard(telegram_id)
+
+    async def update(self, telegram_id: int, fn: UpdateFunction):
+        current = self._runs.get(telegram_id)
+        new_run, result = fn(current.copy() if current else None)
+        if new_run is None:
+            await self.delete(telegram_id)
+        else:
+            await self.put(new_run)
+        return result
+
+    async def mark_dirty(self, telegram_ids: List[int]):
+        self._dirty.update(tid for tid in telegram_ids if tid in self._runs)
+
+    async def pop_dirty(self, limit: int) -> List[int]:
+        batch = []
+        while self._dirty and len(batch) < limit:
+            batch.append(self._dirty.pop())
+        return batch
+
+    async def due(self, now: float, limit: int) -> List[int]:
+        return [run.telegram_id for run in self._runs.values() if run.active and run.deadline < now][:limit]
+
+    async def all_ids(self) -> List[int]:
+        return list(self._runs)
+
+    async def clear(self):
+        self._runs.clear()
+        self._dirty.clear()
+
+
+class RedisRunStore:
+    """Run store in Redis, shared by replicas; updates use optimistic transactions"""
+
+    PREFIX = "gates:run:"
+    DIRTY_KEY = "gates:dirty"
+    DEADLINES_KEY = "gates:deadlines"
+
+    def __init__(self, url: str):
+        if aioredis is None:
+            raise RuntimeError("HOT_STATE_BACKEND=redis requires the 'redis' package")
+        self.redis = aioredis.from_url(url)
+
+    def _key(self, telegram_id: int) -> str:
+        return f"{self.PREFIX}{telegram_id}"
+
+    def _write(self, pipe, run: RunState):
+        pipe.set(self._key(run.telegram_id), run.to_json())
+        if run.active:
+            pipe.zadd(self.DEADLINES_KEY, {str(run.telegram_id): run.deadline})
+        else:
+            pipe.zrem(self.DEADLINES_KEY, str(run.telegram_id))
+        if run.dirty:
+            pipe.sadd(self.DIRTY_KEY, run.telegram_id)
+
+    async def get(self, telegram_id: int) -> Optional[RunState]:
+        data = await self.redis.get(self._key(telegram_id))
+        return RunState.from_json(data) if data else None
+
+    async def put(self, run: RunState):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            self._write(pipe, run)
+            await pipe.execute()
+
+    async def delete(self, telegram_id: int):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._key(telegram_id))
+            pipe.zrem(self.DEADLINES_KEY, str(telegram_id))
+            pipe.srem(self.DIRTY_KEY, telegram_id)
+            await pipe.execute()
+
+    async def update(self, telegram_id: int, fn: UpdateFunction):
+        key = self._key(telegram_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    data = await pipe.get(key)
+                    new_run, result = fn(RunState.from_json(data) if data else None)
+                    pipe.multi()
+                    if new_run is None:
+                        pipe.delete(key)
+                        pipe.zrem(self.DEADLINES_KEY, str(telegram_id))
+                        pipe.srem(self.DIRTY_KEY, telegram_id)
+                    else:
+                        self._write(pipe, new_run)
+                    await pipe.execute()
+                    return result
+                except WatchError:
+                    # Another replica changed the run; re-read and retry
+                    continue
+
+    async def mark_dirty(self, telegram_ids: List[int]):
+        if telegram_ids:
+            await self.redis.sadd(self.DIRTY_KEY, *telegram_ids)
+
+    async def pop_dirty(self, limit: int) -> List[int]:
+        return [int(tid) for tid in await self.redis.spop(self.DIRTY_KEY, limit) or []]
+
+    async def due(self, now: float, limit: int) -> List[int]:
+        return [int(tid) for tid in await self.redis.zrangebyscore(self.DEADLINES_KEY, "-inf", now, start=0, num=limit)]
+
+    async def all_ids(self) -> List[int]:
+        return [int(key[len(self.PREFIX):]) async for key in self.redis.scan_iter(match=f"{self.PREFIX}*", count=1000)]
+
+    async def clear(self):
+        keys = [key async for key in self.redis.scan_iter(match=f"{self.PREFIX}*", count=1000)]
+        if keys:
+            await self.redis.delete(*keys)
+        await self.redis.delete(self.DIRTY_KEY, self.DEADLINES_KEY)
+
+
+def _write_runs(runs: List[RunState]):
+    """Write a batch of run snapshots to Postgres in one transaction"""
+    if not runs:
+        return
+
+    db = SessionLocal()
+    try:
+        # Gate recorded for each player, and the attempt of the run in progress
+        recorded = {
+            row.id: row
+            for row in db.query(
+                Player.id, Player.current_gate, Attempt.id.label("attempt_id"), Attempt.gate_times
+            ).outerjoin(
+                Attempt, and_(Attempt.player_id == Player.id, Attempt.outcome == GameState.ACTIVE)
+            ).filter(Player.id.in_([run.player_id for run in runs]))
+        }
+
+        player_rows = []
+        attempt_rows = []
+        moved_games = []
+        finished_games = []
+        now = clock.now()
+        for run in runs:
+            row = recorded.get(run.player_id)
+            if row is None:
+                continue
+            # Gates at or past the recorded gate have not been written yet
+            passed = [p for p in run.passed if p[0] >= row.current_gate]
+
+            player_rows.append({
+                "b_id": run.player_id,
+                "b_gate": run.gate,
+                "b_state": GameState(run.state),
+                "b_reason": EliminationReason(run.elimination_reason) if run.elimination_reason else None,
+                "b_completed_at": from_timestamp(run.completed_at) if run.completed_at else None,
+                "b_activity": now,
+            })
+
+            if row.attempt_id is not None and (passed or not run.active):
+                attempt_rows.append({
+                    "b_id": row.attempt_id,
+                    "b_gate_times": append_gate_times(
+                        row.gate_times,
+                        [(answered_at - started_at) * 1000 for _, _, started_at, answered_at in passed]
+                    ),
+                    "b_final_gate": run.gate,
+                    "b_outcome": GameState(run.state),
+                    "b_reason": EliminationReason(run.elimination_reason) if run.elimination_reason else None,
+                    "b_ended_at": None if run.active else now,
+                })
+
+            if not run.active:
+                finished_games.append({"b_player_id": run.player_id})
+            elif passed:
+                # Move the in-flight row on to the run's current gate
+                moved_games.append({
+                    "b_player_id": run.player_id,
+                    "b_gate": run.gate,
+                    "b_question_id": run.question_id,
+                    "b_start": from_timestamp(run.started_at),
+                    "b_timeout": from_timestamp(run.deadline),
+                })
+
+        players = Player.__table__
+        attempts = Attempt.__table__
+        games = Game.__table__
+        if player_rows:
+            db.execute(
+                players.update().where(players.c.id == bindparam("b_id")).values(
+                    current_gate=bindparam("b_gate"),
+                    game_state=bindparam("b_state"),
+                    elimination_reason=bindparam("b_reason"),
+                    completed_at=bindparam("b_completed_at"),
+                    last_activity=bindparam("b_activity"),
+                ),
+                player_rows
+            )
+        if attempt_rows:
+            db.execute(
+                attempts.update().where(attempts.c.id == bindparam("b_id")).values(
+                    gate_times=bindparam("b_gate_times"),
+                    final_gate=bindparam("b_final_gate"),
+                    outcome=bindparam("b_outcome"),
+                    elimination_reason=bindparam("b_reason"),
+                    ended_at=bindparam("b_ended_at"),
+                ),
+                attempt_rows
+            )
+        if moved_games:
+            db.execute(
+                games.update().where(games.c.player_id == bindparam("b_player_id")).values(
+                    gate_number=bindparam("b_gate"),
+                    question_id=bindparam("b_question_id"),
+                    start_time=bindparam("b_start"),
+                    timeout_at=bindparam("b_timeout"),
+                ),
+                moved_games
+            )
+        if finished_games:
+            db.execute(
+                games.delete().where(games.c.player_id == bindparam("b_player_id")),
+                finished_games
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _load_active_runs(telegram_id: Optional[int] = None) -> List[RunState]:
+    """Build run states for active players from their active game rows"""
+    db = SessionLocal()
+    try:
+        query = db.query(Player, Game).join(Game, Game.player_id == Player.id).filter(
+            Player.game_state == GameState.ACTIVE,
+            Game.status == GameStatus.ACTIVE
+        )
+        if telegram_id is not None:
+            query = query.filter(Player.telegram_id == telegram_id)
+        return [
+            RunState(
+                telegram_id=player.telegram_id,
+                player_id=player.id,
+                gate=game.gate_number,
+                question_id=game.question_id,
+                attempt_id=game.attempt_id,
+                started_at=to_timestamp(game.start_time) if game.start_time else to_timestamp(clock.now()),
+                deadline=to_timestamp(game.timeout_at),
+            )
+            for player, game in query.all()
+        ]
+    finally:
+        db.close()
+
+
+class HotGameState:
+    def __init__(self, store):
+        self.store = store
+
+    async def get_run(self, telegram_id: int) -> Optional[RunState]:
+        """Get a live run, loading it from Postgres on first use"""
+        run = await self.store.get(telegram_id)
+        if run is None:
+            runs = await asyncio.to_thread(_load_active_runs, telegram_id)
+            if runs:
+                run = runs[0]
+                await self.store.put(run)
+        return run
+
+    async def start(self, telegram_id: int):
+        """Replace the player's run after crud.start_new_game created a fresh one"""
+        await self.store.delete(telegram_id)
+        await self.get_run(telegram_id)
+
+    async def answer(self, telegram_id: int, answer: str) -> Optional[AnswerResult]:
+        """Check an answer against the hot state; None when the player has no active run"""
+        if await self.get_run(telegram_id) is None:
+            return None
+
+        now = to_timestamp(clock.now())
+
+        def apply(run: Optional[RunState]):
+            if run is None or not run.active:
+                return run, None
+
+            player_id, question_id, started_at = run.player_id, run.question_id, run.started_at
+            # Options were shown shuffled for this run; map the button back to the stored option
+            original = to_original(answer, option_order(player_id, run.attempt_id, run.gate))
+            result = check(run, original)
+            result.player_id = player_id
+            result.attempt_id = run.attempt_id
+            result.question_id = question_id
+            result.answer = original
+            result.latency_ms = max(int((now - started_at) * 1000), 0)
+            if result.next_gate is not None:
+                result.next_question_id = run.question_id
+            if result.outcome != AnswerResult.CORRECT or result.next_gate is not None:
+                run.version += 1
+                run.dirty = True
+            return run, result
+
+        def check(run: RunState, original: str) -> AnswerResult:
+            gate = run.gate
+            if run.deadline < now:
+                run.state = GameState.ELIMINATED.value
+                run.elimination_reason = EliminationReason.TIMEOUT.value
+                return AnswerResult(AnswerResult.TIMEOUT, gate)
+
+            question = question_cache.get_by_id(run.question_id)
+            if question is None or question.correct_answer != original:
+                run.state = GameState.ELIMINATED.value
+                run.elimination_reason = EliminationReason.WRONG_ANSWER.value
+                return AnswerResult(AnswerResult.WRONG, gate)
+
+            if gate >= settings.total_gates:
+                run.passed.append([gate, run.question_id, run.started_at, now])
+                run.state = GameState.COMPLETED.value
+                run.completed_at = now
+                return AnswerResult(AnswerResult.COMPLETED, gate)
+
+            next_question = question_cache.select(gate + 1, run.player_id, run.attempt_id)
+            if next_question is None:
+                # Leave the run untouched so the player can answer again once the bank is fixed
+                return AnswerResult(AnswerResult.CORRECT, gate, None)
+            run.passed.append([gate, run.question_id, run.started_at, now])
+            run.gate = gate + 1
+            run.question_id = next_question.id
+            run.started_at = now
+            run.deadline = now + settings.question_timeout
+            return AnswerResult(AnswerResult.CORRECT, gate, run.gate)
+
+        result = await self.store.update(telegram_id, apply)
+        if result is not None:
+            self._record_answer(result)
+        return result
+
+    @staticmethod
+    def _record_answer(result: AnswerResult):
+        if result.outcome == AnswerResult.TIMEOUT:
+            record_event(result.player_id, GameEventType.ELIMINATED, result.gate,
+                         question_id=result.question_id, elimination_reason=EliminationReason.TIMEOUT)
+            return
+        if result.outcome == AnswerResult.CORRECT and result.next_gate is None:
+            # Run left untouched, the answer will be given again
+            return
+
+        correct = result.outcome != AnswerResult.WRONG
+        record_event(result.player_id, GameEventType.ANSWERED, result.gate,
+                     question_id=result.question_id, answer=(result.answer or "")[:1],
+                     correct=correct, latency_ms=result.latency_ms)
+        if result.outcome == AnswerResult.COMPLETED:
+            record_event(result.player_id, GameEventType.COMPLETED, result.gate)
+        elif result.outcome == AnswerResult.CORRECT:
+            record_event(result.player_id, GameEventType.ADVANCED, result.next_gate,
+                         question_id=result.next_question_id)
+        else:
+            record_event(result.player_id, GameEventType.ELIMINATED, result.gate,
+                         question_id=result.question_id, elimination_reason=EliminationReason.WRONG_ANSWER)
+
+    async def expire_due(self, limit: int = 10000) -> List[RunState]:
+        """Eliminate runs past their deadline; returns the eliminated runs"""
+        now = to_timestamp(clock.now())
+
+        def expire(run: Optional[RunState]):
+            if run is None or not run.active or run.deadline >= now:
+                return run, None
+            run.state = GameState.ELIMINATED.value
+            run.elimination_reason = EliminationReason.TIMEOUT.value
+            run.version += 1
+            run.dirty = True
+            return run, run
+
+        eliminated = []
+        for telegram_id in await self.store.due(now, limit):
+            run = await self.store.update(telegram_id, expire)
+            if run is not None:
+                eliminated.append(run)
+                record_event(run.player_id, GameEventType.ELIMINATED, run.gate,
+                             question_id=run.question_id, elimination_reason=EliminationReason.TIMEOUT)
+        return eliminated
+
+    async def shift_deadlines(self, open_at: float, seconds: float) -> int:
+        """Push back the deadline and gate start of runs still open at ``open_at``; returns runs shifted"""
+        def shift(run: Optional[RunState]):
+            if run is None or not run.active or run.deadline <= open_at:
+                return run, False
+            run.started_at += seconds
+            run.deadline += seconds
+            return run, True
+
+        shifted = 0
+        for telegram_id in await self.store.all_ids():
+            if await self.store.update(telegram_id, shift):
+                shifted += 1
+        return shifted
+
+    async def flush(self, telegram_ids: Optional[List[int]] = None) -> int:
+        """Write dirty runs (or the given players' runs) to Postgres; returns runs written"""
+        if telegram_ids is None:
+            telegram_ids = await self.store.pop_dirty(settings.hot_state_flush_batch_size)
+        snapshots = [run for run in [await self.store.get(tid) for tid in telegram_ids] if run and run.dirty]
+        if not snapshots:
+            return 0
+
+        try:
+            await asyncio.to_thread(_write_runs, snapshots)
+        except Exception:
+            await self.store.mark_dirty([run.telegram_id for run in snapshots])
+            raise
+
+        for snapshot in snapshots:
+            await self.store.update(snapshot.telegram_id, lambda run, s=snapshot: (self._acknowledge(run, s), None))
+        return len(snapshots)
+
+    @staticmethod
+    def _acknowledge(run: Optional[RunState], snapshot: RunState) -> Optional[RunState]:
+        if run is None:
+            return None
+        if run.version == snapshot.version:
+            # Finished runs leave the hot store once they are durable
+            if not run.active:
+                return None
+            run.passed = []
+            run.dirty = False
+            return run
+        # Changed while flushing: drop what was written and keep it dirty
+        run.passed = run.passed[len(snapshot.passed):]
+        run.dirty = True
+        return run
+
+    async def run_flusher(self):
+        """Background task flushing dirty runs every flush interval"""
+        interval = settings.hot_state_flush_interval_ms / 1000
+        while True:
+            try:
+                while await self.flush() >= settings.hot_state_flush_batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Error flushing hot game state: {e}")
+            await asyncio.sleep(interval)
+
+    async def recover(self):
+        """Reconcile the store with Postgres after a restart"""
+        existing = set(await self.store.all_ids())
+        loaded = 0
+        for run in await asyncio.to_thread(_load_active_runs):
+            if run.telegram_id not in existing:
+                await self.store.put(run)
+                loaded += 1
+        # Whatever survived in the store may be ahead of Postgres
+        await self.store.mark_dirty(list(existing))
+        logger.info(f"Hot game state recovered: {loaded} runs loaded, {len(existing)} to reconcile")
+
+
+hot_state: Optional[HotGameState] = None
+
+
+def get_hot_state() -> Optional[HotGameState]:
+    """Get the hot state service, or None when HOT_STATE_BACKEND is not set"""
+    global hot_state
+    if hot_state is None and settings.hot_state_backend:
+        if settings.hot_state_backend == "redis":
+            if not settings.redis_url:
+                raise RuntimeError("HOT_STATE_BACKEND=redis requires REDIS_URL")
+            store = RedisRunStore(settings.redis_url)
+        elif settings.hot_state_backend == "memory":
+            store = MemoryRunStore()
+            # Each replica holds its own runs, so a reset anywhere must clear them all
+            invalidation_bus.subscribe(GAME_RESET, lambda version: store.clear())
+        else:
+            raise ValueError(f"Unknown hot state backend: {settings.hot_state_backend}")
+        hot_state = HotGameState(store)
+    return hot_state
@@ -0,0 +1,172 @@
+"""
+Timing hooks for bot handlers, crud functions and SQLAlchemy statements.
+
+Besides metrics and trace spans, the engine hooks log slow statements with
+their bound parameters and the calling crud function, count statements per
+handled update and flag statements repeated within one update (the usual
+N+1 shape of lazy relationship loading). ``assert_max_statements`` turns the
+count into a test-mode assertion, e.g. "handle_callback issues <= 8 statements".
+"""
+
+import functools
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.metrics import (
+    CRUD_LATENCY, CRUD_STATEMENTS, HANDLER_ERRORS, HANDLER_LATENCY,
+    HANDLER_STATEMENTS, SLOW_QUERIES
+)
+from app.tracing import record_queue_wait, span, start_child_span
+
+logger = logging.getLogger(__name__)
+
+# Name of the innermost crud function currently executing
+current_crud_function: ContextVar[Optional[str]] = ContextVar("current_crud_function", default=None)
+
+
+class StatementBudgetExceeded(AssertionError):
+    """Raised when a block issues more SQL statements than allowed"""
+
+
+class StatementCount:
+    """Statements executed inside a counting scope"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.total = 0
+        self.by_function: Counter = Counter()
+        self.by_statement: Counter = Counter()
+
+    def record(self, function: str, statement: str):
+        self.total += 1
+        self.by_function[function] += 1
+        self.by_statement[statement] += 1
+
+    def repeated_statements(self, threshold: int):
+        """Statements executed at least ``threshold`` times, most repeated first"""
+        return [(statement, count) for statement, count in self.by_statement.most_common() if count >= threshold]
+
+
+# Counting scopes currently open; every statement is recorded in all of them
+_active_counts: ContextVar[Tuple[StatementCount, ...]] = ContextVar("active_statement_counts", default=())
+
+
+@contextmanager
+def count_statements(label: str):
+    """Count the SQL statements executed inside the block"""
+    count = StatementCount(label)
+    token = _active_counts.set(_active_counts.get() + (count,))
+    try:
+        yield count
+    finally:
+        _active_counts.reset(token)
+
+
+@contextmanager
+def assert_max_statements(limit: int, label: str = "block"):
+    """Fail if the block issues more than ``limit`` SQL statements"""
+    with count_statements(label) as count:
+        yield count
+    if count.total > limit:
+        raise StatementBudgetExceeded(_describe_budget(count, limit))
+
+
+def _describe_budget(count: StatementCount, limit: int) -> str:
+    functions = ", ".join(f"{name}={n}" for name, n in count.by_function.most_common())
+    return f"{count.label} issued {count.total} statements (limit {limit}): {functions}"
+
+
+def _check_update_statements(count: StatementCount):
+    """Report N+1 patterns and enforce per-handler statement budgets"""
+    HANDLER_STATEMENTS.observe(count.total, handler=count.label)
+
+    for statement, repeats in count.repeated_statements(settings.n_plus_one_threshold):
+        logger.warning(
+            f"Possible N+1 in {count.label}: statement executed {repeats} times: {statement[:200]}"
+        )
+
+    limit = settings.sql_statement_budgets.get(count.label)
+    if limit is not None and count.total > limit:
+        message = _describe_budget(count, limit)
+        if settings.sql_strict_budgets:
+            raise StatementBudgetExceeded(message)
+        logger.warning(message)
+
+
+def crud_operation(func):
+    """Time a crud function and attribute the statements it executes to it"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = current_crud_function.set(name)
+        start = time.perf_counter()
+        try:
+            with span(f"crud.{name}"):
+                return func(*args, **kwargs)
+        finally:
+            CRUD_LATENCY.observe(time.perf_counter() - start, function=name)
+            current_crud_function.reset(token)
+
+    return wrapper
+
+
+def instrument_handler(func):
+    """Time an async Telegram update handler and count the statements it issues"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        record_queue_wait()
+        start = time.perf_counter()
+        try:
+            with count_statements(name) as count, span(f"handler.{name}"):
+                result = await func(*args, **kwargs)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - start, handler=name)
+        _check_update_statements(count)
+        return result
+
+    return wrapper
+
+
+def instrument_engine(engine: Engine):
+    """Count, time and trace every statement executed through the engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        function = current_crud_function.get() or "unknown"
+        CRUD_STATEMENTS.inc(function=function)
+        for count in _active_counts.get():
+            count.record(function, statement)
+        if context is not None:
+            context._query_start = time.perf_counter()
+            context._trace_span = start_child_span("db.query", statement=statement[:200], function=function)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        query_span = getattr(context, "_trace_span", None)
+        if query_span is not None:
+            query_span.finish()
+
+        started = getattr(context, "_query_start", None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= settings.slow_query_threshold_ms:
+            function = current_crud_function.get() or "unknown"
+            SLOW_QUERIES.inc(function=function)
+            logger.warning(
+                f"Slow query ({elapsed_ms:.1f} ms) in {function}: {statement} -- parameters: {parameters!r}"
+            )
@@ -0,0 +1,227 @@
+"""
+Cross-replica cache invalidation.
+
+Code that changes cached data calls ``invalidation_bus.publish(topic)`` after
+committing. That bumps the topic's version and broadcasts it. Every replica
+runs ``run_listener`` and hands versions newer than the last one it has seen
+to the topic's subscribers, usually a cache's ``invalidate``. The publishing
+replica dispatches right away instead of waiting for its own notification.
+
+Backends (INVALIDATION_BUS):
+
+- ``postgres``: versions live in ``cache_versions`` and are broadcast with
+  NOTIFY on one channel, which a dedicated LISTEN connection receives.
+- ``redis``: versions are INCR counters and broadcast with pub/sub.
+- ``local``: in-process only, for a single replica.
+
+``auto`` picks ``postgres`` on Postgres and ``local`` otherwise. After the
+listener reconnects it reads every topic's version, so notifications sent
+while it was disconnected are not missed.
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import select
+import threading
+from typing import Callable, Dict, List
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.database import engine
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:  # Optional dependency, only needed for the Redis bus
+    redis = None
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "gates_invalidation"
+REDIS_VERSION_PREFIX = "gates:cache_version:"
+
+# Topics
+QUESTIONS = "questions"
+GAME_RESET = "game_reset"
+
+
+class InvalidationBus:
+    def __init__(self, backend: str):
+        self.backend = backend
+        self._subscribers: Dict[str, List[Callable[[int], object]]] = {}
+        # Highest version dispatched per topic
+        self.versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+
+    def subscribe(self, topic: str, callback: Callable[[int], object]):
+        """Call ``callback(version)`` whenever ``topic`` is invalidated"""
+        self._subscribers.setdefault(topic, []).append(callback)
+
+    def dispatch(self, topic: str, version: int):
+        """Hand a version to the subscribers unless it was already seen"""
+        with self._lock:
+            if version <= self.versions.get(topic, 0):
+                return
+            self.versions[topic] = version
+
+        for callback in self._subscribers.get(topic, []):
+            try:
+                result = callback(version)
+                if inspect.isawaitable(result):
+                    try:
+                        asyncio.get_running_loop().create_task(result)
+                    except RuntimeError:
+                        asyncio.run(result)
+            except Exception as e:
+                logger.error(f"Invalidation subscriber for {topic} failed: {e}")
+
+    def publish(self, topic: str) -> int:
+        """Bump and broadcast the topic's version; call after committing the change"""
+        if self.backend == "postgres":
+            with engine.begin() as conn:
+                version = conn.execute(text(
+                    "INSERT INTO cache_versions (topic, version) VALUES (:topic, 1) "
+                    "ON CONFLICT (topic) DO UPDATE SET version = cache_versions.version + 1 "
+                    "RETURNING version"
+                ), {"topic": topic}).scalar()
+                # Delivered to listeners when this transaction commits
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"), {
+                    "channel": CHANNEL,
+                    "payload": json.dumps({"topic": topic, "version": version}),
+                })
+        elif self.backend == "redis":
+            if self._redis is None:
+                self._redis = redis.Redis.from_url(settings.redis_url)
+            version = self._redis.incr(f"{REDIS_VERSION_PREFIX}{topic}")
+            self._redis.publish(CHANNEL, json.dumps({"topic": topic, "version": version}))
+        else:
+            version = self.versions.get(topic, 0) + 1
+
+        self.dispatch(topic, version)
+        logger.info(f"Published invalidation of {topic} (version {version})")
+        return version
+
+    def _handle_payload(self, payload):
+        try:
+            message = json.loads(payload)
+            self.dispatch(message["topic"], int(message["version"]))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring malformed invalidation message {payload!r}: {e}")
+
+    def _catch_up(self, versions: Dict[str, int], first: bool):
+        if first:
+            # Caches start fresh; only remember where each topic stands
+            with self._lock:
+                for topic, version in versions.items():
+                    self.versions[topic] = max(version, self.versions.get(topic, 0))
+            return
+        for topic, version in versions.items():
+            self.dispatch(topic, version)
+
+    def _listen_postgres(self, loop: asyncio.AbstractEventLoop, stop: threading.Event):
+        """Blocking LISTEN loop on a dedicated connection, run in a thread"""
+        listen_engine = create_engine(settings.database_url, poolclass=NullPool)
+        first = True
+        while not stop.is_set():
+            raw = None
+            try:
+                raw = listen_engine.raw_connection()
+                connection = getattr(raw, "driver_connection", None) or raw.connection
+                connection.autocommit = True
+                cursor = connection.cursor()
+                cursor.execute(f"LISTEN {CHANNEL}")
+                cursor.execute("SELECT topic, version FROM cache_versions")
+                versions = {topic: version for topic, version in cursor.fetchall()}
+                loop.call_soon_threadsafe(self._catch_up, versions, first)
+                first = False
+
+                while not stop.is_set():
+                    if hasattr(connection, "notifies") and callable(connection.notifies):
+                        # psycopg 3
+                        for notify in connection.notifies(timeout=1.0):
+                            loop.call_soon_threadsafe(self._handle_payload, notify.payload)
+                    else:
+                        # psycopg2
+                        if select.select([connection], [], [], 1.0)[0]:
+                            connection.poll()
+                            while connection.notifies:
+                                notify = connection.notifies.pop(0)
+                                loop.call_soon_threadsafe(self._handle_payload, notify.payload)
+            except Exception as e:
+                logger.error(f"Invalidation listener disconnected: {e}")
+                stop.wait(1.0)
+            finally:
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+
+    async def _listen_redis(self):
+        client = aioredis.from_url(settings.redis_url)
+        first = True
+        while True:
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL)
+                keys = [key async for key in client.scan_iter(match=f"{REDIS_VERSION_PREFIX}*")]
+                values = await client.mget(keys) if keys else []
+                self._catch_up({
+                    key.decode()[len(REDIS_VERSION_PREFIX):]: int(value)
+                    for key, value in zip(keys, values) if value is not None
+                }, first)
+                first = False
+
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._handle_payload(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Invalidation listener disconnected: {e}")
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.close()
+
+    async def run_listener(self):
+        """Background task receiving invalidations from other replicas"""
+        if self.backend == "redis":
+            await self._listen_redis()
+        elif self.backend == "postgres":
+            stop = threading.Event()
+            thread = threading.Thread(
+                target=self._listen_postgres,
+                args=(asyncio.get_running_loop(), stop),
+                name="invalidation-listener",
+                daemon=True
+            )
+            thread.start()
+            try:
+                # The thread does the work; wait here until cancelled
+                await asyncio.Event().wait()
+            finally:
+                stop.set()
+
+
+def _backend() -> str:
+    backend = settings.invalidation_bus
+    if backend == "auto":
+        return "postgres" if settings.database_url.startswith("postgresql") else "local"
+    if backend == "redis":
+        if redis is None:
+            raise RuntimeError("The redis package is required for INVALIDATION_BUS=redis")
+        if not settings.redis_url:
+            raise RuntimeError("INVALIDATION_BUS=redis requires REDIS_URL")
+    elif backend not in ("postgres", "local"):
+        raise ValueError(f"Unknown invalidation bus: {backend}")
+    return backend
+
+
+# Global invalidation bus instance
+invalidation_bus = InvalidationBus(_backend())
@@ -0,0 +1,153 @@
+"""
+Priority lanes between the webhook and the handlers.
+
+The webhook classifies each update and queues it in a lane, then answers
+Telegram at once:
+
+- ``answer``: answer buttons and quiz votes, mostly players mid-run with a
+  deadline running;
+- ``new_game``: /start and /restart;
+- ``read``: /leaderboard, /status, /help and anything else.
+
+A fixed pool of workers (UPDATE_WORKERS) takes updates from the lanes with
+smooth weighted round robin over the lanes that have work: with the default
+weights 8:2:1 a storm of commands gets 3 of every 11 turns (2 for new_game,
+1 for read) while answers are waiting, and all of them when no answer is.
+Each lane is FIFO and bounded (UPDATE_LANE_CAPACITY); when a lane is full
+the webhook answers 503 and Telegram redelivers the update later.
+
+The time each update waits in its lane is exported per lane, so answer
+latency can be checked against command load.
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from telegram import Update
+
+from app.admission import admission
+from app.config import settings
+from app.metrics import LANE_DEPTH, LANE_QUEUE_WAIT
+from app.tracing import hold_trace
+
+logger = logging.getLogger(__name__)
+
+ANSWER = "answer"
+NEW_GAME = "new_game"
+READ = "read"
+LANES = (ANSWER, NEW_GAME, READ)
+
+# update_kind -> lane; every other kind is a read
+LANE_OF_KIND = {
+    "answer": ANSWER,
+    "start": NEW_GAME,
+    "restart": NEW_GAME,
+}
+
+
+def lane_of(kind: str) -> str:
+    return LANE_OF_KIND.get(kind, READ)
+
+
+class QueuedUpdate:
+    __slots__ = ("update", "lane", "queued_at", "context", "release")
+
+    def __init__(self, update: Update, lane: str, queued_at: float,
+                 context: contextvars.Context, release: Callable[[], None]):
+        self.update = update
+        self.lane = lane
+        self.queued_at = queued_at
+        # Trace and admission context of the webhook request that queued it
+        self.context = context
+        self.release = release
+
+
+class UpdateLanes:
+    def __init__(self):
+        self.weights = {lane: max(int(settings.update_lane_weights.get(lane, 1)), 1) for lane in LANES}
+        self.capacity = settings.update_lane_capacity
+        self._queues: Dict[str, Deque[QueuedUpdate]] = {lane: deque() for lane in LANES}
+        self._credit = dict.fromkeys(LANES, 0)
+        self._ready: Optional[asyncio.Semaphore] = None
+        self._workers: List[asyncio.Task] = []
+        self._process: Optional[Callable[[Update], Awaitable[None]]] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def depth(self, lane: str) -> int:
+        return len(self._queues[lane])
+
+    def start(self, process: Callable[[Update], Awaitable[None]], workers: Optional[int] = None):
+        """Start the workers handing queued updates to ``process``"""
+        if self._workers:
+            return
+        self._process = process
+        self._ready = asyncio.Semaphore(0)
+        count = workers or settings.update_workers
+        self._workers = [asyncio.create_task(self._work()) for _ in range(count)]
+        logger.info(f"Update lanes started with {count} workers, weights {self.weights}")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, update: Update, kind: str) -> bool:
+        """Queue an update in the lane for its kind; False when that lane is full"""
+        lane = lane_of(kind)
+        queue = self._queues[lane]
+        if len(queue) >= self.capacity:
+            return False
+        # Counted in flight from here, so the backlog signal sees queued updates
+        admission.update_started()
+        queue.append(QueuedUpdate(update, lane, time.perf_counter(), contextvars.copy_context(), hold_trace()))
+        LANE_DEPTH.set(len(queue), lane=lane)
+        self._ready.release()
+        return True
+
+    def _take(self) -> QueuedUpdate:
+        """Smooth weighted round robin over the lanes with queued updates"""
+        total = 0
+        chosen = None
+        for lane in LANES:
+            if self._queues[lane]:
+                self._credit[lane] += self.weights[lane]
+                total += self.weights[lane]
+                if chosen is None or self._credit[lane] > self._credit[chosen]:
+                    chosen = lane
+        self._credit[chosen] -= total
+        queue = self._queues[chosen]
+        item = queue.popleft()
+        if not queue:
+            # An idle lane does not bank turns for later
+            self._credit[chosen] = 0
+        LANE_DEPTH.set(len(queue), lane=chosen)
+        return item
+
+    async def _work(self):
+        while True:
+            await self._ready.acquire()
+            item = self._take()
+            LANE_QUEUE_WAIT.observe(time.perf_counter() - item.queued_at, lane=item.lane)
+            # Run in the webhook request's context so spans attach to its trace
+            await item.context.run(asyncio.create_task, self._handle(item))
+
+    async def _handle(self, item: QueuedUpdate):
+        try:
+            await self._process(item.update)
+        except Exception as e:
+            logger.error(f"Error processing update {item.update.update_id} from lane {item.lane}: {e}")
+        finally:
+            admission.update_finished()
+            item.release()
+
+
+# Global update lanes instance
+update_lanes = UpdateLanes()
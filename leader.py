@@ -0,0 +1,216 @@
+"""
+Leader election, so singleton jobs run on exactly one replica.
+
+Every replica runs ``LeaderElection.run``. The replica holding the lease runs
+the jobs (timeout checking, partition maintenance); the others retry every
+LEADER_RENEW_INTERVAL_SECONDS and take over once the lease is free.
+
+- ``postgres``: a session advisory lock held on a dedicated connection.
+  Postgres releases it the moment the leader's connection drops, so failover
+  takes at most one retry interval.
+- ``redis``: a key set with NX and a TTL of LEADER_LEASE_TTL_SECONDS that
+  only its owner renews; a crashed leader's lease expires after the TTL.
+- ``none``: every process runs the jobs, for a single replica.
+
+``auto`` picks ``postgres`` when the database is Postgres and ``none``
+otherwise.
+"""
+
+import asyncio
+import logging
+import uuid
+import zlib
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.metrics import IS_LEADER, LEADER_TRANSITIONS
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Optional dependency, only needed for the Redis lease
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "gates:leader"
+
+
+class LocalLease:
+    """Always held; for a single process"""
+
+    async def acquire(self) -> bool:
+        return True
+
+    async def renew(self) -> bool:
+        return True
+
+    async def release(self):
+        pass
+
+
+class PostgresLease:
+    """Session-level advisory lock on a connection kept outside the pool"""
+
+    def __init__(self, database_url: str, name: str = LEASE_NAME):
+        self.engine = create_engine(database_url, poolclass=NullPool)
+        # Below 2**31, so pg_locks shows it as classid 0 / objid key
+        self.key = zlib.crc32(name.encode()) & 0x7FFFFFFF
+        self._conn = None
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _acquire(self) -> bool:
+        if self._conn is None:
+            self._conn = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            acquired = self._conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+        except Exception:
+            self._close()
+            raise
+        if not acquired:
+            # Do not hold a connection while following
+            self._close()
+        return bool(acquired)
+
+    def _renew(self) -> bool:
+        if self._conn is None:
+            return False
+        try:
+            held = self._conn.execute(text(
+                "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' "
+                "AND pid = pg_backend_pid() AND classid = 0 AND objid = :key AND objsubid = 1"
+            ), {"key": self.key}).scalar()
+        except Exception:
+            self._close()
+            return False
+        return bool(held)
+
+    def _release(self):
+        if self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            finally:
+                self._close()
+
+    async def acquire(self) -> bool:
+        return await asyncio.to_thread(self._acquire)
+
+    async def renew(self) -> bool:
+        return await asyncio.to_thread(self._renew)
+
+    async def release(self):
+        await asyncio.to_thread(self._release)
+
+
+class RedisLease:
+    """Key with a TTL, renewed and released only by the token that set it"""
+
+    RENEW_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    )
+    RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, redis_url: str, ttl_seconds: float, name: str = LEASE_NAME):
+        if aioredis is None:
+            raise RuntimeError("The redis package is required for LEADER_ELECTION=redis")
+        self.redis = aioredis.from_url(redis_url)
+        self.key = name
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.token = uuid.uuid4().hex
+
+    async def acquire(self) -> bool:
+        if await self.redis.set(self.key, self.token, nx=True, px=self.ttl_ms):
+            return True
+        return await self.renew()
+
+    async def renew(self) -> bool:
+        return bool(await self.redis.eval(self.RENEW_SCRIPT, 1, self.key, self.token, self.ttl_ms))
+
+    async def release(self):
+        await self.redis.eval(self.RELEASE_SCRIPT, 1, self.key, self.token)
+
+
+class LeaderElection:
+    def __init__(self, lease):
+        self.lease = lease
+        self.is_leader = False
+
+    @staticmethod
+    async def _stop(tasks: List[asyncio.Task]):
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self, jobs: Dict[str, Callable[[], Awaitable]]):
+        """Run ``jobs`` while this replica holds the lease; never returns until cancelled"""
+        tasks: List[asyncio.Task] = []
+        try:
+            while True:
+                try:
+                    held = await (self.lease.renew() if self.is_leader else self.lease.acquire())
+                except Exception as e:
+                    logger.error(f"Leader lease check failed: {e}")
+                    held = False
+
+                if held and not self.is_leader:
+                    logger.info(f"Became leader, starting {', '.join(jobs)}")
+                    tasks = [asyncio.create_task(job()) for job in jobs.values()]
+                    self.is_leader = True
+                    LEADER_TRANSITIONS.inc(change="elected")
+                elif not held and self.is_leader:
+                    # Stop before another replica can take over the lease
+                    logger.warning("Lost leadership, stopping singleton jobs")
+                    await self._stop(tasks)
+                    tasks = []
+                    self.is_leader = False
+                    LEADER_TRANSITIONS.inc(change="lost")
+                IS_LEADER.set(1 if self.is_leader else 0)
+
+                await asyncio.sleep(settings.leader_renew_interval_seconds)
+        finally:
+            await self._stop(tasks)
+            if self.is_leader:
+                self.is_leader = False
+                IS_LEADER.set(0)
+                try:
+                    await self.lease.release()
+                except Exception as e:
+                    logger.warning(f"Failed to release leader lease: {e}")
+
+
+leader_election: Optional[LeaderElection] = None
+
+
+def get_leader_election() -> LeaderElection:
+    """Get the leader election configured by LEADER_ELECTION"""
+    global leader_election
+    if leader_election is None:
+        backend = settings.leader_election
+        if backend == "auto":
+            backend = "postgres" if settings.database_url.startswith("postgresql") else "none"
+
+        if backend == "postgres":
+            lease = PostgresLease(settings.database_url)
+        elif backend == "redis":
+            if not settings.redis_url:
+                raise RuntimeError("LEADER_ELECTION=redis requires REDIS_URL")
+            lease = RedisLease(settings.redis_url, settings.leader_lease_ttl_seconds)
+        elif backend == "none":
+            lease = LocalLease()
+        else:
+            raise ValueError(f"Unknown leader election backend: {settings.leader_election}")
+        leader_election = LeaderElection(lease)
+    return leader_election
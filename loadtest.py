@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Load-testing harness for the 100 Gates to Freedom webhook.
+
+Drives the FastAPI /webhook in main_backup.py in-process with simulated
+players while a local fake Bot API (fake_bot_api.py) records the bot's replies.
+Players /start, answer with a configurable accuracy and think time, and
+sometimes walk away to be timed out, optionally while spectators storm
+/leaderboard. Reports throughput, click-to-next-question latency percentiles,
+DB statement counts and how reads were routed between replica and primary.
+
+Usage:
+    DATABASE_URL=postgresql://localhost/gates_load python loadtest.py --players 2000 --accuracy 0.95
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from itertools import count
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ANSWER_OPTIONS = ("A", "B", "C", "D")
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of unsorted values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def build_user(telegram_id: int) -> dict:
+    return {
+        "id": telegram_id,
+        "is_bot": False,
+        "first_name": f"Player{telegram_id}",
+        "username": f"player{telegram_id}",
+    }
+
+
+def command_update(update_id: int, telegram_id: int, command: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": telegram_id, "type": "private"},
+            "from": build_user(telegram_id),
+            "text": command,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+        },
+    }
+
+
+def callback_update(update_id: int, telegram_id: int, data: str) -> dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": build_user(telegram_id),
+            "chat_instance": str(telegram_id),
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": telegram_id, "type": "private"},
+                "text": "question",
+            },
+        },
+    }
+
+
+def poll_answer_update(update_id: int, telegram_id: int, poll_id: str, option: int) -> dict:
+    return {
+        "update_id": update_id,
+        "poll_answer": {
+            "poll_id": poll_id,
+            "user": build_user(telegram_id),
+            "option_ids": [option],
+        },
+    }
+
+
+class LoadTest:
+    def __init__(self, args, client: httpx.AsyncClient, fake_api, answers: Dict[str, str], webhook_secret: str):
+        self.args = args
+        self.client = client
+        self.fake_api = fake_api
+        self.answers = answers
+        self.webhook_headers = {"X-Telegram-Bot-Api-Secret-Token": webhook_secret}
+        self.update_ids = count(1)
+        self.updates_sent = 0
+        self.click_latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+
+    async def post_update(self, update: dict):
+        self.updates_sent += 1
+        response = await self.client.post("/webhook", json=update, headers=self.webhook_headers)
+        if response.status_code != 200:
+            self.outcomes["webhook_errors"] += 1
+
+    def think_time(self) -> float:
+        # Exponentially distributed think time around the configured mean
+        return random.expovariate(1000 / self.args.think_time_ms) if self.args.think_time_ms else 0.0
+
+    @staticmethod
+    def question_of(reply) -> Tuple[str, Dict[str, str]]:
+        """Question text, and the letter each option is shown under"""
+        if reply.method == "sendPoll":
+            poll = reply.result["poll"]
+            options = [option["text"] for option in poll["options"]]
+            return poll["question"].split(": ", 1)[-1], dict(zip(options, ANSWER_OPTIONS))
+        # Rendered after the ❓ marker
+        question_text, _, options = reply.params.get("text", "").rsplit("❓ ", 1)[-1].partition("\n\n")
+        return question_text, {line[3:]: line[0] for line in options.splitlines() if line[1:3] == ") "}
+
+    def answer_update(self, telegram_id: int, reply) -> dict:
+        """Answer the question in ``reply`` by button or, for a quiz poll, by voting"""
+        answer = self.pick_answer(self.question_of(reply))
+        if reply.method == "sendPoll":
+            return poll_answer_update(next(self.update_ids), telegram_id, reply.result["poll"]["id"],
+                                      ANSWER_OPTIONS.index(answer))
+        return callback_update(next(self.update_ids), telegram_id, answer)
+
+    def pick_answer(self, question: Tuple[str, Dict[str, str]]) -> str:
+        question_text, letters = question
+        # Options are shuffled per run, so find where the correct one is shown
+        correct = letters.get(self.answers.get(question_text), "A")
+        if random.random() < self.args.accuracy:
+            return correct
+        return random.choice([option for option in ANSWER_OPTIONS if option != correct])
+
+    async def play(self, telegram_id: int):
+        """Run one virtual player until elimination, completion or walking away"""
+        await self.post_update(command_update(next(self.update_ids), telegram_id, "/start"))
+        try:
+            reply = await self.fake_api.wait_for_chat(telegram_id, self.args.reply_timeout)
+            if self.args.gate_delivery == "quiz_poll":
+                # The welcome message comes first, then the first gate's poll
+                reply = await self.fake_api.wait_for_chat(telegram_id, self.args.reply_timeout)
+        except asyncio.TimeoutError:
+            self.outcomes["no_question"] += 1
+            return
+
+        gate = 1
+        while gate <= self.args.max_gates:
+            await asyncio.sleep(self.think_time())
+            if random.random() < self.args.timeout_rate:
+                # Walk away and let the timeout checker eliminate the run
+                self.outcomes["timed_out"] += 1
+                return
+
+            clicked_at = time.perf_counter()
+            await self.post_update(self.answer_update(telegram_id, reply))
+            try:
+                reply = await self.fake_api.wait_for_chat(telegram_id, self.args.reply_timeout)
+            except asyncio.TimeoutError:
+                self.outcomes["no_reply"] += 1
+                return
+            self.click_latencies.append(reply.received_at - clicked_at)
+
+            text = reply.params.get("text", "") or reply.params.get("question", "")
+            if "Wrong Answer" in text:
+                self.outcomes["wrong_answer"] += 1
+                return
+            if "CONGRATULATIONS" in text:
+                self.outcomes["completed"] += 1
+                return
+            if "Unlocked" not in text:
+                self.outcomes["unexpected_reply"] += 1
+                return
+            gate += 1
+
+        self.outcomes["stopped_at_max_gates"] += 1
+
+    async def leaderboard_storm(self):
+        """Send /leaderboard from spectators (not players) at the configured rate"""
+        first_spectator = self.args.first_telegram_id + self.args.players
+        sent = []
+        try:
+            for n in count():
+                update = command_update(next(self.update_ids), first_spectator + n % 1000, "/leaderboard")
+                sent.append(asyncio.create_task(self.post_update(update)))
+                await asyncio.sleep(1 / self.args.leaderboard_rate)
+        finally:
+            await asyncio.gather(*sent, return_exceptions=True)
+
+    async def run(self) -> float:
+        """Start all players spread over the ramp-up period; returns elapsed seconds"""
+        started = time.perf_counter()
+        storm = asyncio.create_task(self.leaderboard_storm()) if self.args.leaderboard_rate else None
+        tasks = []
+        delay = self.args.ramp_up / self.args.players if self.args.players else 0
+        for i in range(self.args.players):
+            tasks.append(asyncio.create_task(self.play(self.args.first_telegram_id + i)))
+            if delay:
+                await asyncio.sleep(delay)
+        await asyncio.gather(*tasks)
+        if storm:
+            storm.cancel()
+            await asyncio.gather(storm, return_exceptions=True)
+        return time.perf_counter() - started
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return round(value * 1000, 2) if value is not None else None
+
+
+async def run_load_test(args) -> dict:
+    # Settings are read at import time, so point the bot at the fake API first
+    os.environ["TELEGRAM_API_BASE_URL"] = f"http://127.0.0.1:{args.fake_api_port}/bot"
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:LOADTEST")
+    os.environ.setdefault("WEBHOOK_URL", "http://loadtest")
+    os.environ.setdefault("SECRET_KEY", "loadtest")
+    os.environ["GATE_DELIVERY"] = args.gate_delivery
+
+    from app.fake_bot_api import FakeBotApi
+
+    fake_api = FakeBotApi(latency_ms=args.api_latency_ms)
+    server = await fake_api.serve(port=args.fake_api_port)
+
+    from app import main_backup
+    from app.config import settings
+    from app.database import SessionLocal
+    from app.lanes import LANES
+    from app.metrics import CRUD_STATEMENTS, LANE_QUEUE_WAIT, READ_ROUTING
+    from app.models import Question
+    from app.seed_questions import seed_questions
+
+    await main_backup.startup_event()
+    seed_questions()
+
+    db = SessionLocal()
+    try:
+        # Each gate draws from a pool, so answers are looked up by the question shown
+        answers = {
+            q.question_text: getattr(q, f"option_{q.correct_answer.lower()}")
+            for q in db.query(Question).all()
+        }
+    finally:
+        db.close()
+
+    # startup_event already runs the timeout checker as the (only) leader
+    statements_before = CRUD_STATEMENTS.total()
+
+    transport = httpx.ASGITransport(app=main_backup.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        load_test = LoadTest(args, client, fake_api, answers, settings.webhook_secret)
+        elapsed = await load_test.run()
+
+    statements = CRUD_STATEMENTS.total() - statements_before
+    await main_backup.shutdown_event()
+    server.should_exit = True
+
+    return {
+        "players": args.players,
+        "elapsed_seconds": round(elapsed, 3),
+        "updates_sent": load_test.updates_sent,
+        "throughput_updates_per_second": round(load_test.updates_sent / elapsed, 2) if elapsed else None,
+        "answers": len(load_test.click_latencies),
+        "click_latency_ms": {
+            "p50": _ms(percentile(load_test.click_latencies, 50)),
+            "p95": _ms(percentile(load_test.click_latencies, 95)),
+            "p99": _ms(percentile(load_test.click_latencies, 99)),
+            "max": _ms(max(load_test.click_latencies)) if load_test.click_latencies else None,
+        },
+        "db_statements": int(statements),
+        "db_statements_per_update": round(statements / load_test.updates_sent, 2) if load_test.updates_sent else None,
+        "bot_api_calls": dict(fake_api.calls_by_method),
+        "bot_api_latency_p95_ms": {
+            method: _ms(percentile(values, 95)) for method, values in fake_api.latencies.items()
+        },
+        "outcomes": dict(load_test.outcomes),
+        "read_routing": {
+            target: int(READ_ROUTING.value(target=target)) for target in ("replica", "primary")
+        },
+        # Bucket upper bounds: answers should stay in the lowest buckets while spectators storm
+        "lane_queue_wait_p95_ms": {
+            lane: _ms(LANE_QUEUE_WAIT.quantile(0.95, lane=lane)) for lane in LANES
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the 100 Gates webhook with virtual players")
+    parser.add_argument("--players", type=int, default=1000, help="number of virtual players")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="seconds over which players join")
+    parser.add_argument("--accuracy", type=float, default=0.95, help="probability of answering correctly")
+    parser.add_argument("--think-time-ms", type=float, default=1500.0, help="mean think time per question")
+    parser.add_argument("--timeout-rate", type=float, default=0.01, help="probability of walking away at each gate")
+    parser.add_argument("--max-gates", type=int, default=100, help="stop each player after this many gates")
+    parser.add_argument("--reply-timeout", type=float, default=30.0, help="seconds to wait for a bot reply")
+    parser.add_argument("--leaderboard-rate", type=float, default=0.0,
+                        help="/leaderboard commands per second from spectators, to load the read path")
+    parser.add_argument("--gate-delivery", choices=("buttons", "quiz_poll"), default="buttons",
+                        help="answer by buttons or by voting in quiz polls")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="latency added by the fake Bot API")
+    parser.add_argument("--fake-api-port", type=int, default=8081)
+    parser.add_argument("--first-telegram-id", type=int, default=10_000_000)
+    parser.add_argument("--database-url", help="overrides DATABASE_URL")
+    parser.add_argument("--json", dest="json_path", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load_test(args))
+    print(json.dumps(results, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
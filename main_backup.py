@@ -1,17 +1,39 @@
 from fastapi import FastAPI, Depends, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.orm import Session
 from telegram import Update
 from telegram.ext import Application
 import logging
 import json
 import time
+import hmac
+import asyncio
 
-from app.database import get_db, engine
-from app.models import Base
-from app.telegram_bot import get_bot
-from app.crud import get_game_stats, get_active_players, get_leaderboard
+from app.database import get_db, get_read_db, read_session, replica_engine, replica_monitor, engine
+from app.models import Base, Attempt, Game, GameState
+from app.clock import clock
+from app.telegram_bot import get_bot, update_kind
+from app.crud import (
+    get_game_stats, get_active_players, get_leaderboard,
+    count_active_players, count_active_games
+)
 from app.config import settings
+from app.update_recorder import get_recorder
+from app.hot_state import get_hot_state, to_timestamp
+from app.invalidation import GAME_RESET, invalidation_bus
+from app.partitions import create_partitioned_events, run_maintenance
+from app.migrations import run_migrations
+from app.tracing import configure_tracing, start_trace, span, mark_received
+from app.admission import admission
+from app.lanes import update_lanes
+from app.drain import drain
+from app.warmup import (
+    readiness, open_database_connections, load_question_bank, prime_telegram_connections
+)
+from app.metrics import (
+    registry, monitor_event_loop_lag, WEBHOOK_REJECTIONS,
+    ACTIVE_PLAYERS, PENDING_TIMEOUTS
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +45,30 @@ app = FastAPI(
     version="2.0.0"
 )
 
+# Header Telegram uses to echo the secret_token passed to set_webhook
+WEBHOOK_SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Reasons a webhook request is rejected before processing
+WEBHOOK_REJECTION_REASONS = ("missing_secret", "invalid_secret", "unhandled_update_type", "lane_full", "draining")
+
+# Background tasks started with the application
+background_tasks = []
+
+
+def _count_with_session(count_function):
+    """Run a count query in its own session, for gauges evaluated at scrape time"""
+    def collect():
+        db = read_session()
+        try:
+            return count_function(db)
+        finally:
+            db.close()
+    return collect
+
+
+ACTIVE_PLAYERS.set_function(_count_with_session(count_active_players))
+PENDING_TIMEOUTS.set_function(_count_with_session(count_active_games))
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -30,14 +76,22 @@ async def startup_event():
     try:
         logger.info("Starting application...")
         
+        background_tasks.append(asyncio.create_task(monitor_event_loop_lag()))
+        configure_tracing()
+        
         # Try to initialize database (but don't fail if it's not available)
         try:
             # Wait for database to be ready
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    # Create database tables
+                    # Create database tables, game_events partitioned by month on Postgres
+                    with engine.begin() as conn:
+                        create_partitioned_events(conn)
                     Base.metadata.create_all(bind=engine)
+                    # Alter tables created by earlier versions, which create_all leaves alone
+                    run_migrations()
+                    run_maintenance(archive=False)
                     logger.info("Database tables created successfully")
                     break
                 except Exception as e:
@@ -49,17 +103,55 @@ async def startup_event():
         except Exception as e:
             logger.warning(f"Database initialization failed: {e}")
         
+        background_tasks.append(asyncio.create_task(invalidation_bus.run_listener()))
+        if replica_engine is not None:
+            background_tasks.append(asyncio.create_task(replica_monitor.run()))
+        
+        # Give open runs back the time a deploy took, before deadlines are loaded and checked
+        try:
+            report = await asyncio.to_thread(drain.resume)
+            hot_state = get_hot_state()
+            if report is not None and report.extension and hot_state:
+                await hot_state.shift_deadlines(to_timestamp(report.drained_at), report.extension)
+        except Exception as e:
+            logger.warning(f"Resuming after drain failed: {e}")
+        
+        # Reconcile live runs with Postgres, which rebuilds the timeout schedule, and start writing them
+        # and the game events behind
+        try:
+            await get_bot().start_state_writers()
+        except Exception as e:
+            logger.warning(f"Hot game state initialization failed: {e}")
+        
+        # Warm the connection pool and question cache so the first players do not pay for them
+        await readiness.stage("database_pool", open_database_connections)
+        await readiness.stage("question_bank", load_question_bank)
+        
         # Initialize bot and set webhook (but don't fail if token is missing)
         try:
             bot = get_bot()
             if bot.application:
-                await bot.application.bot.set_webhook(url=f"{settings.webhook_url}/webhook")
+                # Fetches the bot user, which command handlers need to match /commands
+                await bot.application.initialize()
+                await readiness.stage("telegram_pool", prime_telegram_connections, bot.application.bot)
+                await bot.application.bot.set_webhook(
+                    url=f"{settings.webhook_url}/webhook",
+                    secret_token=settings.webhook_secret,
+                    allowed_updates=bot.allowed_update_types
+                )
                 logger.info("Webhook set successfully")
+                if settings.update_lanes_enabled:
+                    update_lanes.start(bot.application.process_update)
             else:
                 logger.warning("Bot not initialized - webhook not set")
         except Exception as e:
             logger.warning(f"Bot initialization failed: {e}")
         
+        # Partition maintenance runs on the elected leader only, and so do timeout
+        # checks unless each replica holds its own runs in memory hot state
+        await get_bot().start_background_jobs()
+        
+        readiness.finish()
         logger.info("Application startup completed")
     except Exception as e:
         logger.error(f"Failed to initialize application: {e}")
@@ -67,14 +159,44 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Remove webhook on shutdown"""
+    """Drain accepted updates and persist state before exiting"""
+    # New updates are answered 503 and redelivered to the next process
+    drain.begin()
+    
+    try:
+        # Stop timing players out, and release the leader lease so another replica takes over quickly
+        await get_bot().stop_background_jobs()
+    except Exception as e:
+        logger.error(f"Failed to stop background jobs: {e}")
+    
+    abandoned = 0
+    try:
+        abandoned = await drain.wait_idle()
+        await update_lanes.stop()
+    except Exception as e:
+        logger.error(f"Failed to drain updates: {e}")
+    
+    try:
+        await get_bot().stop_state_writers()
+    except Exception as e:
+        logger.error(f"Failed to write hot game state and game events: {e}")
+    
+    try:
+        # Pending deadlines are durable now; the next process extends them by the downtime
+        await asyncio.to_thread(drain.save, abandoned)
+    except Exception as e:
+        logger.error(f"Failed to save drain marker: {e}")
+    
     try:
         bot = get_bot()
         if bot.application:
-            await bot.application.bot.delete_webhook()
-            logger.info("Webhook removed successfully")
+            # Kept by default: the next process (possibly already running) uses the same URL
+            if settings.delete_webhook_on_shutdown:
+                await bot.application.bot.delete_webhook()
+                logger.info("Webhook removed successfully")
+            await bot.application.shutdown()
     except Exception as e:
-        logger.error(f"Failed to remove webhook: {e}")
+        logger.error(f"Failed to shut down bot: {e}")
 
 
 @app.get("/")
@@ -90,17 +212,59 @@ async def root():
 @app.post("/webhook")
 async def webhook(request: Request):
     """Telegram webhook endpoint"""
+    arrived_at = time.time()
+    
+    # Reject unauthenticated requests by header comparison before reading the body
+    secret = request.headers.get(WEBHOOK_SECRET_HEADER)
+    if secret is None:
+        WEBHOOK_REJECTIONS.inc(reason="missing_secret")
+        return JSONResponse(status_code=401, content={"detail": "Missing secret token"})
+    if not hmac.compare_digest(secret.encode(), settings.webhook_secret.encode()):
+        WEBHOOK_REJECTIONS.inc(reason="invalid_secret")
+        return JSONResponse(status_code=403, content={"detail": "Invalid secret token"})
+    
+    if drain.draining:
+        WEBHOOK_REJECTIONS.inc(reason="draining")
+        return JSONResponse(status_code=503, content={"detail": "Shutting down, retry later"})
+    
     try:
         bot = get_bot()
         if not bot.application:
             raise HTTPException(status_code=500, detail="Bot not initialized")
-            
-        # Get update data
-        update_data = await request.json()
-        update = Update.de_json(update_data, bot.application.bot)
         
-        # Process update
-        await bot.application.process_update(update)
+        with start_trace("webhook") as root:
+            with span("webhook.receive"):
+                # Get update data
+                update_data = await request.json()
+                
+                # Skip update types no handler would process
+                if not any(key in update_data for key in bot.allowed_update_types):
+                    WEBHOOK_REJECTIONS.inc(reason="unhandled_update_type")
+                    return JSONResponse(content={"status": "ignored"})
+                
+                capture = get_recorder()
+                if capture:
+                    capture.record(update_data, arrived_at)
+                
+                update = Update.de_json(update_data, bot.application.bot)
+            
+            if root is not None:
+                root.attributes["update_id"] = update.update_id
+                if update.effective_user:
+                    root.attributes["user_id"] = update.effective_user.id
+            mark_received()
+            
+            # Queue the update in its priority lane, or process it inline without lanes
+            if update_lanes.running:
+                if not update_lanes.submit(update, update_kind(update)):
+                    WEBHOOK_REJECTIONS.inc(reason="lane_full")
+                    return JSONResponse(status_code=503, content={"detail": "Busy, retry later"})
+            else:
+                admission.update_started()
+                try:
+                    await bot.application.process_update(update)
+                finally:
+                    admission.update_finished()
         
         return JSONResponse(content={"status": "ok"})
     except Exception as e:
@@ -118,7 +282,13 @@ async def health_check():
             "bot_token_configured": bool(settings.telegram_bot_token),
             "bot_initialized": bool(bot.application),
             "database_configured": bool(settings.database_url),
-            "webhook_url": settings.webhook_url
+            "webhook_url": settings.webhook_url,
+            "draining": drain.draining,
+            "last_resume": drain.last_resume.to_dict() if drain.last_resume else None,
+            "webhook_rejections": {
+                reason: int(WEBHOOK_REJECTIONS.value(reason=reason))
+                for reason in WEBHOOK_REJECTION_REASONS
+            }
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -128,6 +298,25 @@ async def health_check():
         }
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness check: 200 once warm-up is done, 503 before that and while draining"""
+    is_ready = readiness.ready and not drain.draining
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={
+            "status": "ready" if is_ready else ("draining" if drain.draining else "warming_up"),
+            "stages": readiness.report(),
+        }
+    )
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 # Admin endpoints
 def verify_admin(telegram_id: int):
     """Verify if user is admin"""
@@ -138,7 +327,7 @@ def verify_admin(telegram_id: int):
 @app.get("/admin/stats")
 async def admin_stats(
     telegram_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get game statistics (admin only)"""
     verify_admin(telegram_id)
@@ -154,7 +343,7 @@ async def admin_stats(
 @app.get("/admin/players")
 async def admin_players(
     telegram_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get all active players (admin only)"""
     verify_admin(telegram_id)
@@ -180,7 +369,7 @@ async def admin_players(
 async def admin_leaderboard(
     telegram_id: int,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get leaderboard (admin only)"""
     verify_admin(telegram_id)
@@ -214,9 +403,20 @@ async def admin_reset_game(
     try:
         # Reset all players to eliminated state
         db.execute("UPDATE players SET game_state = 'eliminated', current_gate = 1")
-        db.execute("UPDATE games SET status = 'failed'")
+        # Close every open attempt; games only holds in-flight gates
+        db.query(Attempt).filter(Attempt.outcome == GameState.ACTIVE).update(
+            {Attempt.outcome: GameState.ELIMINATED, Attempt.ended_at: clock.now()},
+            synchronize_session=False
+        )
+        db.query(Game).delete(synchronize_session=False)
         db.commit()
         
+        hot_state = get_hot_state()
+        if hot_state:
+            await hot_state.store.clear()
+        # Other replicas drop their in-process run state too
+        invalidation_bus.publish(GAME_RESET)
+        
         return {"message": "Game reset successfully"}
     except Exception as e:
         logger.error(f"Error resetting game: {e}")
@@ -0,0 +1,380 @@
+"""
+Lightweight Prometheus-style metrics for the 100 Gates bot.
+
+Metrics live in process memory and are rendered in the Prometheus text
+exposition format by the /metrics endpoint. Recording is a dict lookup and
+a few additions under a lock, so it is cheap enough to leave on in production.
+"""
+
+import asyncio
+import bisect
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: List["Metric"] = []
+
+    def register(self, metric: "Metric"):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format"""
+        return "".join(metric.render() for metric in self._metrics)
+
+
+registry = Registry()
+
+
+class Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Sequence[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = [
+            '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for name, value in pairs
+        ]
+        return "{" + ",".join(escaped) + "}"
+
+    def samples(self) -> List[str]:
+        return []
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def total(self) -> float:
+        """Sum over all label sets"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in items]
+
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def set_function(self, function: Callable[[], float]):
+        """Compute the (unlabelled) value at scrape time instead of on every change"""
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f"{self.name} {float(self._function())}"]
+            except Exception as e:
+                logger.warning(f"Failed to collect gauge {self.name}: {e}")
+                return []
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in items]
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), [0.0])
+                self._values[key] = entry
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (inf past the last bucket), None when empty"""
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            counts = list(entry[0]) if entry else []
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', str(bound))])} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+# Bot handlers
+HANDLER_LATENCY = Histogram(
+    "gates_handler_duration_seconds",
+    "Time spent in Telegram update handlers",
+    ["handler"]
+)
+HANDLER_ERRORS = Counter(
+    "gates_handler_errors_total",
+    "Exceptions raised by Telegram update handlers",
+    ["handler"]
+)
+
+# Database
+CRUD_LATENCY = Histogram(
+    "gates_crud_duration_seconds",
+    "Time spent in crud functions",
+    ["function"]
+)
+CRUD_STATEMENTS = Counter(
+    "gates_crud_statements_total",
+    "SQL statements executed, attributed to the innermost crud function",
+    ["function"]
+)
+SLOW_QUERIES = Counter(
+    "gates_slow_queries_total",
+    "SQL statements slower than the slow query threshold",
+    ["function"]
+)
+HANDLER_STATEMENTS = Histogram(
+    "gates_handler_statements",
+    "SQL statements issued per handled update",
+    ["handler"],
+    buckets=(1, 2, 4, 6, 8, 12, 16, 24, 32, 64, 128)
+)
+
+# Game event log
+EVENT_LOG_BUFFERED = Gauge(
+    "gates_event_log_buffered",
+    "Game events waiting in memory to be written"
+)
+EVENT_LOG_WRITTEN = Counter(
+    "gates_event_log_written_total",
+    "Game events written to the database"
+)
+EVENT_LOG_BACKPRESSURE = Histogram(
+    "gates_event_log_backpressure_seconds",
+    "Time handlers waited for room in a full event buffer"
+)
+
+DB_POOL_WAIT = Histogram(
+    "gates_db_pool_wait_seconds",
+    "Time spent waiting for a connection from the primary's pool"
+)
+
+REPLICA_LAG = Gauge(
+    "gates_replica_lag_seconds",
+    "Measured read replica lag, -1 while the replica is unreachable"
+)
+READ_ROUTING = Counter(
+    "gates_read_routing_total",
+    "Statements from read sessions by the database they were sent to",
+    ["target"]
+)
+
+# Outbound Telegram Bot API
+TELEGRAM_API_LATENCY = Histogram(
+    "gates_telegram_api_duration_seconds",
+    "Latency of outbound Telegram Bot API calls",
+    ["method"]
+)
+TELEGRAM_API_RESPONSES = Counter(
+    "gates_telegram_api_responses_total",
+    "Outbound Telegram Bot API calls by HTTP status code or error",
+    ["method", "code"]
+)
+
+TELEGRAM_POOL_WAIT = Histogram(
+    "gates_telegram_pool_wait_seconds",
+    "Time outbound Bot API calls waited for a connection from their pool",
+    ["pool"]
+)
+TELEGRAM_CONNECT_TIME = Histogram(
+    "gates_telegram_connect_seconds",
+    "Time spent opening new Bot API connections (TCP and TLS)",
+    ["pool"]
+)
+TELEGRAM_NETWORK_TIME = Histogram(
+    "gates_telegram_network_seconds",
+    "Time from sending a Bot API request to receiving its response headers",
+    ["method"]
+)
+TELEGRAM_CONNECTIONS = Counter(
+    "gates_telegram_connections_total",
+    "Bot API calls by whether they opened a new connection or reused a kept-alive one",
+    ["pool", "connection"]
+)
+
+# Webhook ingress
+WEBHOOK_REJECTIONS = Counter(
+    "gates_webhook_rejections_total",
+    "Webhook requests rejected before processing",
+    ["reason"]
+)
+LANE_QUEUE_WAIT = Histogram(
+    "gates_lane_queue_wait_seconds",
+    "Time updates waited in their priority lane before a worker took them",
+    ["lane"]
+)
+LANE_DEPTH = Gauge(
+    "gates_lane_depth",
+    "Updates waiting in each priority lane",
+    ["lane"]
+)
+ADMISSION_PRESSURE = Gauge(
+    "gates_admission_pressure",
+    "Largest of smoothed queue wait, pool wait and backlog over their thresholds; shedding starts at 1"
+)
+SHED_UPDATES = Counter(
+    "gates_shed_updates_total",
+    "Updates answered without the database (degraded) or dropped under load",
+    ["kind", "action"]
+)
+RATE_LIMITED_UPDATES = Counter(
+    "gates_rate_limited_updates_total",
+    "Updates over their sender's flood control budget, by kind and whether they were answered or dropped",
+    ["kind", "action"]
+)
+THROTTLED_USERS = Counter(
+    "gates_throttled_users_total",
+    "Times a user went over a flood control budget (first rejection of each burst)",
+    ["kind"]
+)
+
+# Deploys
+DRAIN_ABANDONED_UPDATES = Counter(
+    "gates_drain_abandoned_updates_total",
+    "Accepted updates still unfinished when the drain deadline passed"
+)
+DEPLOY_DEADLINE_EXTENSIONS = Counter(
+    "gates_deploy_deadline_extensions_total",
+    "Active runs whose deadline was pushed back by the downtime of a deploy"
+)
+DEPLOY_ELIMINATIONS = Counter(
+    "gates_deploy_eliminations_total",
+    "Runs timed out between a drain starting and the next process resuming"
+)
+
+WARMUP_STAGE_SECONDS = Gauge(
+    "gates_warmup_stage_seconds",
+    "Time each warm-up stage took at the last start",
+    ["stage"]
+)
+
+# Runtime
+EVENT_LOOP_LAG = Gauge(
+    "gates_event_loop_lag_seconds",
+    "Delay between scheduled and actual wake-up of the event loop monitor"
+)
+IS_LEADER = Gauge(
+    "gates_is_leader",
+    "1 while this replica holds the leader lease and runs the singleton jobs"
+)
+LEADER_TRANSITIONS = Counter(
+    "gates_leader_transitions_total",
+    "Times this replica was elected leader or lost the lease",
+    ["change"]
+)
+ACTIVE_PLAYERS = Gauge(
+    "gates_active_players",
+    "Players with a run in progress"
+)
+PENDING_TIMEOUTS = Gauge(
+    "gates_pending_timeouts",
+    "Active games waiting for an answer or a timeout"
+)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Background task measuring how late the event loop wakes up"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.set(max(loop.time() - started - interval, 0.0))
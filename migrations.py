@@ -0,0 +1,233 @@
+"""
+Schema changes ``create_all`` cannot make to existing tables.
+
+``create_all`` creates missing tables (such as ``attempts``) but never alters
+one that exists. Databases created before runs moved to ``attempts`` and
+gates got question pools need, in this order:
+
+- ``games.attempt_id``, added as a nullable column;
+- an ``attempts`` row for every legacy run, built from its per-gate
+  ``games`` rows: start and end, final gate, outcome, and the time spent on
+  each passed gate from the gap to the next gate's row. A run still in
+  flight keeps its current ``games`` row, linked to its new attempt; the
+  other legacy rows are then deleted, in the same transaction, since
+  ``games`` now holds only the gate in flight. Only the player's latest run
+  knows its elimination reason, from ``players``;
+- a unique index on ``games.player_id``;
+- the unique constraint on ``questions.gate_number`` replaced with
+  ``uq_questions_gate_text`` on (gate_number, question_text), the conflict
+  target of the question bank import.
+
+Every step checks the schema or the data first, so running the migrations
+again changes nothing. Startup runs them after ``create_all``; they can also
+be run by hand:
+
+    python -m app.migrations
+"""
+
+import logging
+from itertools import groupby
+from typing import List
+
+from sqlalchemy import MetaData, inspect, select, text
+from sqlalchemy.schema import CreateTable
+
+from app.database import Base, engine
+from app.attempts import pack_gate_times
+from app.models import Attempt, Game, GameState, GameStatus, Player, Question
+
+logger = logging.getLogger(__name__)
+
+GAMES_PLAYER_INDEX = "uq_games_player_id"
+QUESTIONS_NATURAL_KEY = "uq_questions_gate_text"
+# Rows per INSERT and per IN list while backfilling attempts
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _unique_columns(conn, table_name: str) -> List[List[str]]:
+    """Column lists of every unique constraint and unique index on a table"""
+    inspector = inspect(conn)
+    uniques = [c["column_names"] for c in inspector.get_unique_constraints(table_name)]
+    uniques += [i["column_names"] for i in inspector.get_indexes(table_name) if i["unique"]]
+    return uniques
+
+
+def add_games_attempt_id(conn) -> bool:
+    columns = {column["name"] for column in inspect(conn).get_columns("games")}
+    if "attempt_id" in columns:
+        return False
+    conn.execute(text("ALTER TABLE games ADD COLUMN attempt_id INTEGER REFERENCES attempts (id)"))
+    return True
+
+
+def _gate_ms(start, end) -> int:
+    if start is None or end is None:
+        return 0
+    return int((end - start).total_seconds() * 1000)
+
+
+def _legacy_runs(rows):
+    """Split one player's legacy games rows, oldest first, into runs; a run starts at gate 1"""
+    runs = []
+    for row in rows:
+        if not runs or row.gate_number <= runs[-1][-1].gate_number:
+            runs.append([])
+        runs[-1].append(row)
+    return runs
+
+
+def _legacy_attempt(player, run, next_start, latest: bool) -> dict:
+    """Attempt row for one legacy run; ``next_start`` is when the player's following run began"""
+    last = run[-1]
+    # A gate ended when the next gate's row was created, or the run when the player finished
+    ends = [row.start_time for row in run[1:]]
+    ends.append(player.completed_at if latest and player.completed_at else None)
+    passed = [_gate_ms(row.start_time, end) for row, end in zip(run, ends) if row.status == GameStatus.COMPLETED]
+    attempt = {
+        "player_id": player.id,
+        "started_at": run[0].start_time or run[0].timeout_at,
+        "final_gate": last.gate_number,
+        "gate_times": pack_gate_times(passed),
+        "elimination_reason": None,
+    }
+    if latest and last.status == GameStatus.ACTIVE and player.game_state == GameState.ACTIVE:
+        attempt.update(outcome=GameState.ACTIVE, ended_at=None)
+    elif last.status == GameStatus.COMPLETED:
+        attempt.update(outcome=GameState.COMPLETED, ended_at=ends[-1] or last.start_time)
+    else:
+        # Failed, or left open by a restart, which now ends a run as eliminated
+        ended_at = min(last.timeout_at, next_start) if next_start is not None else last.timeout_at
+        attempt.update(outcome=GameState.ELIMINATED, ended_at=ended_at)
+        if latest and last.status == GameStatus.FAILED:
+            attempt["elimination_reason"] = player.elimination_reason
+    return attempt
+
+
+def backfill_attempts(conn) -> int:
+    """Turn the legacy per-gate games rows into attempts, then delete all but the live rows
+
+    Rows without an attempt are legacy; runs started since have one, so this
+    only ever touches old history. Returns the number of attempts created.
+    """
+    games, players, attempts = Game.__table__, Player.__table__, Attempt.__table__
+    legacy = conn.execute(
+        select(games.c.id, games.c.player_id, games.c.gate_number, games.c.start_time,
+               games.c.timeout_at, games.c.status)
+        .where(games.c.attempt_id.is_(None))
+        .order_by(games.c.player_id, games.c.id)
+    ).all()
+    if not legacy:
+        return 0
+    player_ids = sorted({row.player_id for row in legacy})
+    player_rows = {}
+    for start in range(0, len(player_ids), BACKFILL_BATCH_SIZE):
+        chunk = player_ids[start:start + BACKFILL_BATCH_SIZE]
+        for row in conn.execute(
+            select(players.c.id, players.c.game_state, players.c.elimination_reason, players.c.completed_at)
+            .where(players.c.id.in_(chunk))
+        ):
+            player_rows[row.id] = row
+
+    finished = []
+    live = []
+    for player_id, rows in groupby(legacy, key=lambda row: row.player_id):
+        player = player_rows.get(player_id)
+        if player is None:
+            continue
+        runs = _legacy_runs(list(rows))
+        for index, run in enumerate(runs):
+            latest = index == len(runs) - 1
+            next_start = None if latest else runs[index + 1][0].start_time
+            attempt = _legacy_attempt(player, run, next_start, latest)
+            if attempt["outcome"] == GameState.ACTIVE:
+                live.append((run[-1].id, attempt))
+            else:
+                finished.append(attempt)
+
+    for start in range(0, len(finished), BACKFILL_BATCH_SIZE):
+        conn.execute(attempts.insert(), finished[start:start + BACKFILL_BATCH_SIZE])
+    # Runs in flight keep their games row, now linked to the attempt
+    for game_id, attempt in live:
+        attempt_id = conn.execute(attempts.insert().values(**attempt)).inserted_primary_key[0]
+        conn.execute(games.update().where(games.c.id == game_id).values(attempt_id=attempt_id))
+    conn.execute(games.delete().where(games.c.attempt_id.is_(None)))
+    return len(finished) + len(live)
+
+
+def add_games_player_unique(conn) -> bool:
+    if ["player_id"] in _unique_columns(conn, "games"):
+        return False
+    conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {GAMES_PLAYER_INDEX} ON games (player_id)"))
+    return True
+
+
+def _rebuild_sqlite_questions(conn):
+    """SQLite cannot drop a constraint: copy questions into a table created from the model"""
+    table = Question.__table__
+    staging = table.to_metadata(MetaData(), name="questions_migrating")
+    conn.execute(CreateTable(staging))
+    names = ", ".join(column.name for column in table.columns)
+    conn.execute(text(f"INSERT INTO questions_migrating ({names}) SELECT {names} FROM questions"))
+    conn.execute(text("DROP TABLE questions"))
+    # Renamed rather than recreated, so games.question_id keeps pointing at "questions"
+    conn.execute(text("ALTER TABLE questions_migrating RENAME TO questions"))
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def replace_questions_unique(conn) -> bool:
+    """Swap the unique gate_number for the (gate_number, question_text) natural key"""
+    inspector = inspect(conn)
+    unique_gate = [c for c in inspector.get_unique_constraints("questions") if c["column_names"] == ["gate_number"]]
+    # Indexes backing a constraint go with it
+    unique_gate_indexes = [
+        i for i in inspector.get_indexes("questions")
+        if i["unique"] and i["column_names"] == ["gate_number"] and not i.get("duplicates_constraint")
+    ]
+    has_natural_key = ["gate_number", "question_text"] in _unique_columns(conn, "questions")
+    if not (unique_gate or unique_gate_indexes) and has_natural_key:
+        return False
+
+    if unique_gate and conn.dialect.name == "sqlite":
+        _rebuild_sqlite_questions(conn)
+        return True
+    for constraint in unique_gate:
+        conn.execute(text(f'ALTER TABLE questions DROP CONSTRAINT "{constraint["name"]}"'))
+    for index in unique_gate_indexes:
+        conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+    if not has_natural_key:
+        conn.execute(text(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {QUESTIONS_NATURAL_KEY} ON questions (gate_number, question_text)"
+        ))
+    for index in Question.__table__.indexes:
+        index.create(conn, checkfirst=True)
+    return True
+
+
+def run_migrations() -> List[str]:
+    """Bring tables created by earlier versions up to the models; returns the steps applied"""
+    applied = []
+    with engine.begin() as conn:
+        if not inspect(conn).has_table("games"):
+            return applied
+        if add_games_attempt_id(conn):
+            applied.append("games.attempt_id")
+        backfilled = backfill_attempts(conn)
+        if backfilled:
+            applied.append(f"{backfilled} attempts from legacy games rows")
+        if add_games_player_unique(conn):
+            applied.append(GAMES_PLAYER_INDEX)
+        if inspect(conn).has_table("questions") and replace_questions_unique(conn):
+            applied.append(QUESTIONS_NATURAL_KEY)
+    if applied:
+        logger.info(f"Applied migrations: {', '.join(applied)}")
+    return applied
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    print(run_migrations())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, Text, ForeignKey, Enum, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -22,6 +22,14 @@ class GameStatus(enum.Enum):
     FAILED = "failed"
 
 
+class GameEventType(enum.Enum):
+    STARTED = "started"
+    ANSWERED = "answered"
+    ADVANCED = "advanced"
+    ELIMINATED = "eliminated"
+    COMPLETED = "completed"
+
+
 class Player(Base):
     __tablename__ = "players"
     
@@ -37,13 +45,16 @@ class Player(Base):
     
     # Relationships
     games = relationship("Game", back_populates="player")
+    attempts = relationship("Attempt", back_populates="player")
 
 
 class Game(Base):
+    """The gate a player is answering right now; history is kept in attempts"""
     __tablename__ = "games"
     
     id = Column(Integer, primary_key=True, index=True)
-    player_id = Column(Integer, ForeignKey("players.id"), nullable=False)
+    player_id = Column(Integer, ForeignKey("players.id"), unique=True, nullable=False)
+    attempt_id = Column(Integer, ForeignKey("attempts.id"), nullable=True)
     gate_number = Column(Integer, nullable=False)
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
     start_time = Column(DateTime(timezone=True), server_default=func.now())
@@ -52,17 +63,81 @@ class Game(Base):
     
     # Relationships
     player = relationship("Player", back_populates="games")
+    attempt = relationship("Attempt")
     question = relationship("Question")
 
 
+class Attempt(Base):
+    """One row per run, with the time spent on each passed gate packed into gate_times"""
+    __tablename__ = "attempts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    player_id = Column(Integer, ForeignKey("players.id"), nullable=False, index=True)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    ended_at = Column(DateTime(timezone=True), nullable=True)
+    final_gate = Column(Integer, nullable=False, default=1)
+    outcome = Column(Enum(GameState), nullable=False, default=GameState.ACTIVE)
+    elimination_reason = Column(Enum(EliminationReason), nullable=True)
+    # Little-endian uint16 milliseconds per passed gate, see app.attempts
+    gate_times = Column(LargeBinary, nullable=False, default=b"")
+    
+    # Relationships
+    player = relationship("Player", back_populates="attempts")
+
+
 class Question(Base):
+    """One question in a gate's pool; each run is served one question per gate"""
     __tablename__ = "questions"
     
     id = Column(Integer, primary_key=True, index=True)
-    gate_number = Column(Integer, unique=True, nullable=False)
+    gate_number = Column(Integer, index=True, nullable=False)
     question_text = Column(Text, nullable=False)
     option_a = Column(String, nullable=False)
     option_b = Column(String, nullable=False)
     option_c = Column(String, nullable=False)
     option_d = Column(String, nullable=False)
-    correct_answer = Column(String(1), nullable=False)  # A, B, C, or D 
\ No newline at end of file
+    correct_answer = Column(String(1), nullable=False)  # A, B, C, or D 
+
+    __table_args__ = (
+        # Natural key for bulk imports: the same text in the same gate is the same question
+        UniqueConstraint("gate_number", "question_text", name="uq_questions_gate_text"),
+    )
+
+
+class GameEvent(Base):
+    """Append-only history of runs; rows are never updated"""
+    __tablename__ = "game_events"
+    
+    # BIGINT on Postgres; SQLite only autoincrements INTEGER primary keys
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    # No foreign keys, so batches can be appended without per-row lookups
+    player_id = Column(Integer, nullable=False)
+    event_type = Column(Enum(GameEventType), nullable=False)
+    gate_number = Column(Integer, nullable=False)
+    question_id = Column(Integer, nullable=True)
+    answer = Column(String(1), nullable=True)
+    correct = Column(Boolean, nullable=True)
+    latency_ms = Column(Integer, nullable=True)
+    elimination_reason = Column(Enum(EliminationReason), nullable=True)
+    occurred_at = Column(DateTime(timezone=True), nullable=False)
+    
+    __table_args__ = (
+        Index("ix_game_events_player_id_id", "player_id", "id"),
+    )
+
+
+class RuntimeState(Base):
+    """Small named JSON documents a process leaves for the next one, such as the drain marker"""
+    __tablename__ = "runtime_state"
+    
+    key = Column(String, primary_key=True)
+    value = Column(Text, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class CacheVersion(Base):
+    """Version of each cache topic, bumped by app.invalidation when it changes"""
+    __tablename__ = "cache_versions"
+    
+    topic = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
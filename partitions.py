@@ -0,0 +1,221 @@
+"""
+Monthly partitions for the game event log, with archival of old months.
+
+On Postgres ``game_events`` is created as a table partitioned by RANGE on
+``occurred_at``, one partition per month. Recent events, which every query
+in the bot reads, stay in a small, cache-resident partition. Old months are
+detached, written to ``EVENT_ARCHIVE_DIR`` as gzipped CSV (``COPY`` format)
+and dropped, so they cost neither index maintenance nor vacuum. Other
+databases keep the plain table.
+
+The maintenance job creates the coming months ahead of time and archives
+months older than EVENT_RETENTION_MONTHS. It is idempotent and can also be
+run by hand:
+
+    python -m app.partitions [--archive]
+"""
+
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import re
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import BigInteger, Column, Enum, Index, MetaData, Table, inspect, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.clock import clock
+from app.config import settings
+from app.database import engine
+from app.models import GameEvent
+
+logger = logging.getLogger(__name__)
+
+PARTITION_KEY = "occurred_at"
+PARTITION_NAME = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def month_start(value: date, offset: int = 0) -> date:
+    """First day of the month ``offset`` months after ``value``"""
+    index = value.year * 12 + value.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table_name: str, month: date) -> str:
+    return f"{table_name}_y{month.year:04d}m{month.month:02d}"
+
+
+def partitioned_table(table: Table, name: Optional[str] = None) -> Table:
+    """Copy of ``table`` partitioned by month, keyed on (id, occurred_at) as Postgres requires"""
+    metadata = MetaData()
+    columns = []
+    for column in table.columns:
+        if column.name == "id":
+            columns.append(Column("id", BigInteger, primary_key=True, autoincrement=True))
+        else:
+            columns.append(Column(
+                column.name, column.type.copy(),
+                primary_key=column.name == PARTITION_KEY,
+                nullable=column.nullable
+            ))
+    copy = Table(
+        name or table.name, metadata, *columns,
+        postgresql_partition_by=f"RANGE ({PARTITION_KEY})"
+    )
+    for index in table.indexes:
+        Index(index.name.replace(table.name, copy.name, 1), *[copy.c[c.name] for c in index.columns])
+    return copy
+
+
+def create_partitioned_events(conn, name: Optional[str] = None) -> bool:
+    """Create game_events as a partitioned table if it does not exist yet; returns True if created"""
+    table = partitioned_table(GameEvent.__table__, name)
+    if conn.dialect.name != "postgresql" or inspect(conn).has_table(table.name):
+        return False
+    for column in table.columns:
+        if isinstance(column.type, Enum):
+            column.type.create(conn, checkfirst=True)
+    conn.execute(CreateTable(table))
+    for index in table.indexes:
+        conn.execute(CreateIndex(index))
+    logger.info(f"Created {table.name} partitioned by month")
+    return True
+
+
+def is_partitioned(conn, table_name: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name)"),
+        {"name": table_name}
+    ).scalar())
+
+
+def list_partitions(conn, table_name: str) -> List[Tuple[str, date]]:
+    """Monthly partitions attached to ``table_name`` with the month they hold, oldest first"""
+    rows = conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(:name)"
+        ),
+        {"name": table_name}
+    )
+    partitions = []
+    for (name,) in rows:
+        match = PARTITION_NAME.search(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def ensure_partitions(conn, table_name: str, months_ahead: int) -> List[str]:
+    """Create partitions from the current month to ``months_ahead`` months ahead"""
+    current = month_start(clock.now().date())
+    created = []
+    existing = {name for name, _ in list_partitions(conn, table_name)}
+    for offset in range(months_ahead + 1):
+        month = month_start(current, offset)
+        name = partition_name(table_name, month)
+        if name in existing:
+            continue
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table_name} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{month_start(month, 1).isoformat()}')"
+        ))
+        created.append(name)
+    return created
+
+
+def _export_table(conn, name: str, path: str):
+    """Stream a table to a gzipped CSV file with COPY"""
+    sql = f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)"
+    cursor = conn.connection.cursor()
+    try:
+        with gzip.open(path, "wb") as out:
+            if hasattr(cursor, "copy"):
+                # psycopg 3
+                with cursor.copy(sql) as copy:
+                    for data in copy:
+                        out.write(data)
+            else:
+                # psycopg2
+                cursor.copy_expert(sql, out)
+    finally:
+        cursor.close()
+
+
+def archive_partitions(table_name: str, retention_months: int, archive_dir: str) -> List[str]:
+    """Detach, export and drop partitions holding only months older than the retention window"""
+    cutoff = month_start(clock.now().date(), -retention_months)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    with engine.connect() as conn:
+        old = [(name, month) for name, month in list_partitions(conn, table_name) if month < cutoff]
+
+    archived = []
+    for name, month in old:
+        path = os.path.join(archive_dir, f"{name}.csv.gz")
+        # Detach in its own transaction so the export does not hold a lock on the parent
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table_name} DETACH PARTITION {name}"))
+        try:
+            with engine.begin() as conn:
+                _export_table(conn, name, f"{path}.tmp")
+                os.replace(f"{path}.tmp", path)
+                conn.execute(text(f"DROP TABLE {name}"))
+        except Exception:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"ALTER TABLE {table_name} ATTACH PARTITION {name} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{month_start(month, 1).isoformat()}')"
+                ))
+            raise
+        logger.info(f"Archived partition {name} to {path}")
+        archived.append(name)
+    return archived
+
+
+def run_maintenance(archive: bool = True) -> dict:
+    """Create upcoming partitions and, when an archive directory is set, archive old ones"""
+    table_name = GameEvent.__tablename__
+    with engine.begin() as conn:
+        if not is_partitioned(conn, table_name):
+            return {"partitioned": False}
+        created = ensure_partitions(conn, table_name, settings.event_partition_months_ahead)
+
+    archived = []
+    if archive and settings.event_archive_dir:
+        archived = archive_partitions(table_name, settings.event_retention_months, settings.event_archive_dir)
+    return {"partitioned": True, "created": created, "archived": archived}
+
+
+async def run_maintenance_loop():
+    """Background task running partition maintenance every maintenance interval"""
+    interval = settings.partition_maintenance_interval_hours * 3600
+    while True:
+        try:
+            result = await asyncio.to_thread(run_maintenance)
+            if result.get("created") or result.get("archived"):
+                logger.info(f"Partition maintenance: {result}")
+        except Exception as e:
+            logger.error(f"Error in partition maintenance: {e}")
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain monthly game_events partitions")
+    parser.add_argument("--archive", action="store_true",
+                        help="also archive partitions older than EVENT_RETENTION_MONTHS")
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        create_partitioned_events(conn)
+    print(run_maintenance(archive=args.archive))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+In-memory index of the quiz polls sent for gates (GATE_DELIVERY=quiz_poll).
+
+A ``PollAnswer`` update carries only the poll id and the user. The index maps
+each poll to its player and remembers the latest poll sent to every player,
+so answers to polls of earlier gates or earlier runs can be told apart from
+an answer to the current gate without touching the database.
+
+The index is per process and bounded; the oldest polls are forgotten first.
+An answer to a poll this process does not know (sent by another replica, or
+before a restart) is taken as an answer to the current gate.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+DEFAULT_MAX_POLLS = 100_000
+
+
+class PollIndex:
+    def __init__(self, max_polls: int = DEFAULT_MAX_POLLS):
+        self.max_polls = max_polls
+        self._players: "OrderedDict[str, int]" = OrderedDict()
+        self._latest: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def add(self, poll_id: str, telegram_id: int):
+        """Record a poll just sent to a player; it supersedes the player's earlier polls"""
+        with self._lock:
+            previous = self._latest.get(telegram_id)
+            if previous is not None:
+                self._players.pop(previous, None)
+            self._players[poll_id] = telegram_id
+            self._latest[telegram_id] = poll_id
+            while len(self._players) > self.max_polls:
+                old_poll, old_player = self._players.popitem(last=False)
+                if self._latest.get(old_player) == old_poll:
+                    del self._latest[old_player]
+
+    def claim(self, poll_id: str, telegram_id: int) -> bool:
+        """Whether an answer to ``poll_id`` counts for the player's current gate; forgets the poll"""
+        with self._lock:
+            owner = self._players.pop(poll_id, None)
+            if owner is None:
+                # Superseded, or sent elsewhere: it counts unless this process sent a newer one
+                return telegram_id not in self._latest
+            if owner != telegram_id:
+                return False
+            self._latest.pop(telegram_id, None)
+            return True
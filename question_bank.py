@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Bulk import and export of the question bank.
+
+Questions stream from CSV (header row with the ``QuestionCreate`` field
+names) or JSON lines, are validated with ``QuestionCreate`` and upserted in
+multi-row ``INSERT ... ON CONFLICT (gate_number, question_text) DO UPDATE``
+batches inside one transaction: either the whole file is applied or none of
+it. A gate may have any number of questions, which form its pool. Importing
+the same file twice is a no-op, and editing a question's options or answer
+and re-importing updates it in place. After committing, every replica's
+question cache is invalidated.
+
+Usage:
+    python -m app.question_bank import questions.csv
+    python -m app.question_bank import questions.jsonl --dry-run
+    python -m app.question_bank export questions.jsonl
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import sys
+import time
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select
+
+from app.database import engine
+from app.invalidation import QUESTIONS, invalidation_bus
+from app.models import Question
+from app.schemas import QuestionCreate
+
+logger = logging.getLogger(__name__)
+
+FIELDS = list(QuestionCreate.__fields__)
+ANSWERS = ("A", "B", "C", "D")
+# Natural key of a question, matching the uq_questions_gate_text constraint
+KEY = ("gate_number", "question_text")
+DEFAULT_BATCH_SIZE = 1000
+
+
+class QuestionImportError(ValueError):
+    """Raised when rows fail validation; nothing is written"""
+
+    def __init__(self, errors: List[Tuple[int, str]]):
+        self.errors = errors
+        shown = "; ".join(f"row {row}: {message}" for row, message in errors[:10])
+        more = f" (and {len(errors) - 10} more)" if len(errors) > 10 else ""
+        super().__init__(f"{len(errors)} invalid question rows: {shown}{more}")
+
+
+def detect_format(path: str) -> str:
+    return "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+class MalformedRow:
+    """A line that could not be decoded; validate_rows reports it with the other bad rows"""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield (row number, raw row) pairs from a CSV or JSON lines stream"""
+    if fmt == "csv":
+        # Row 1 is the header
+        for number, row in enumerate(csv.DictReader(stream), 2):
+            yield number, row
+    elif fmt == "jsonl":
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield number, MalformedRow(f"invalid JSON: {e}")
+    else:
+        raise ValueError(f"Unknown question format: {fmt}")
+
+
+def _shape_error(row) -> Optional[str]:
+    """Why ``row`` cannot be a question before looking at its values, or None"""
+    if isinstance(row, MalformedRow):
+        return row.message
+    if not isinstance(row, dict):
+        return f"expected an object with the question fields, got {type(row).__name__}"
+    # csv.DictReader puts the cells beyond the header under None
+    if None in row:
+        return "more columns than the header"
+    missing = [field for field in FIELDS if row.get(field) is None]
+    if missing:
+        return f"missing {', '.join(missing)}"
+    return None
+
+
+def validate_rows(rows: Iterable[Tuple[int, object]]) -> List[dict]:
+    """Validate every row with QuestionCreate; raises QuestionImportError listing all bad rows"""
+    questions = {}
+    errors = []
+    for number, row in rows:
+        error = _shape_error(row)
+        if error:
+            errors.append((number, error))
+            continue
+        try:
+            question = QuestionCreate(**row)
+        except ValidationError as e:
+            errors.append((number, str(e).replace("\n", " ")))
+            continue
+        values = question.dict()
+        values["correct_answer"] = values["correct_answer"].strip().upper()
+        if values["correct_answer"] not in ANSWERS:
+            errors.append((number, f"correct_answer must be one of {', '.join(ANSWERS)}"))
+            continue
+        if values["gate_number"] < 1:
+            errors.append((number, "gate_number must be positive"))
+            continue
+        # Within one file the last row for a question wins, as it would row by row
+        questions[(values["gate_number"], values["question_text"])] = values
+    if errors:
+        raise QuestionImportError(errors)
+    return list(questions.values())
+
+
+def _upsert_statement(conn, batch: List[dict]):
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif conn.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    statement = insert(Question.__table__).values(batch)
+    return statement.on_conflict_do_update(
+        index_elements=[Question.gate_number, Question.question_text],
+        set_={field: statement.excluded[field] for field in FIELDS if field not in KEY},
+    )
+
+
+def upsert_questions(questions: List[dict], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Insert or update ``questions`` by (gate, text) in one transaction; returns the row count"""
+    table = Question.__table__
+    with engine.begin() as conn:
+        for offset in range(0, len(questions), batch_size):
+            batch = questions[offset:offset + batch_size]
+            statement = _upsert_statement(conn, batch)
+            if statement is not None:
+                conn.execute(statement)
+                continue
+            # No ON CONFLICT support: update what exists, insert the rest
+            gates = {question["gate_number"] for question in batch}
+            existing = set(conn.execute(
+                select(table.c.gate_number, table.c.question_text).where(table.c.gate_number.in_(gates))
+            ).tuples())
+            for question in batch:
+                if (question["gate_number"], question["question_text"]) in existing:
+                    conn.execute(
+                        table.update().where(
+                            table.c.gate_number == question["gate_number"],
+                            table.c.question_text == question["question_text"]
+                        ),
+                        question
+                    )
+            new = [q for q in batch if (q["gate_number"], q["question_text"]) not in existing]
+            if new:
+                conn.execute(table.insert(), new)
+    return len(questions)
+
+
+def import_questions(stream: IO[str], fmt: str = "csv", batch_size: int = DEFAULT_BATCH_SIZE,
+                     dry_run: bool = False) -> int:
+    """Validate and upsert a question file, then invalidate the question caches"""
+    questions = validate_rows(read_rows(stream, fmt))
+    if dry_run:
+        return len(questions)
+    count = upsert_questions(questions, batch_size)
+    # Make every replica reload its question cache
+    invalidation_bus.publish(QUESTIONS)
+    return count
+
+
+def export_questions(out: IO[str], fmt: str = "csv", batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Stream every question, ordered by gate, in a format ``import_questions`` reads back"""
+    table = Question.__table__
+    writer: Optional[csv.DictWriter] = None
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+    elif fmt != "jsonl":
+        raise ValueError(f"Unknown question format: {fmt}")
+
+    count = 0
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+            select(*[table.c[field] for field in FIELDS]).order_by(table.c.gate_number, table.c.id)
+        )
+        for row in result.mappings():
+            if writer is not None:
+                writer.writerow(dict(row))
+            else:
+                out.write(json.dumps(dict(row), ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def _open(path: str, mode: str) -> IO[str]:
+    if path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    return io.open(path, mode, encoding="utf-8", newline="")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import or export the question bank")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command in ("import", "export"):
+        sub = subparsers.add_parser(command)
+        sub.add_argument("path", help="CSV or JSON lines file, - for stdin/stdout")
+        sub.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+        sub.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per statement")
+    subparsers.choices["import"].add_argument("--dry-run", action="store_true",
+                                              help="validate only, write nothing")
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    started = time.perf_counter()
+    if args.command == "import":
+        stream = _open(args.path, "r")
+        try:
+            count = import_questions(stream, fmt, args.batch_size, args.dry_run)
+        except QuestionImportError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        action = "Validated" if args.dry_run else "Imported"
+    else:
+        out = _open(args.path, "w")
+        try:
+            count = export_questions(out, fmt, args.batch_size)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        action = "Exported"
+    print(f"✅ {action} {count} questions in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+In-process question bank so the answer path needs no question queries.
+
+Each gate has a pool of questions. Which one a player gets at a gate is a
+seeded hash of (player, attempt, gate) into the gate's pool, so selection is
+deterministic for a run, differs between players and between a player's
+runs, and costs an array lookup. The game row records the question served,
+and answers are checked against that id, so editing a pool never changes a
+question under a player mid-gate.
+
+The four options are shown in one of 24 orders, again picked by hashing
+(player, attempt, gate), so "the answer to gate 7 is C" is true for nobody
+else. Buttons carry the letter shown; ``to_original`` maps it back to the
+stored option when checking. Rendered question texts are memoized per
+(question, order) until the next reload.
+
+The cache subscribes to the ``questions`` invalidation topic, so reseeding or
+editing questions on any replica makes every replica reload on next use.
+"""
+
+import hashlib
+import itertools
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.config import settings
+from app.database import SessionLocal
+from app.invalidation import QUESTIONS, invalidation_bus
+from app.models import Question
+
+logger = logging.getLogger(__name__)
+
+
+class CachedQuestion(NamedTuple):
+    id: int
+    gate_number: int
+    question_text: str
+    option_a: str
+    option_b: str
+    option_c: str
+    option_d: str
+    correct_answer: str
+
+
+MASK64 = (1 << 64) - 1
+# Keyed by the secret so players cannot work out which question they will get
+SELECTION_SEED = int.from_bytes(
+    hashlib.blake2b(settings.secret_key.encode(), digest_size=8, person=b"gates-pool").digest(), "little"
+)
+
+
+def _mix64(value: int) -> int:
+    """splitmix64 finalizer"""
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+def _run_hash(player_id: int, attempt_id: Optional[int], gate_number: int, salt: int = 0) -> int:
+    value = _mix64(SELECTION_SEED ^ salt ^ player_id)
+    value = _mix64(value ^ (attempt_id or 0))
+    return _mix64(value ^ gate_number)
+
+
+def pool_index(player_id: int, attempt_id: Optional[int], gate_number: int, pool_size: int) -> int:
+    """Index into a gate's pool of ``pool_size`` questions for this player's run"""
+    return _run_hash(player_id, attempt_id, gate_number) % pool_size
+
+
+LETTERS = "ABCD"
+# Orders the options can be shown in: OPTION_ORDERS[order][position] is the stored option index
+OPTION_ORDERS = tuple(itertools.permutations(range(len(LETTERS))))
+ORDER_SALT = 0x5EED0F0F7E4B
+
+
+def option_order(player_id: int, attempt_id: Optional[int], gate_number: int) -> int:
+    """Index into OPTION_ORDERS of the order this player's run sees the options in at a gate"""
+    return _run_hash(player_id, attempt_id, gate_number, ORDER_SALT) % len(OPTION_ORDERS)
+
+
+def to_original(letter: str, order: int) -> str:
+    """Stored option letter of the button shown as ``letter`` under ``order``"""
+    letter = letter.strip().upper()
+    if len(letter) != 1 or letter not in LETTERS:
+        return letter
+    return LETTERS[OPTION_ORDERS[order][LETTERS.index(letter)]]
+
+
+def to_shown(letter: str, order: int) -> str:
+    """Letter the stored option ``letter`` is shown under in ``order``; inverse of to_original"""
+    return LETTERS[OPTION_ORDERS[order].index(LETTERS.index(letter.upper()))]
+
+
+def shown_options(question: "CachedQuestion", order: int) -> List[str]:
+    """Option texts in the order they are shown under ``order``"""
+    options = (question.option_a, question.option_b, question.option_c, question.option_d)
+    return [options[index] for index in OPTION_ORDERS[order]]
+
+
+class QuestionCache:
+    def __init__(self):
+        # Pool of each gate, indexed by gate number; ordered by id so indexes are stable
+        self._pools: List[Tuple[CachedQuestion, ...]] = []
+        self._by_id: Dict[int, CachedQuestion] = {}
+        self._rendered: Dict[Tuple[int, int], str] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        # Invalidation version the loaded questions reflect
+        self.version = 0
+
+    def load(self, db=None):
+        """(Re)load every question from the database"""
+        session = db or SessionLocal()
+        try:
+            questions = [
+                CachedQuestion(
+                    q.id, q.gate_number, q.question_text,
+                    q.option_a, q.option_b, q.option_c, q.option_d,
+                    q.correct_answer.upper()
+                )
+                for q in session.query(Question).order_by(Question.gate_number, Question.id)
+            ]
+        finally:
+            if db is None:
+                session.close()
+
+        pools: List[List[CachedQuestion]] = [[] for _ in range(max((q.gate_number for q in questions), default=0) + 1)]
+        for q in questions:
+            pools[q.gate_number].append(q)
+
+        with self._lock:
+            self._pools = [tuple(pool) for pool in pools]
+            self._by_id = {q.id: q for q in questions}
+            self._rendered = {}
+            self._loaded = True
+        logger.info(f"Loaded {len(questions)} questions into cache for {sum(1 for pool in pools if pool)} gates")
+
+    def invalidate(self, version: int):
+        """Drop the cached questions; they are reloaded on next use"""
+        with self._lock:
+            if version > self.version:
+                self.version = version
+                self._loaded = False
+        logger.info(f"Question cache invalidated (version {version})")
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def pool(self, gate_number: int) -> Tuple[CachedQuestion, ...]:
+        self._ensure_loaded()
+        pools = self._pools
+        return pools[gate_number] if 0 <= gate_number < len(pools) else ()
+
+    def select(self, gate_number: int, player_id: int, attempt_id: Optional[int]) -> Optional[CachedQuestion]:
+        """The question this player's run is served at ``gate_number``"""
+        pool = self.pool(gate_number)
+        if not pool:
+            return None
+        return pool[pool_index(player_id, attempt_id, gate_number, len(pool))]
+
+    def get_by_id(self, question_id: int) -> Optional[CachedQuestion]:
+        self._ensure_loaded()
+        return self._by_id.get(question_id)
+
+    def render(self, question: CachedQuestion, order: int) -> str:
+        """Question text followed by its options in the given order"""
+        key = (question.id, order)
+        text = self._rendered.get(key)
+        if text is None:
+            lines = [f"{LETTERS[position]}) {option}" for position, option in enumerate(shown_options(question, order))]
+            text = f"❓ {question.question_text}\n\n" + "\n".join(lines)
+            self._rendered[key] = text
+        return text
+
+    def prerender(self) -> int:
+        """Render every question in every option order ahead of use; returns messages rendered"""
+        self._ensure_loaded()
+        questions = list(self._by_id.values())
+        for question in questions:
+            for order in range(len(OPTION_ORDERS)):
+                self.render(question, order)
+        return len(questions) * len(OPTION_ORDERS)
+
+
+# Global question cache instance
+question_cache = QuestionCache()
+invalidation_bus.subscribe(QUESTIONS, question_cache.invalidate)
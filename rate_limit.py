@@ -0,0 +1,162 @@
+"""
+Per-user flood control with token buckets.
+
+Every user has one bucket per kind of update (``start``, ``status``,
+``leaderboard``, ``answer``, ...), configured in RATE_LIMITS as
+``[burst, seconds]``: up to ``burst`` updates at once, refilled evenly so
+that ``burst`` more are allowed every ``seconds``. Kinds without a budget
+use the ``default`` one.
+
+- ``memory``: buckets live in this process; enough for a single replica.
+- ``redis``: buckets are Redis hashes updated by a Lua script, so a user's
+  budget is shared by every replica. If Redis fails, updates are let through.
+- ``none``: no flood control.
+
+``check`` tells the first rejection of a burst apart from the rest, so the
+caller can answer the user once and drop the others silently.
+"""
+
+import logging
+import math
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Optional dependency, only needed for the Redis backend
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Results of RateLimiter.check
+ALLOWED = "allowed"
+THROTTLED = "throttled"  # first rejection since the last allowed update
+DROPPED = "dropped"  # further rejections
+
+DEFAULT_BUDGET = "default"
+MAX_MEMORY_BUCKETS = 200_000
+
+
+def _budget(kind: str) -> Optional[Tuple[float, float]]:
+    """(capacity, tokens per second) for a kind of update, or None when unlimited"""
+    budget = settings.rate_limits.get(kind) or settings.rate_limits.get(DEFAULT_BUDGET)
+    if not budget:
+        return None
+    burst, seconds = budget
+    return float(burst), float(burst) / float(seconds)
+
+
+class MemoryRateLimiter:
+    def __init__(self, max_buckets: int = MAX_MEMORY_BUCKETS):
+        self.max_buckets = max_buckets
+        # (user, kind) -> [tokens, updated_at, notified]
+        self._buckets: Dict[Tuple[int, str], list] = {}
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+
+    def _prune(self, now: float):
+        """Forget buckets that have refilled completely; they behave like new ones"""
+        full = []
+        for (user_id, kind), (tokens, updated_at, _) in self._buckets.items():
+            budget = _budget(kind)
+            if budget is None or tokens + (now - updated_at) * budget[1] >= budget[0]:
+                full.append((user_id, kind))
+        for key in full:
+            del self._buckets[key]
+
+    async def check(self, user_id: int, kind: str) -> str:
+        budget = _budget(kind)
+        if budget is None:
+            return ALLOWED
+        capacity, rate = budget
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get((user_id, kind))
+            if bucket is None:
+                if len(self._buckets) >= self.max_buckets and now - self._pruned_at >= 1.0:
+                    self._pruned_at = now
+                    self._prune(now)
+                bucket = self._buckets[(user_id, kind)] = [capacity, now, False]
+            else:
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                bucket[2] = False
+                return ALLOWED
+            if bucket[2]:
+                return DROPPED
+            bucket[2] = True
+            return THROTTLED
+
+
+class RedisRateLimiter:
+    # Returns 1 when allowed, 0 on the first rejection and -1 on later ones
+    CHECK_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('time')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('hmget', KEYS[1], 't', 'ts', 'n')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+local notified = state[3] == '1'
+tokens = math.min(capacity, tokens + math.max(now - updated_at, 0) * rate)
+local result
+if tokens >= 1 then
+  tokens = tokens - 1
+  notified = false
+  result = 1
+elseif notified then
+  result = -1
+else
+  notified = true
+  result = 0
+end
+redis.call('hset', KEYS[1], 't', tostring(tokens), 'ts', tostring(now), 'n', notified and '1' or '0')
+redis.call('pexpire', KEYS[1], ARGV[3])
+return result
+"""
+
+    def __init__(self, redis_url: str):
+        if aioredis is None:
+            raise RuntimeError("The redis package is required for RATE_LIMIT_BACKEND=redis")
+        self.redis = aioredis.from_url(redis_url)
+        self._script = self.redis.register_script(self.CHECK_SCRIPT)
+
+    async def check(self, user_id: int, kind: str) -> str:
+        budget = _budget(kind)
+        if budget is None:
+            return ALLOWED
+        capacity, rate = budget
+        # Keep a bucket only until it would have refilled
+        ttl_ms = max(int(math.ceil(capacity / rate * 1000)), 1000)
+        try:
+            result = await self._script(keys=[f"gates:rate:{kind}:{user_id}"], args=[capacity, rate, ttl_ms])
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, letting updates through: {e}")
+            return ALLOWED
+        return {1: ALLOWED, 0: THROTTLED}.get(int(result), DROPPED)
+
+
+rate_limiter = None
+
+
+def get_rate_limiter():
+    """Get the rate limiter configured by RATE_LIMIT_BACKEND; None when disabled"""
+    global rate_limiter
+    if rate_limiter is None:
+        backend = settings.rate_limit_backend
+        if backend == "memory":
+            rate_limiter = MemoryRateLimiter()
+        elif backend == "redis":
+            if not settings.redis_url:
+                raise RuntimeError("RATE_LIMIT_BACKEND=redis requires REDIS_URL")
+            rate_limiter = RedisRateLimiter(settings.redis_url)
+        elif backend != "none":
+            raise ValueError(f"Unknown rate limit backend: {backend}")
+    return rate_limiter
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Replay captured webhook updates into Application.process_update.
+
+Captures come from UPDATE_CAPTURE_DIR (see update_recorder.py). Updates are
+re-fed against a local database at their original pacing (--speed 1), N times
+faster (--speed N) or as fast as possible (--speed max), while bot replies go
+to the local fake Bot API. Results are printed as JSON so two releases can be
+compared on identical traffic.
+
+Usage:
+    DATABASE_URL=postgresql://localhost/gates_replay python replay_updates.py captures/ --speed max
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def replay(args) -> dict:
+    # Settings are read at import time, so point the bot at the fake API first
+    os.environ["TELEGRAM_API_BASE_URL"] = f"http://127.0.0.1:{args.fake_api_port}/bot"
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:REPLAY")
+    os.environ.setdefault("WEBHOOK_URL", "http://replay")
+    os.environ.setdefault("SECRET_KEY", "replay")
+
+    from app.fake_bot_api import FakeBotApi
+
+    fake_api = FakeBotApi(latency_ms=args.api_latency_ms)
+    server = await fake_api.serve(port=args.fake_api_port)
+
+    from telegram import Update
+    from app.database import engine
+    from app.loadtest import percentile
+    from app.metrics import CRUD_STATEMENTS
+    from app.models import Base
+    from app.seed_questions import seed_questions
+    from app.telegram_bot import get_bot
+    from app.update_recorder import read_captures
+
+    Base.metadata.create_all(bind=engine)
+    seed_questions()
+
+    bot = get_bot()
+    await bot.application.initialize()
+
+    speed = None if args.speed == "max" else float(args.speed)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    durations: List[float] = []
+    lateness: List[float] = []
+    errors = 0
+
+    async def process(update_data: dict):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await bot.application.process_update(Update.de_json(update_data, bot.application.bot))
+            except Exception:
+                errors += 1
+            durations.append(time.perf_counter() - started)
+
+    statements_before = CRUD_STATEMENTS.total()
+    tasks = []
+    first_arrival = None
+    replay_started = time.perf_counter()
+
+    for arrived_at, update_data in read_captures(args.captures):
+        if first_arrival is None:
+            first_arrival = arrived_at
+        if speed:
+            due = replay_started + (arrived_at - first_arrival) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                lateness.append(-delay)
+        elif len(tasks) >= args.concurrency * 4:
+            # Keep the backlog bounded when replaying at max speed
+            await asyncio.gather(*tasks)
+            tasks = []
+        tasks.append(asyncio.create_task(process(update_data)))
+
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - replay_started
+    statements = CRUD_STATEMENTS.total() - statements_before
+
+    await bot.application.shutdown()
+    server.should_exit = True
+
+    processed = len(durations)
+    return {
+        "captures": args.captures,
+        "speed": args.speed,
+        "updates": processed,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_updates_per_second": round(processed / elapsed, 2) if elapsed else None,
+        "process_update_ms": {
+            "p50": round(percentile(durations, 50) * 1000, 2) if durations else None,
+            "p95": round(percentile(durations, 95) * 1000, 2) if durations else None,
+            "p99": round(percentile(durations, 99) * 1000, 2) if durations else None,
+        },
+        "max_schedule_lag_ms": round(max(lateness) * 1000, 2) if lateness else 0.0,
+        "db_statements": int(statements),
+        "db_statements_per_update": round(statements / processed, 2) if processed else None,
+        "bot_api_calls": dict(fake_api.calls_by_method),
+    }
+
+
+def replay_speed(value: str) -> str:
+    if value != "max":
+        try:
+            if float(value) <= 0:
+                raise ValueError
+        except ValueError:
+            raise argparse.ArgumentTypeError("speed must be a positive number or 'max'")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured updates against a local database")
+    parser.add_argument("captures", nargs="+", help="capture files or directories")
+    parser.add_argument("--speed", type=replay_speed, default="1", help="replay speed multiplier, or 'max'")
+    parser.add_argument("--concurrency", type=int, default=64, help="maximum updates processed at once")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="latency added by the fake Bot API")
+    parser.add_argument("--fake-api-port", type=int, default=8081)
+    parser.add_argument("--database-url", help="overrides DATABASE_URL")
+    parser.add_argument("--json", dest="json_path", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(replay(args))
+    print(json.dumps(results, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
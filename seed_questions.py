@@ -7,10 +7,8 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database import SessionLocal
-from app.models import Question
-from app.crud import create_question
-from app.schemas import QuestionCreate
+from app.question_bank import upsert_questions, validate_rows
+from app.invalidation import QUESTIONS, invalidation_bus
 
 # Sample questions for the game
 SAMPLE_QUESTIONS = [
@@ -341,33 +339,22 @@ def generate_additional_questions():
     return additional_questions
 
 def seed_questions():
-    """Seed the database with questions"""
-    db = SessionLocal()
+    """Seed the database with questions, updating gates that already have one"""
+    # Combine sample questions with generated questions
+    all_questions = SAMPLE_QUESTIONS + generate_additional_questions()
+    
+    print(f"Seeding {len(all_questions)} questions...")
     
     try:
-        # Check if questions already exist
-        existing_count = db.query(Question).count()
-        if existing_count > 0:
-            print(f"Database already contains {existing_count} questions. Skipping seeding.")
-            return
-        
-        # Combine sample questions with generated questions
-        all_questions = SAMPLE_QUESTIONS + generate_additional_questions()
-        
-        print(f"Seeding {len(all_questions)} questions...")
-        
-        for question_data in all_questions:
-            question = QuestionCreate(**question_data)
-            create_question(db, question)
-            print(f"Created question for Gate {question_data['gate_number']}")
+        questions = validate_rows(enumerate(all_questions, 1))
+        upsert_questions(questions)
+        print(f"✅ All {len(questions)} questions seeded successfully!")
         
-        print("✅ All questions seeded successfully!")
+        # Make every replica reload its question cache
+        invalidation_bus.publish(QUESTIONS)
         
     except Exception as e:
         print(f"❌ Error seeding questions: {e}")
-        db.rollback()
-    finally:
-        db.close()
 
 if __name__ == "__main__":
     seed_questions() 
\ No newline at end of file
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Virtual-clock simulation of timeout-heavy gameplay.
+
+Runs the real TelegramBot.check_timeouts loop against a simulated clock.
+Each virtual check interval new runs arrive in bulk, some of the waiting
+games are answered in time, and the rest expire and are eliminated by the
+timeout checker. Hours of gameplay finish in seconds of wall time, and the
+output reports the DB cost of every expiry pass.
+
+Usage:
+    python simulate_timeouts.py --database-url sqlite:///sim.db --hours 6 --arrivals-per-second 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def simulate(args) -> dict:
+    # Settings are read at import time, so configure the simulated run first
+    os.environ["CLOCK_MODE"] = "simulated"
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("DATABASE_URL", "sqlite:///simulation.db")
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:SIMULATION")
+    os.environ.setdefault("WEBHOOK_URL", "http://simulation")
+    os.environ.setdefault("SECRET_KEY", "simulation")
+
+    from sqlalchemy import bindparam, func
+
+    from app.clock import clock
+    from app.config import settings
+    from app.database import SessionLocal, engine
+    from app.instrumentation import count_statements
+    from app.models import Base, Game, GameState, GameStatus, Player, Question
+    from app.seed_questions import seed_questions
+    from app.telegram_bot import TelegramBot
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    seed_questions()
+
+    rng = random.Random(args.seed)
+    db = SessionLocal()
+    question_ids = {q.gate_number: q.id for q in db.query(Question).all()}
+    db.close()
+
+    # Time every expiry pass the checker runs, by wrapping the crud call it makes
+    import app.telegram_bot as telegram_bot_module
+    expire = telegram_bot_module.expire_timed_out_games
+    pass_durations = []
+    pass_statements = []
+    timeouts = 0
+
+    def timed_expire(session):
+        nonlocal timeouts
+        with count_statements("expire_timed_out_games") as count:
+            started = time.perf_counter()
+            eliminated = expire(session)
+            pass_durations.append(time.perf_counter() - started)
+        pass_statements.append(count.total)
+        timeouts += len(eliminated)
+        return eliminated
+
+    telegram_bot_module.expire_timed_out_games = timed_expire
+
+    bot = TelegramBot()
+    checker = asyncio.create_task(bot.check_timeouts())
+
+    interval = settings.timeout_check_interval
+    steps = int(args.hours * 3600 / interval)
+    arrivals_per_step = int(args.arrivals_per_second * interval)
+    next_player_id = 1
+    answered = 0
+    wall_started = time.perf_counter()
+
+    for _ in range(steps):
+        now = clock.now()
+        db = SessionLocal()
+        try:
+            # Waiting games answered in time move to the next gate with a fresh deadline
+            waiting = db.query(Game.id, Game.player_id, Game.gate_number).filter(
+                Game.status == GameStatus.ACTIVE,
+                Game.timeout_at >= now
+            ).all()
+            answering = [row for row in waiting if rng.random() < args.answer_rate * interval / settings.question_timeout]
+            if answering:
+                # The in-flight row moves on to the next gate
+                games_table = Game.__table__
+                next_gates = []
+                for row in answering:
+                    gate = min(row.gate_number + 1, len(question_ids))
+                    next_gates.append({
+                        "b_id": row.id,
+                        "b_gate": gate,
+                        "b_question_id": question_ids[gate],
+                        "b_start": now,
+                        "b_timeout": now + timedelta(seconds=settings.question_timeout),
+                    })
+                db.execute(
+                    games_table.update().where(games_table.c.id == bindparam("b_id")).values(
+                        gate_number=bindparam("b_gate"),
+                        question_id=bindparam("b_question_id"),
+                        start_time=bindparam("b_start"),
+                        timeout_at=bindparam("b_timeout"),
+                    ),
+                    next_gates
+                )
+                answered += len(answering)
+
+            # New runs arriving during this interval
+            players = []
+            games = []
+            for i in range(arrivals_per_step):
+                player_id = next_player_id + i
+                players.append({
+                    "id": player_id,
+                    "telegram_id": player_id,
+                    "current_gate": 1,
+                    "game_state": GameState.ACTIVE,
+                    "start_time": now,
+                    "last_activity": now,
+                })
+                games.append({
+                    "player_id": player_id,
+                    "gate_number": 1,
+                    "question_id": question_ids[1],
+                    "start_time": now,
+                    "timeout_at": now + timedelta(seconds=settings.question_timeout * rng.uniform(0.5, 1.0)),
+                    "status": GameStatus.ACTIVE,
+                })
+            if players:
+                db.execute(Player.__table__.insert(), players)
+                db.execute(Game.__table__.insert(), games)
+                next_player_id += arrivals_per_step
+            db.commit()
+        finally:
+            db.close()
+
+        await clock.source.advance(interval)
+
+    checker.cancel()
+    wall_seconds = time.perf_counter() - wall_started
+
+    db = SessionLocal()
+    try:
+        still_active = db.query(func.count(Game.id)).filter(Game.status == GameStatus.ACTIVE).scalar()
+    finally:
+        db.close()
+
+    ordered = sorted(pass_durations)
+    return {
+        "virtual_seconds": steps * interval,
+        "wall_seconds": round(wall_seconds, 3),
+        "speedup": round(steps * interval / wall_seconds, 1) if wall_seconds else None,
+        "runs_started": next_player_id - 1,
+        "answers": answered,
+        "timeouts": timeouts,
+        "games_still_active": still_active,
+        "expiry_passes": len(pass_durations),
+        "expiry_pass_ms": {
+            "mean": round(statistics.mean(pass_durations) * 1000, 3) if pass_durations else None,
+            "p50": round(ordered[len(ordered) // 2] * 1000, 3) if ordered else None,
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3) if ordered else None,
+            "max": round(ordered[-1] * 1000, 3) if ordered else None,
+        },
+        "statements_per_pass": round(statistics.mean(pass_statements), 2) if pass_statements else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate timeout-heavy gameplay on a virtual clock")
+    parser.add_argument("--hours", type=float, default=1.0, help="virtual hours of gameplay")
+    parser.add_argument("--arrivals-per-second", type=float, default=50.0, help="new runs per virtual second")
+    parser.add_argument("--answer-rate", type=float, default=0.8,
+                        help="roughly the share of waiting games answered before their deadline")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="overrides DATABASE_URL")
+    parser.add_argument("--json", dest="json_path", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(simulate(args))
+    print(json.dumps(results, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,34 @@
 import logging
-from typing import Optional
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
+from typing import List, Optional
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Poll
+from telegram.constants import PollLimit
+from telegram.ext import (
+    Application, ApplicationHandlerStop, CommandHandler, CallbackQueryHandler, PollAnswerHandler,
+    TypeHandler, ContextTypes
+)
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.crud import (
-    start_new_game, get_player, check_answer, get_question, 
-    eliminate_player, get_leaderboard, get_game_stats
+    start_new_game, get_player, check_answer, get_active_game, 
+    get_leaderboard, get_game_stats, expire_timed_out_games
 )
-from app.models import GameState, EliminationReason, Game, GameStatus
+from app.models import GameState, EliminationReason
 from app.config import settings
+from app.clock import clock
+from app.instrumentation import instrument_handler
+from app.metrics import RATE_LIMITED_UPDATES, SHED_UPDATES, THROTTLED_USERS
+from app.admission import ADMIT, DEGRADE, admission
+from app.rate_limit import ALLOWED, THROTTLED, get_rate_limiter
+from app.telegram_request import GET_UPDATES_POOL, build_request
+from app.hot_state import AnswerResult, get_hot_state
+from app.poll_index import PollIndex
+from app.question_cache import question_cache, option_order, shown_options, LETTERS, OPTION_ORDERS
+from app.game_events import event_log, wait_for_capacity
+from app.leader import get_leader_election
+from app.partitions import run_maintenance_loop
+from app.warmup import readiness
 import asyncio
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 # Configure logging
 logging.basicConfig(
@@ -21,10 +38,69 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def update_kind(update: Update) -> str:
+    """Kind of update for flood control, load shedding and lanes: a command name, answer or default"""
+    if update.callback_query or update.poll_answer:
+        return "answer"
+    message = update.effective_message
+    if message and message.text and message.text.startswith("/"):
+        # "/start@gates_bot payload" -> "start"
+        return message.text.split()[0][1:].split("@")[0].lower() or "default"
+    return "default"
+
+
 class TelegramBot:
+    # Update types each handler class can receive, used to build allowed_updates
+    HANDLER_UPDATE_TYPES = {
+        CommandHandler: [Update.MESSAGE],
+        CallbackQueryHandler: [Update.CALLBACK_QUERY],
+        PollAnswerHandler: [Update.POLL_ANSWER],
+    }
+    
+    HELP_TEXT = (
+        "🎮 **100 Gates to Freedom - Game Rules**\n\n"
+        "**Objective**: Be the first to answer 100 questions correctly!\n\n"
+        "**How to Play**:\n"
+        "• Each question is a 'gate' you must pass\n"
+        "• You have 30 seconds to answer each question\n"
+        "• Choose from 4 multiple-choice options (A, B, C, D)\n"
+        "• One wrong answer or timeout = game over\n"
+        "• Start over from Gate 1 if you fail\n\n"
+        "**Commands**:\n"
+        "• `/start` - Begin new game\n"
+        "• `/restart` - Reset and start over\n"
+        "• `/status` - Check your progress\n"
+        "• `/leaderboard` - View top players\n"
+        "• `/help` - Show this help\n\n"
+        "**Prize**: 69% of the reward pool to the first winner! 🏆\n\n"
+        "Good luck! May the fastest mind win! 🚀"
+    )
+    
     def __init__(self):
+        self.allowed_update_types: List[str] = []
+        self.leader_task: Optional[asyncio.Task] = None
+        # Timeout checker for runs held in this process's memory, run on every replica
+        self.local_timeout_task: Optional[asyncio.Task] = None
+        # Writes dirty hot state runs to Postgres, on every replica
+        self.hot_state_task: Optional[asyncio.Task] = None
+        # Writes the buffered game events; handlers wait on it once the buffer is full
+        self.event_log_task: Optional[asyncio.Task] = None
+        if settings.gate_delivery not in ("buttons", "quiz_poll"):
+            raise ValueError(f"Unknown gate delivery: {settings.gate_delivery}")
+        self.quiz_polls = settings.gate_delivery == "quiz_poll"
+        self.polls = PollIndex()
+        # Last rendered leaderboard, used to answer throttled or shed /leaderboard requests
+        self.leaderboard_text: Optional[str] = None
         try:
-            self.application = Application.builder().token(settings.telegram_bot_token).build()
+            builder = (
+                Application.builder()
+                .token(settings.telegram_bot_token)
+                .request(build_request())
+                .get_updates_request(build_request(GET_UPDATES_POOL))
+            )
+            if settings.telegram_api_base_url:
+                builder = builder.base_url(settings.telegram_api_base_url)
+            self.application = builder.build()
             self.setup_handlers()
             logger.info("Telegram bot initialized successfully")
         except Exception as e:
@@ -36,26 +112,136 @@ class TelegramBot:
         if not self.application:
             return
             
+        # Flood control, then load shedding, run before the handlers and can stop an update
+        self.application.add_handler(TypeHandler(Update, self.flood_control), group=-2)
+        self.application.add_handler(TypeHandler(Update, self.load_shedding), group=-1)
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("restart", self.restart_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
         self.application.add_handler(CommandHandler("status", self.status_command))
         self.application.add_handler(CommandHandler("leaderboard", self.leaderboard_command))
         self.application.add_handler(CallbackQueryHandler(self.handle_callback))
+        if self.quiz_polls:
+            self.application.add_handler(PollAnswerHandler(self.handle_poll_answer))
+        
+        self.allowed_update_types = self.allowed_updates()
+    
+    def allowed_updates(self) -> List[str]:
+        """Derive the minimal allowed_updates list from the registered handlers"""
+        if not self.application:
+            return []
+        
+        update_types = []
+        for handlers in self.application.handlers.values():
+            for handler in handlers:
+                for handler_type, types in self.HANDLER_UPDATE_TYPES.items():
+                    if isinstance(handler, handler_type):
+                        update_types.extend(t for t in types if t not in update_types)
+        return update_types
+    
+    async def flood_control(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Stop updates over their sender's budget before any handler touches the database"""
+        limiter = get_rate_limiter()
+        user = update.effective_user
+        if limiter is None or user is None:
+            return
+        
+        kind = update_kind(update)
+        if kind not in settings.rate_limits:
+            # Made-up commands share one budget instead of getting a fresh bucket each
+            kind = "default"
+        decision = await limiter.check(user.id, kind)
+        if decision == ALLOWED:
+            return
+        
+        if decision == THROTTLED:
+            # Answer the first update of a burst, without the database; drop the rest
+            THROTTLED_USERS.inc(kind=kind)
+            RATE_LIMITED_UPDATES.inc(kind=kind, action="answered")
+            try:
+                if update.callback_query:
+                    await update.callback_query.answer("⏳ Too fast! Slow down a little.")
+                elif kind == "leaderboard" and self.leaderboard_text and update.effective_message:
+                    await update.effective_message.reply_text(self.leaderboard_text, parse_mode='Markdown')
+                elif update.effective_message:
+                    await update.effective_message.reply_text("⏳ Too many requests. Please wait a moment.")
+            except Exception as e:
+                logger.warning(f"Failed to answer throttled update: {e}")
+        else:
+            RATE_LIMITED_UPDATES.inc(kind=kind, action="dropped")
+        raise ApplicationHandlerStop
+    
+    async def load_shedding(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Answer read-only commands from cached state, or drop them, while the bot is behind"""
+        kind = update_kind(update)
+        decision = admission.decide(kind)
+        if decision == ADMIT:
+            return
+        
+        if decision == DEGRADE and update.effective_message:
+            SHED_UPDATES.inc(kind=kind, action="degraded")
+            try:
+                await update.effective_message.reply_text(await self.degraded_reply(update, kind), parse_mode='Markdown')
+            except Exception as e:
+                logger.warning(f"Failed to send degraded reply: {e}")
+        else:
+            SHED_UPDATES.inc(kind=kind, action="dropped")
+        raise ApplicationHandlerStop
+    
+    async def degraded_reply(self, update: Update, kind: str) -> str:
+        """Reply to a command without touching the database"""
+        if kind == "help":
+            return self.HELP_TEXT
+        if kind == "leaderboard" and self.leaderboard_text:
+            return self.leaderboard_text
+        if kind == "status":
+            hot_state = get_hot_state()
+            run = await hot_state.store.get(update.effective_user.id) if hot_state else None
+            if run is not None and run.state == GameState.ACTIVE.value:
+                return (
+                    f"🎮 **Your Game Status**\n\n"
+                    f"🚪 **Current Gate**: {run.gate}/100\n"
+                    f"🔄 **Status**: Active\n\n"
+                    f"Keep going! You're doing great! 💪"
+                )
+        if kind in ("start", "restart"):
+            return "🚦 The gates are very busy right now. Please try `/start` again in a minute."
+        return "🚦 The gates are very busy right now. Please try again in a minute."
     
+    @instrument_handler
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
+        await self.start_game(update, context)
+    
+    @instrument_handler
+    async def restart_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /restart command"""
+        await self.start_game(update, context)
+    
+    async def start_game(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Start a new run and send the first gate; not instrumented, so each command counts once"""
         telegram_id = update.effective_user.id
         username = update.effective_user.username
         
+        # Hold new runs back while the event log is full
+        await wait_for_capacity()
+        hot_state = get_hot_state()
+        
         # Get database session
         db = next(get_db())
         try:
+            # Write any unflushed progress of the previous run before resetting it
+            if hot_state:
+                await hot_state.flush([telegram_id])
+            
             # Start new game
             player = start_new_game(db, telegram_id, username)
+            if hot_state:
+                await hot_state.start(telegram_id)
             
-            # Get first question
-            question = get_question(db, 1)
+            # Get the first question picked for this run
+            game = get_active_game(db, player.id)
+            question = question_cache.get_by_id(game.question_id) if game else None
             if not question:
                 await update.message.reply_text("❌ Game not ready. Please contact admin.")
                 return
@@ -66,11 +252,19 @@ class TelegramBot:
                 "🏆 **Prize**: 69% of the reward pool to the first winner!\n"
                 "⚡ **Rules**: Answer 100 questions correctly in a row\n"
                 "⏱ **Timer**: 30 seconds per question\n"
-                "💀 **One Strike**: Wrong answer or timeout = game over\n\n"
-                "🚪 **Gate 1 of 100**\n\n"
-                f"❓ {question.question_text}"
+                "💀 **One Strike**: Wrong answer or timeout = game over"
             )
+            order = option_order(player.id, game.attempt_id, 1)
             
+            if self.quiz_polls:
+                await update.message.reply_text(welcome_text, parse_mode='Markdown')
+                await self.send_quiz_poll(context.bot, telegram_id, 1, question, order)
+                return
+            
+            welcome_text += (
+                "\n\n🚪 **Gate 1 of 100**\n\n"
+                f"{question_cache.render(question, order)}"
+            )
             keyboard = self.create_answer_keyboard()
             await update.message.reply_text(
                 welcome_text,
@@ -84,33 +278,12 @@ class TelegramBot:
         finally:
             db.close()
     
-    async def restart_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /restart command"""
-        await self.start_command(update, context)
-    
+    @instrument_handler
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /help command"""
-        help_text = (
-            "🎮 **100 Gates to Freedom - Game Rules**\n\n"
-            "**Objective**: Be the first to answer 100 questions correctly!\n\n"
-            "**How to Play**:\n"
-            "• Each question is a 'gate' you must pass\n"
-            "• You have 30 seconds to answer each question\n"
-            "• Choose from 4 multiple-choice options (A, B, C, D)\n"
-            "• One wrong answer or timeout = game over\n"
-            "• Start over from Gate 1 if you fail\n\n"
-            "**Commands**:\n"
-            "• `/start` - Begin new game\n"
-            "• `/restart` - Reset and start over\n"
-            "• `/status` - Check your progress\n"
-            "• `/leaderboard` - View top players\n"
-            "• `/help` - Show this help\n\n"
-            "**Prize**: 69% of the reward pool to the first winner! 🏆\n\n"
-            "Good luck! May the fastest mind win! 🚀"
-        )
-        
-        await update.message.reply_text(help_text, parse_mode='Markdown')
+        await update.message.reply_text(self.HELP_TEXT, parse_mode='Markdown')
     
+    @instrument_handler
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /status command"""
         telegram_id = update.effective_user.id
@@ -126,19 +299,29 @@ class TelegramBot:
                 )
                 return
             
-            if player.game_state == GameState.ACTIVE:
+            # A live run's progress may not be flushed to the database yet
+            hot_state = get_hot_state()
+            run = await hot_state.store.get(telegram_id) if hot_state else None
+            current_gate = run.gate if run else player.current_gate
+            game_state = GameState(run.state) if run else player.game_state
+            elimination_reason = (
+                EliminationReason(run.elimination_reason) if run and run.elimination_reason
+                else player.elimination_reason
+            )
+            
+            if game_state == GameState.ACTIVE:
                 status_text = (
                     f"🎮 **Your Game Status**\n\n"
-                    f"🚪 **Current Gate**: {player.current_gate}/100\n"
+                    f"🚪 **Current Gate**: {current_gate}/100\n"
                     f"⏱ **Started**: {player.start_time.strftime('%Y-%m-%d %H:%M:%S')}\n"
                     f"🔄 **Status**: Active\n\n"
                     f"Keep going! You're doing great! 💪"
                 )
-            elif player.game_state == GameState.ELIMINATED:
-                reason = "Timeout" if player.elimination_reason == EliminationReason.TIMEOUT else "Wrong Answer"
+            elif game_state == GameState.ELIMINATED:
+                reason = "Timeout" if elimination_reason == EliminationReason.TIMEOUT else "Wrong Answer"
                 status_text = (
                     f"💀 **Game Over**\n\n"
-                    f"🚪 **Failed at Gate**: {player.current_gate}/100\n"
+                    f"🚪 **Failed at Gate**: {current_gate}/100\n"
                     f"❌ **Reason**: {reason}\n\n"
                     f"Use `/start` to try again! 🔄"
                 )
@@ -146,7 +329,7 @@ class TelegramBot:
                 status_text = (
                     f"🏆 **Congratulations!**\n\n"
                     f"You've completed all 100 gates!\n"
-                    f"🎉 **Completed**: {player.completed_at.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+                    f"🎉 **Completed**: {(player.completed_at or clock.now()).strftime('%Y-%m-%d %H:%M:%S')}\n\n"
                     f"You're a winner! 🎊"
                 )
             
@@ -158,9 +341,10 @@ class TelegramBot:
         finally:
             db.close()
     
+    @instrument_handler
     async def leaderboard_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /leaderboard command"""
-        db = next(get_db())
+        db = next(get_read_db())
         try:
             leaderboard = get_leaderboard(db, limit=10)
             
@@ -176,6 +360,7 @@ class TelegramBot:
                 leaderboard_text += f"{i}. {status_emoji} @{username} - Gate {player.current_gate}/100\n"
             
             leaderboard_text += "\nUse `/start` to join the competition! 🚀"
+            self.leaderboard_text = leaderboard_text
             
             await update.message.reply_text(leaderboard_text, parse_mode='Markdown')
             
@@ -185,6 +370,7 @@ class TelegramBot:
         finally:
             db.close()
     
+    @instrument_handler
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle button callbacks (answer selections)"""
         query = update.callback_query
@@ -193,64 +379,16 @@ class TelegramBot:
         telegram_id = update.effective_user.id
         answer = query.data
         
-        db = next(get_db())
+        await wait_for_capacity()
         try:
-            player = get_player(db, telegram_id)
-            
-            if not player or player.game_state != GameState.ACTIVE:
-                await query.edit_message_text(
-                    "❌ Your game is not active. Use `/start` to begin!",
-                    parse_mode='Markdown'
-                )
-                return
-            
-            # Check if answer is correct
-            is_correct = check_answer(db, telegram_id, answer)
+            result = await self.submit_answer(telegram_id, answer)
             
-            if is_correct:
-                # Check if player completed the game
-                updated_player = get_player(db, telegram_id)
-                if updated_player.game_state == GameState.COMPLETED:
-                    # WINNER!
-                    await query.edit_message_text(
-                        "🏆 **CONGRATULATIONS!** 🏆\n\n"
-                        "🎉 You've completed all 100 gates!\n"
-                        "💰 You've won 69% of the prize pool!\n\n"
-                        "You are the first winner of 100 Gates to Freedom!\n"
-                        "Contact admin for your prize! 🎊",
-                        parse_mode='Markdown'
-                    )
-                else:
-                    # Get next question
-                    next_question = get_question(db, updated_player.current_gate)
-                    if next_question:
-                        question_text = (
-                            f"✅ **Gate {player.current_gate} Unlocked!**\n\n"
-                            f"🚪 **Gate {updated_player.current_gate} of 100**\n\n"
-                            f"❓ {next_question.question_text}"
-                        )
-                        
-                        keyboard = self.create_answer_keyboard()
-                        await query.edit_message_text(
-                            question_text,
-                            reply_markup=keyboard,
-                            parse_mode='Markdown'
-                        )
-                    else:
-                        await query.edit_message_text(
-                            "❌ Error loading next question. Please contact admin.",
-                            parse_mode='Markdown'
-                        )
+            if result is not None and result.outcome == AnswerResult.CORRECT:
+                next_question = question_cache.get_by_id(result.next_question_id) if result.next_gate else None
+                order = option_order(result.player_id, result.attempt_id, result.next_gate) if result.next_gate else 0
+                await self.send_next_question(query, result.gate, result.next_gate, next_question, order)
             else:
-                # Wrong answer - player eliminated
-                reason = "Wrong Answer"
-                await query.edit_message_text(
-                    f"❌ **Wrong Answer!**\n\n"
-                    f"💀 You've been eliminated at Gate {player.current_gate}.\n"
-                    f"🔙 Back to Gate 1 you go!\n\n"
-                    f"Use `/start` to try again! 🔄",
-                    parse_mode='Markdown'
-                )
+                await query.edit_message_text(self.answer_reply_text(result), parse_mode='Markdown')
                 
         except Exception as e:
             logger.error(f"Error in callback handler: {e}")
@@ -258,11 +396,153 @@ class TelegramBot:
                 "❌ An error occurred. Please try again.",
                 parse_mode='Markdown'
             )
+    
+    @instrument_handler
+    async def handle_poll_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle answers to quiz polls (GATE_DELIVERY=quiz_poll)"""
+        poll_answer = update.poll_answer
+        telegram_id = poll_answer.user.id
+        
+        # Retracted votes and answers to polls of earlier gates or runs are ignored
+        if not poll_answer.option_ids or not self.polls.claim(poll_answer.poll_id, telegram_id):
+            return
+        
+        await wait_for_capacity()
+        try:
+            result = await self.submit_answer(telegram_id, LETTERS[poll_answer.option_ids[0]])
+            
+            if result is not None and result.outcome == AnswerResult.CORRECT:
+                next_question = question_cache.get_by_id(result.next_question_id) if result.next_gate else None
+                if next_question:
+                    order = option_order(result.player_id, result.attempt_id, result.next_gate)
+                    await self.send_quiz_poll(context.bot, telegram_id, result.next_gate, next_question, order,
+                                              unlocked_gate=result.gate)
+                    return
+                await context.bot.send_message(telegram_id, "❌ Error loading next question. Please contact admin.")
+            else:
+                # The quiz itself already showed whether the answer was right
+                await context.bot.send_message(telegram_id, self.answer_reply_text(result), parse_mode='Markdown')
+                
+        except Exception as e:
+            logger.error(f"Error in poll answer handler: {e}")
+            await context.bot.send_message(telegram_id, "❌ An error occurred. Please try again.")
+    
+    async def submit_answer(self, telegram_id: int, answer: str) -> Optional[AnswerResult]:
+        """Check an answer, given as the letter shown, against the player's run
+
+        Returns None when the player has no active run.
+        """
+        hot_state = get_hot_state()
+        if hot_state:
+            # Served from hot game state, without database round-trips
+            return await hot_state.answer(telegram_id, answer)
+        
+        db = next(get_db())
+        try:
+            player = get_player(db, telegram_id)
+            if not player or player.game_state != GameState.ACTIVE:
+                return None
+            
+            answered_gate = player.current_gate
+            
+            # Check if answer is correct
+            if not check_answer(db, telegram_id, answer):
+                # Wrong answer - player eliminated
+                return AnswerResult(AnswerResult.WRONG, answered_gate)
+            
+            # Check if player completed the game
+            updated_player = get_player(db, telegram_id)
+            if updated_player.game_state == GameState.COMPLETED:
+                return AnswerResult(AnswerResult.COMPLETED, answered_gate)
+            
+            # The next question picked for this run
+            game = get_active_game(db, updated_player.id)
+            result = AnswerResult(AnswerResult.CORRECT, answered_gate, updated_player.current_gate)
+            result.player_id = updated_player.id
+            if game:
+                result.attempt_id = game.attempt_id
+                result.next_question_id = game.question_id
+            return result
         finally:
             db.close()
     
+    def answer_reply_text(self, result: Optional[AnswerResult]) -> str:
+        """Reply to an answer that did not move the player on to another gate"""
+        if result is None:
+            return self.NOT_ACTIVE_TEXT
+        if result.outcome == AnswerResult.COMPLETED:
+            return self.WINNER_TEXT
+        if result.outcome == AnswerResult.TIMEOUT:
+            return self.timeout_text(result.gate)
+        return self.wrong_answer_text(result.gate)
+    
+    NOT_ACTIVE_TEXT = "❌ Your game is not active. Use `/start` to begin!"
+    
+    WINNER_TEXT = (
+        "🏆 **CONGRATULATIONS!** 🏆\n\n"
+        "🎉 You've completed all 100 gates!\n"
+        "💰 You've won 69% of the prize pool!\n\n"
+        "You are the first winner of 100 Gates to Freedom!\n"
+        "Contact admin for your prize! 🎊"
+    )
+    
+    @staticmethod
+    def wrong_answer_text(gate: int) -> str:
+        return (
+            f"❌ **Wrong Answer!**\n\n"
+            f"💀 You've been eliminated at Gate {gate}.\n"
+            f"🔙 Back to Gate 1 you go!\n\n"
+            f"Use `/start` to try again! 🔄"
+        )
+    
+    @staticmethod
+    def timeout_text(gate: int) -> str:
+        return (
+            f"⏱ **Time's Up!**\n\n"
+            f"💀 You've been eliminated at Gate {gate}.\n"
+            f"🔙 Back to Gate 1 you go!\n\n"
+            f"Use `/start` to try again! 🔄"
+        )
+    
+    async def send_next_question(self, query, unlocked_gate: int, gate: Optional[int], question, order: int = 0):
+        """Edit the message to show the next gate's question with its options in ``order``"""
+        if not question:
+            await query.edit_message_text(
+                "❌ Error loading next question. Please contact admin.",
+                parse_mode='Markdown'
+            )
+            return
+        
+        question_text = (
+            f"✅ **Gate {unlocked_gate} Unlocked!**\n\n"
+            f"🚪 **Gate {gate} of 100**\n\n"
+            f"{question_cache.render(question, order)}"
+        )
+        
+        keyboard = self.create_answer_keyboard()
+        await query.edit_message_text(
+            question_text,
+            reply_markup=keyboard,
+            parse_mode='Markdown'
+        )
+    
+    async def send_quiz_poll(self, bot, telegram_id: int, gate: int, question, order: int,
+                             unlocked_gate: Optional[int] = None):
+        """Send a gate as a quiz poll; Telegram shows the countdown and closes it at the deadline"""
+        header = f"✅ Gate {unlocked_gate} Unlocked! " if unlocked_gate else ""
+        message = await bot.send_poll(
+            telegram_id,
+            f"{header}Gate {gate}/100: {question.question_text}"[:PollLimit.MAX_QUESTION_LENGTH],
+            [option[:PollLimit.MAX_OPTION_LENGTH] for option in shown_options(question, order)],
+            is_anonymous=False,
+            type=Poll.QUIZ,
+            correct_option_id=OPTION_ORDERS[order].index(LETTERS.index(question.correct_answer)),
+            open_period=settings.question_timeout,
+        )
+        self.polls.add(message.poll.id, telegram_id)
+    
     def create_answer_keyboard(self) -> InlineKeyboardMarkup:
-        """Create inline keyboard with answer options"""
+        """Create inline keyboard with answer options; letters are positions in the shown order"""
         keyboard = [
             [
                 InlineKeyboardButton("A", callback_data="A"),
@@ -275,39 +555,85 @@ class TelegramBot:
     
     async def check_timeouts(self):
         """Background task to check for expired games"""
+        hot_state = get_hot_state()
         while True:
             try:
-                db = next(get_db())
-                expired_games = db.query(Game).filter(
-                    Game.status == GameStatus.ACTIVE,
-                    Game.timeout_at < datetime.utcnow()
-                ).all()
-                
-                for game in expired_games:
-                    # Eliminate player due to timeout
-                    player = get_player(db, game.player_id)
-                    if player and player.game_state == GameState.ACTIVE:
-                        eliminate_player(db, game.player_id, EliminationReason.TIMEOUT)
-                        
-                        # Update game status
-                        game.status = GameStatus.FAILED
-                        db.commit()
-                        
-                        # Send timeout message (this would need to be implemented with bot context)
-                        logger.info(f"Player {player.telegram_id} timed out at gate {player.current_gate}")
-                
-                db.close()
+                if hot_state:
+                    # Deadlines of live runs are only current in the hot state
+                    for run in await hot_state.expire_due():
+                        logger.info(f"Player {run.telegram_id} timed out at gate {run.gate}")
+                else:
+                    db = next(get_db())
+                    try:
+                        for player in expire_timed_out_games(db):
+                            # Send timeout message (this would need to be implemented with bot context)
+                            logger.info(f"Player {player.telegram_id} timed out at gate {player.current_gate}")
+                    finally:
+                        db.close()
                 
             except Exception as e:
                 logger.error(f"Error in timeout checker: {e}")
             
-            # Check every 5 seconds
-            await asyncio.sleep(5)
+            await clock.sleep(settings.timeout_check_interval)
+    
+    async def start_state_writers(self):
+        """Reconcile the hot state with Postgres and start writing it behind; runs once per process"""
+        hot_state = get_hot_state()
+        if hot_state and self.hot_state_task is None:
+            # Rebuilds the timeout schedule, so it comes before any timeout check
+            await readiness.stage("timeout_schedule", hot_state.recover)
+            self.hot_state_task = asyncio.create_task(hot_state.run_flusher())
+        if settings.event_log_enabled and self.event_log_task is None:
+            self.event_log_task = asyncio.create_task(event_log.run_flusher())
+    
+    async def stop_state_writers(self, application=None):
+        """Stop the writers and persist what they still hold; call once no handler runs"""
+        for task in (self.hot_state_task, self.event_log_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self.hot_state_task = None
+        self.event_log_task = None
+        hot_state = get_hot_state()
+        try:
+            if hot_state:
+                # Persist every dirty run before the process exits
+                while await hot_state.flush():
+                    pass
+        finally:
+            while await event_log.flush():
+                pass
+    
+    async def start_background_jobs(self, application=None):
+        """Start the state writers and timeout checks; singleton jobs run on the elected leader only"""
+        await self.start_state_writers()
+        jobs = {"partition_maintenance": run_maintenance_loop}
+        if get_hot_state() is not None and settings.hot_state_backend == "memory":
+            # Each replica holds its own runs, so each expires them; the leader cannot see them
+            if self.local_timeout_task is None:
+                self.local_timeout_task = asyncio.create_task(self.check_timeouts())
+        else:
+            # Runs in Redis or Postgres are shared: one checker for all replicas
+            jobs["check_timeouts"] = self.check_timeouts
+        if self.leader_task is None:
+            self.leader_task = asyncio.create_task(get_leader_election().run(jobs))
+    
+    async def stop_background_jobs(self, application=None):
+        """Stop the singleton jobs and hand the leader lease over"""
+        for task in (self.local_timeout_task, self.leader_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self.local_timeout_task = None
+        self.leader_task = None
     
     def run(self):
         """Start the bot"""
-        # Start timeout checker in background
-        asyncio.create_task(self.check_timeouts())
+        # Start timeout checker and state writers once the event loop runs; the
+        # writers stop last, after the handlers, so nothing is left unwritten
+        self.application.post_init = self.start_background_jobs
+        self.application.post_stop = self.stop_background_jobs
+        self.application.post_shutdown = self.stop_state_writers
         
         # Start the bot
         self.application.run_polling()
@@ -0,0 +1,139 @@
+"""
+HTTPX request backend for the Bot API with latency, status code and connection pool metrics.
+
+Every call's time is split at the transport: waiting for a connection from
+the pool, opening a new one (TCP and TLS) when none was idle, and network
+time from sending the request to receiving the response headers. Comparing
+pool wait with network time shows whether TELEGRAM_CONNECTION_POOL_SIZE
+keeps up with the handlers' concurrency.
+
+Normal calls and ``getUpdates`` use separate pools, so a long poll never
+holds a connection the handlers need.
+"""
+
+import time
+
+import httpx
+from telegram.request import HTTPXRequest
+
+from app.config import settings
+from app.metrics import (
+    TELEGRAM_API_LATENCY, TELEGRAM_API_RESPONSES, TELEGRAM_POOL_WAIT,
+    TELEGRAM_CONNECT_TIME, TELEGRAM_NETWORK_TIME, TELEGRAM_CONNECTIONS
+)
+from app.tracing import span
+
+try:
+    import h2
+except ImportError:  # Optional dependency, only needed for TELEGRAM_HTTP_VERSION=2
+    h2 = None
+
+# Connection pools
+BOT_POOL = "bot"
+GET_UPDATES_POOL = "get_updates"
+
+
+class TracedTransport(httpx.AsyncHTTPTransport):
+    """Transport timing pool wait, connection setup and network time from httpcore trace events"""
+
+    def __init__(self, pool: str, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        api_method = request.url.path.rsplit("/", 1)[-1]
+        marks = {}
+
+        async def trace(event: str, info: dict):
+            # Awaited by the async transport; the first event after a connection is assigned ends the pool wait
+            if event == "connection.connect_tcp.started":
+                marks.setdefault("connect", time.perf_counter())
+            elif event.endswith(".send_request_headers.started"):
+                marks.setdefault("send", time.perf_counter())
+
+        request.extensions = {**request.extensions, "trace": trace}
+        start = time.perf_counter()
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            end = time.perf_counter()
+            connected = marks.get("connect")
+            sent = marks.get("send")
+            assigned = connected if connected is not None else sent
+            if assigned is not None:
+                TELEGRAM_POOL_WAIT.observe(assigned - start, pool=self.pool)
+                TELEGRAM_CONNECTIONS.inc(pool=self.pool, connection="new" if connected is not None else "reused")
+            if connected is not None and sent is not None:
+                TELEGRAM_CONNECT_TIME.observe(sent - connected, pool=self.pool)
+            if sent is not None:
+                TELEGRAM_NETWORK_TIME.observe(end - sent, method=api_method)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that records every outbound Bot API call"""
+
+    def __init__(self, pool: str = BOT_POOL, keepalive_expiry: float = 5.0, **kwargs):
+        # Read by _build_client, which HTTPXRequest.__init__ calls
+        self.pool = pool
+        self.keepalive_expiry = keepalive_expiry
+        super().__init__(**kwargs)
+
+    def _build_client(self) -> httpx.AsyncClient:
+        # HTTPXRequest builds its client from _client_kwargs; swap in a traced
+        # transport carrying the same pool limits and HTTP versions
+        kwargs = dict(self._client_kwargs)
+        limits = kwargs.pop("limits")
+        kwargs.pop("transport", None)
+        transport = TracedTransport(
+            self.pool,
+            http1=kwargs.pop("http1", True),
+            http2=kwargs.pop("http2", False),
+            limits=httpx.Limits(
+                max_connections=limits.max_connections,
+                max_keepalive_connections=limits.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+        return httpx.AsyncClient(transport=transport, **kwargs)
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        with span(f"telegram.{api_method}") as api_span:
+            try:
+                code, payload = await super().do_request(url, method, *args, **kwargs)
+            except Exception as e:
+                TELEGRAM_API_RESPONSES.inc(method=api_method, code=type(e).__name__)
+                if api_span is not None:
+                    api_span.attributes["error"] = type(e).__name__
+                raise
+            finally:
+                TELEGRAM_API_LATENCY.observe(time.perf_counter() - start, method=api_method)
+
+            TELEGRAM_API_RESPONSES.inc(method=api_method, code=code)
+            if api_span is not None:
+                api_span.attributes["status_code"] = code
+            return code, payload
+
+
+def build_request(pool: str = BOT_POOL) -> InstrumentedRequest:
+    """Request backend for one pool, configured from the TELEGRAM_* settings"""
+    http_version = settings.telegram_http_version
+    if http_version not in ("1.1", "2"):
+        raise ValueError(f"Unknown Telegram HTTP version: {http_version}")
+    if http_version == "2" and h2 is None:
+        raise RuntimeError("TELEGRAM_HTTP_VERSION=2 requires the 'h2' package (httpx[http2])")
+    pool_size = (
+        settings.telegram_get_updates_pool_size if pool == GET_UPDATES_POOL
+        else settings.telegram_connection_pool_size
+    )
+    return InstrumentedRequest(
+        pool=pool,
+        keepalive_expiry=settings.telegram_keepalive_seconds,
+        connection_pool_size=pool_size,
+        http_version=http_version,
+        connect_timeout=settings.telegram_connect_timeout,
+        read_timeout=settings.telegram_read_timeout,
+        write_timeout=settings.telegram_write_timeout,
+        pool_timeout=settings.telegram_pool_timeout,
+    )
@@ -0,0 +1,59 @@
+"""
+Test setup: settings for a throwaway SQLite database, and the repository
+importable as the ``app`` package whatever its checkout directory is called.
+"""
+
+import importlib.util
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("WEBHOOK_URL", "http://test")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'gates_test.db')}")
+
+if "app" not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        "app", os.path.join(ROOT, "__init__.py"), submodule_search_locations=[ROOT]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["app"] = module
+    spec.loader.exec_module(module)
+
+
+QUESTIONS = [
+    {
+        "gate_number": gate,
+        "question_text": f"Question {gate}",
+        "option_a": f"{gate} a",
+        "option_b": f"{gate} b",
+        "option_c": f"{gate} c",
+        "option_d": f"{gate} d",
+        "correct_answer": "ABCD"[gate % 4],
+    }
+    for gate in range(1, 6)
+]
+
+
+@pytest.fixture
+def db():
+    """Session on freshly created tables holding a few questions, loaded into the question cache"""
+    from app.database import Base, SessionLocal, engine
+    from app.models import Question
+    from app.question_cache import question_cache
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    session.add_all(Question(**question) for question in QUESTIONS)
+    session.commit()
+    question_cache.load(session)
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
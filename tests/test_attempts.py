@@ -0,0 +1,26 @@
+from app.attempts import MAX_GATE_TIME_MS, append_gate_times, pack_gate_times, unpack_gate_times
+
+
+def test_round_trip():
+    times = [0, 1, 250, 29999, MAX_GATE_TIME_MS]
+    assert unpack_gate_times(pack_gate_times(times)) == times
+
+
+def test_two_bytes_per_gate_little_endian():
+    assert pack_gate_times([1, 0x0203]) == b"\x01\x00\x03\x02"
+
+
+def test_times_are_clamped():
+    assert unpack_gate_times(pack_gate_times([-5, 70000, 12.7])) == [0, MAX_GATE_TIME_MS, 12]
+
+
+def test_append():
+    data = append_gate_times(None, [100])
+    data = append_gate_times(data, [200, 300])
+    assert unpack_gate_times(data) == [100, 200, 300]
+
+
+def test_empty():
+    assert unpack_gate_times(None) == []
+    assert unpack_gate_times(b"") == []
+    assert append_gate_times(b"", []) == b""
@@ -0,0 +1,38 @@
+"""Pool wait of TimedQueuePool counts waiting for a free connection, not opening one."""
+
+import sqlite3
+import threading
+import time
+
+from app.admission import admission
+from app.database import TimedQueuePool
+
+OPEN_SECONDS = 0.2
+HOLD_SECONDS = 0.2
+
+
+def slow_creator():
+    time.sleep(OPEN_SECONDS)
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+def test_opening_a_connection_is_not_waiting(monkeypatch):
+    waits = []
+    monkeypatch.setattr(admission, "observe_pool_wait", waits.append)
+    pool = TimedQueuePool(slow_creator, pool_size=1, max_overflow=0)
+
+    pool.connect().close()
+
+    assert waits[0] < OPEN_SECONDS / 2
+
+
+def test_waiting_for_a_checked_out_connection(monkeypatch):
+    waits = []
+    monkeypatch.setattr(admission, "observe_pool_wait", waits.append)
+    pool = TimedQueuePool(slow_creator, pool_size=1, max_overflow=0)
+    held = pool.connect()
+
+    threading.Timer(HOLD_SECONDS, held.close).start()
+    pool.connect().close()
+
+    assert waits[-1] >= HOLD_SECONDS * 0.8
@@ -0,0 +1,17 @@
+"""Deadline timestamps of the hot state, from the naive UTC and aware datetimes the database returns."""
+
+from datetime import datetime, timedelta, timezone
+
+from app.hot_state import from_timestamp, to_timestamp
+
+
+def test_naive_values_are_utc():
+    value = datetime(2026, 3, 1, 12, 0, 0)
+    assert to_timestamp(value) == datetime(2026, 3, 1, 12, tzinfo=timezone.utc).timestamp()
+    assert from_timestamp(to_timestamp(value)) == value
+
+
+def test_aware_values_are_converted_to_utc():
+    # 14:00 at UTC+2 is 12:00 UTC; replacing the zone would read it as 14:00 UTC
+    value = datetime(2026, 3, 1, 14, 0, 0, tzinfo=timezone(timedelta(hours=2)))
+    assert to_timestamp(value) == to_timestamp(datetime(2026, 3, 1, 12, 0, 0))
@@ -0,0 +1,54 @@
+from collections import Counter
+
+from app.lanes import ANSWER, LANES, NEW_GAME, READ, UpdateLanes, lane_of
+
+
+def fill(lanes: UpdateLanes, counts: dict):
+    for lane, count in counts.items():
+        lanes._queues[lane].extend(f"{lane}-{n}" for n in range(count))
+
+
+def test_lane_of_kind():
+    assert lane_of("answer") == ANSWER
+    assert lane_of("start") == NEW_GAME
+    assert lane_of("restart") == NEW_GAME
+    assert lane_of("leaderboard") == READ
+    assert lane_of("default") == READ
+
+
+def test_busy_lanes_share_turns_by_weight():
+    lanes = UpdateLanes()
+    lanes.weights = {ANSWER: 8, NEW_GAME: 2, READ: 1}
+    fill(lanes, {lane: 1000 for lane in LANES})
+
+    taken = Counter(lanes._take().split("-")[0] for _ in range(110))
+
+    assert taken == {ANSWER: 80, NEW_GAME: 20, READ: 10}
+
+
+def test_turns_are_interleaved():
+    lanes = UpdateLanes()
+    lanes.weights = {ANSWER: 8, NEW_GAME: 2, READ: 1}
+    fill(lanes, {lane: 100 for lane in LANES})
+
+    first_round = [lanes._take().split("-")[0] for _ in range(11)]
+
+    # One round of 11 turns, with the other lanes' turns spread between answers
+    assert Counter(first_round) == {ANSWER: 8, NEW_GAME: 2, READ: 1}
+    assert first_round[0] == ANSWER
+    assert all(ANSWER in pair for pair in zip(first_round, first_round[1:]))
+
+
+def test_idle_lane_does_not_hold_turns():
+    lanes = UpdateLanes()
+    lanes.weights = {ANSWER: 8, NEW_GAME: 2, READ: 1}
+    fill(lanes, {READ: 5})
+
+    assert [lanes._take() for _ in range(5)] == [f"read-{n}" for n in range(5)]
+
+
+def test_each_lane_is_fifo():
+    lanes = UpdateLanes()
+    fill(lanes, {ANSWER: 3})
+
+    assert [lanes._take() for _ in range(3)] == ["answer-0", "answer-1", "answer-2"]
@@ -0,0 +1,84 @@
+"""Schema migrations bring a database created before attempts and question pools up to the models."""
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from app.attempts import unpack_gate_times
+from app.database import Base, engine
+from app.migrations import run_migrations
+
+# Tables as created before games.attempt_id and the question pools
+LEGACY_SCHEMA = [
+    "CREATE TABLE players (id INTEGER PRIMARY KEY, telegram_id INTEGER NOT NULL UNIQUE, username VARCHAR, "
+    "current_gate INTEGER, game_state VARCHAR(10), elimination_reason VARCHAR(12), start_time DATETIME, "
+    "last_activity DATETIME, completed_at DATETIME)",
+    "CREATE TABLE questions (id INTEGER PRIMARY KEY, gate_number INTEGER NOT NULL UNIQUE, "
+    "question_text TEXT NOT NULL, option_a VARCHAR NOT NULL, option_b VARCHAR NOT NULL, "
+    "option_c VARCHAR NOT NULL, option_d VARCHAR NOT NULL, correct_answer VARCHAR(1) NOT NULL)",
+    "CREATE TABLE games (id INTEGER PRIMARY KEY, player_id INTEGER NOT NULL REFERENCES players (id), "
+    "gate_number INTEGER NOT NULL, question_id INTEGER NOT NULL REFERENCES questions (id), "
+    "start_time DATETIME, timeout_at DATETIME NOT NULL, status VARCHAR(9))",
+    "INSERT INTO players (id, telegram_id, current_gate, game_state, elimination_reason) VALUES "
+    "(1, 1001, 3, 'ACTIVE', NULL), (2, 1002, 1, 'ELIMINATED', 'WRONG_ANSWER')",
+    "INSERT INTO questions VALUES (1, 1, 'Q1', 'a', 'b', 'c', 'd', 'A'), (2, 2, 'Q2', 'a', 'b', 'c', 'd', 'B'), "
+    "(3, 3, 'Q3', 'a', 'b', 'c', 'd', 'C')",
+    # Player 1 failed gate 2, restarted and is on gate 3; player 2 failed gate 1
+    "INSERT INTO games (id, player_id, gate_number, question_id, start_time, timeout_at, status) VALUES "
+    "(1, 1, 1, 1, '2026-01-01 10:00:00', '2026-01-01 10:00:30', 'COMPLETED'), "
+    "(2, 1, 2, 2, '2026-01-01 10:00:04', '2026-01-01 10:00:34', 'FAILED'), "
+    "(3, 1, 1, 1, '2026-01-01 11:00:00', '2026-01-01 11:00:30', 'COMPLETED'), "
+    "(4, 1, 2, 2, '2026-01-01 11:00:02', '2026-01-01 11:00:32', 'COMPLETED'), "
+    "(5, 1, 3, 3, '2026-01-01 11:00:05', '2026-01-01 11:00:35', 'ACTIVE'), "
+    "(6, 2, 1, 1, '2026-01-01 12:00:00', '2026-01-01 12:00:30', 'FAILED')",
+]
+
+
+def test_legacy_schema_migrates_once():
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+    try:
+        Base.metadata.create_all(bind=engine)
+        applied = run_migrations()
+
+        assert "games.attempt_id" in applied
+        assert "uq_games_player_id" in applied
+        assert "uq_questions_gate_text" in applied
+        with engine.connect() as conn:
+            attempts = conn.execute(text(
+                "SELECT id, player_id, final_gate, outcome, elimination_reason, gate_times FROM attempts ORDER BY id"
+            )).all()
+            live = conn.execute(text("SELECT id, attempt_id FROM games")).all()
+            # A second question for gate 1 fits the pool; a duplicate of its text does not
+            conn.execute(text("INSERT INTO questions VALUES (4, 1, 'Q1b', 'a', 'b', 'c', 'd', 'D')"))
+            assert conn.execute(text("SELECT count(*) FROM questions")).scalar() == 4
+            with pytest.raises(IntegrityError):
+                conn.execute(text("INSERT INTO questions VALUES (5, 1, 'Q1b', 'a', 'b', 'c', 'd', 'D')"))
+        by_outcome = {(row.player_id, row.outcome): row for row in attempts}
+        assert len(attempts) == 3
+        failed = by_outcome[(1, "ELIMINATED")]
+        assert (failed.final_gate, failed.elimination_reason) == (2, None)
+        assert unpack_gate_times(failed.gate_times) == [4000]
+        active = by_outcome[(1, "ACTIVE")]
+        assert active.final_gate == 3
+        assert unpack_gate_times(active.gate_times) == [2000, 3000]
+        assert live == [(5, active.id)]
+        eliminated = by_outcome[(2, "ELIMINATED")]
+        assert eliminated.elimination_reason == "WRONG_ANSWER"
+        assert unpack_gate_times(eliminated.gate_times) == []
+
+        unique = inspect(engine).get_unique_constraints("questions")
+        assert [c["column_names"] for c in unique] == [["gate_number", "question_text"]]
+
+        assert run_migrations() == []
+    finally:
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_new_database_needs_no_migration():
+    Base.metadata.create_all(bind=engine)
+    try:
+        assert run_migrations() == []
+    finally:
+        Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,53 @@
+"""Question file validation reports every bad row with its number instead of stopping at the first."""
+
+import io
+import json
+
+import pytest
+
+from app.question_bank import FIELDS, QuestionImportError, import_questions, read_rows, validate_rows
+
+QUESTION = {
+    "gate_number": 1,
+    "question_text": "Question",
+    "option_a": "a",
+    "option_b": "b",
+    "option_c": "c",
+    "option_d": "d",
+    "correct_answer": "b",
+}
+
+
+def errors(text: str, fmt: str):
+    with pytest.raises(QuestionImportError) as raised:
+        validate_rows(read_rows(io.StringIO(text), fmt))
+    return dict(raised.value.errors)
+
+
+def test_jsonl_bad_lines_are_listed():
+    lines = [
+        json.dumps(QUESTION),
+        "{not json",
+        json.dumps([1, 2]),
+        json.dumps({"gate_number": 2}),
+        json.dumps({**QUESTION, "correct_answer": "E"}),
+    ]
+    found = errors("\n".join(lines) + "\n", "jsonl")
+
+    assert sorted(found) == [2, 3, 4, 5]
+    assert found[2].startswith("invalid JSON")
+    assert "got list" in found[3]
+    assert found[4].startswith("missing question_text")
+
+
+def test_csv_bad_rows_are_listed():
+    values = [str(QUESTION[field]) for field in FIELDS]
+    lines = [",".join(FIELDS), ",".join(values), ",".join(values + ["extra"]), ",".join(values[:3])]
+    found = errors("\n".join(lines) + "\n", "csv")
+
+    assert found == {3: "more columns than the header", 4: "missing option_b, option_c, option_d, correct_answer"}
+
+
+def test_valid_file_validates():
+    text = json.dumps(QUESTION) + "\n\n" + json.dumps({**QUESTION, "gate_number": 2}) + "\n"
+    assert import_questions(io.StringIO(text), "jsonl", dry_run=True) == 2
@@ -0,0 +1,41 @@
+from app.question_cache import LETTERS, OPTION_ORDERS, option_order, pool_index, to_original, to_shown
+
+
+def test_there_are_24_orders():
+    assert len(OPTION_ORDERS) == 24
+    assert len(set(OPTION_ORDERS)) == 24
+
+
+def test_to_original_inverts_to_shown():
+    for order in range(len(OPTION_ORDERS)):
+        for letter in LETTERS:
+            assert to_original(to_shown(letter, order), order) == letter
+
+
+def test_to_original_is_a_permutation():
+    for order in range(len(OPTION_ORDERS)):
+        assert sorted(to_original(letter, order) for letter in LETTERS) == list(LETTERS)
+
+
+def test_to_original_normalizes_and_passes_through_unknown_letters():
+    order = 5
+    assert to_original(" b ", order) == to_original("B", order)
+    assert to_original("E", order) == "E"
+    assert to_original("AB", order) == "AB"
+
+
+def test_option_order_is_stable_per_run():
+    assert option_order(7, 11, 3) == option_order(7, 11, 3)
+    assert 0 <= option_order(7, 11, 3) < len(OPTION_ORDERS)
+
+
+def test_option_order_varies_between_runs_and_gates():
+    orders = {option_order(player, attempt, gate) for player in range(20) for attempt in range(20) for gate in range(1, 6)}
+    # 2000 runs and gates over 24 orders: every order should come up
+    assert len(orders) == len(OPTION_ORDERS)
+
+
+def test_pool_index_in_range():
+    for pool_size in (1, 2, 7):
+        indexes = {pool_index(player, 1, 4, pool_size) for player in range(200)}
+        assert indexes == set(range(pool_size))
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from app import rate_limit
+from app.rate_limit import ALLOWED, DROPPED, THROTTLED, MemoryRateLimiter
+
+
+class FakeMonotonic:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeMonotonic()
+    monkeypatch.setattr(rate_limit.time, "monotonic", fake)
+    monkeypatch.setattr(rate_limit.settings, "rate_limits", {"start": [3, 60], "default": [20, 60]})
+    return fake
+
+
+def check(limiter, user_id=1, kind="start"):
+    return asyncio.run(limiter.check(user_id, kind))
+
+
+def test_burst_then_throttle_once_then_drop(clock):
+    limiter = MemoryRateLimiter()
+    assert [check(limiter) for _ in range(3)] == [ALLOWED] * 3
+    assert check(limiter) == THROTTLED
+    assert check(limiter) == DROPPED
+    assert check(limiter) == DROPPED
+
+
+def test_refills_evenly(clock):
+    limiter = MemoryRateLimiter()
+    for _ in range(3):
+        check(limiter)
+    assert check(limiter) == THROTTLED
+
+    # 3 per 60 s: one token every 20 s
+    clock.now += 19.9
+    assert check(limiter) == DROPPED
+    clock.now += 0.2
+    assert check(limiter) == ALLOWED
+    # Allowed again, so the next rejection is answered once more
+    assert check(limiter) == THROTTLED
+
+
+def test_buckets_are_per_user_and_kind(clock):
+    limiter = MemoryRateLimiter()
+    for _ in range(3):
+        check(limiter, user_id=1)
+    assert check(limiter, user_id=1) == THROTTLED
+    assert check(limiter, user_id=2) == ALLOWED
+    assert check(limiter, user_id=1, kind="default") == ALLOWED
+
+
+def test_unknown_kind_uses_default_budget(clock):
+    limiter = MemoryRateLimiter()
+    assert [check(limiter, kind="made_up") for _ in range(20)] == [ALLOWED] * 20
+    assert check(limiter, kind="made_up") == THROTTLED
+
+
+def test_no_budget_means_unlimited(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit.settings, "rate_limits", {})
+    limiter = MemoryRateLimiter()
+    assert all(check(limiter) == ALLOWED for _ in range(100))
@@ -0,0 +1,68 @@
+"""SQL statement budgets of the answer path, so query-count regressions fail tests."""
+
+from datetime import timedelta
+
+import pytest
+
+from app.clock import clock
+from app.crud import check_answer, expire_timed_out_games, get_active_game, start_new_game
+from app.instrumentation import StatementBudgetExceeded, assert_max_statements
+from app.models import Game
+from app.question_cache import option_order, to_shown
+
+TELEGRAM_ID = 1001
+
+# Statements check_answer issues on SQLite today; raise only with a reason
+CORRECT_ANSWER_BUDGET = 9
+WRONG_ANSWER_BUDGET = 10
+# Expiring runs costs the same statements however many runs expire
+EXPIRE_BUDGET = 4
+EXPIRED_RUNS = 5
+
+
+def buttons(db, player):
+    """(correct, wrong) button letters for the player's current gate"""
+    game = get_active_game(db, player.id)
+    order = option_order(player.id, game.attempt_id, game.gate_number)
+    correct = game.question.correct_answer
+    wrong = next(letter for letter in "ABCD" if letter != correct)
+    return to_shown(correct, order), to_shown(wrong, order)
+
+
+def test_correct_answer_within_budget(db):
+    player = start_new_game(db, TELEGRAM_ID, "player")
+    correct, _ = buttons(db, player)
+    db.expire_all()
+
+    with assert_max_statements(CORRECT_ANSWER_BUDGET, "check_answer"):
+        assert check_answer(db, TELEGRAM_ID, correct)
+    assert player.current_gate == 2
+
+
+def test_wrong_answer_within_budget(db):
+    player = start_new_game(db, TELEGRAM_ID, "player")
+    _, wrong = buttons(db, player)
+    db.expire_all()
+
+    with assert_max_statements(WRONG_ANSWER_BUDGET, "check_answer"):
+        assert not check_answer(db, TELEGRAM_ID, wrong)
+
+
+def test_expire_timed_out_games_within_budget(db):
+    for offset in range(EXPIRED_RUNS):
+        start_new_game(db, TELEGRAM_ID + offset, "player")
+    db.query(Game).update({Game.timeout_at: clock.now() - timedelta(seconds=1)})
+    db.commit()
+    db.expire_all()
+
+    with assert_max_statements(EXPIRE_BUDGET, "expire_timed_out_games"):
+        assert len(expire_timed_out_games(db)) == EXPIRED_RUNS
+
+
+def test_budget_overrun_fails(db):
+    start_new_game(db, TELEGRAM_ID, "player")
+    db.expire_all()
+
+    with pytest.raises(StatementBudgetExceeded, match="check_answer issued"):
+        with assert_max_statements(1, "check_answer"):
+            check_answer(db, TELEGRAM_ID, "A")
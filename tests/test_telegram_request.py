@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+from app.metrics import TELEGRAM_CONNECTIONS, TELEGRAM_NETWORK_TIME, TELEGRAM_POOL_WAIT
+from app.telegram_request import BOT_POOL, build_request
+
+BODY = json.dumps({"ok": True, "result": True}).encode()
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Minimal keep-alive HTTP/1.1 server answering every request with BODY"""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.decode().split("\r\n"):
+                name, _, value = line.partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(BODY)}\r\n\r\n".encode() + BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def call_twice():
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    request = build_request()
+    await request.initialize()
+    try:
+        results = [
+            await request.do_request(f"http://127.0.0.1:{port}/bot123:TEST/getMe", "POST")
+            for _ in range(2)
+        ]
+    finally:
+        await request.shutdown()
+        server.close()
+        await server.wait_closed()
+    return results
+
+
+def test_calls_go_through_the_traced_transport():
+    new_before = TELEGRAM_CONNECTIONS.value(pool=BOT_POOL, connection="new")
+    reused_before = TELEGRAM_CONNECTIONS.value(pool=BOT_POOL, connection="reused")
+
+    results = asyncio.run(call_twice())
+
+    assert [code for code, _ in results] == [200, 200]
+    assert json.loads(results[0][1]) == {"ok": True, "result": True}
+    # The first call opens a connection, the second reuses it
+    assert TELEGRAM_CONNECTIONS.value(pool=BOT_POOL, connection="new") == new_before + 1
+    assert TELEGRAM_CONNECTIONS.value(pool=BOT_POOL, connection="reused") == reused_before + 1
+    assert TELEGRAM_POOL_WAIT.quantile(1.0, pool=BOT_POOL) is not None
+    assert TELEGRAM_NETWORK_TIME.quantile(1.0, method="getMe") is not None
@@ -0,0 +1,246 @@
+"""
+Per-update tracing from webhook receipt to DB queries and Bot API replies.
+
+A trace is started for every webhook update and the active span is kept in a
+context variable, so handlers, crud queries and outbound Bot API calls made
+while processing the update attach their spans to it without any explicit
+plumbing. Finished traces are sampled (a fixed fraction plus every trace
+slower than a threshold) and exported as NDJSON to a file or a collector.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    __slots__ = (
+        "trace", "span_id", "parent_id", "name", "start_time",
+        "start", "end", "attributes"
+    )
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str] = None, start: Optional[float] = None, **attributes):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = start if start is not None else time.perf_counter()
+        # Wall-clock start, derived from the monotonic start so both stay consistent
+        self.start_time = time.time() - (time.perf_counter() - self.start)
+        self.end: Optional[float] = None
+        self.attributes = attributes
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def finish(self, end: Optional[float] = None):
+        self.end = end if end is not None else time.perf_counter()
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """All spans recorded while processing one update"""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        # perf_counter value when the update was parsed and handed off for processing
+        self.received_at: Optional[float] = None
+        # The root span's block plus hand-offs still processing the update; the last to end exports
+        self.holds = 1
+
+    def new_span(self, name: str, parent_id: Optional[str] = None, start: Optional[float] = None, **attributes) -> Span:
+        span = Span(self, name, parent_id, start, **attributes)
+        self.spans.append(span)
+        return span
+
+
+class NdjsonExporter:
+    """Write finished traces from a background thread so handlers never block on I/O"""
+
+    def __init__(self, path: Optional[str] = None, collector_url: Optional[str] = None, max_queue: int = 10000):
+        self.path = path
+        self.collector_url = collector_url
+        self._queue: "queue.Queue[List[dict]]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: List[dict]):
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning("Trace export queue full, dropping trace")
+
+    def _run(self):
+        client = httpx.Client(timeout=5.0) if self.collector_url else None
+        while True:
+            batch = [self._queue.get()]
+            # Drain whatever else is waiting into the same write
+            while len(batch) < 100:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            payload = "".join(json.dumps(span) + "\n" for spans in batch for span in spans)
+            try:
+                if self.path:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(payload)
+                if client:
+                    client.post(
+                        self.collector_url,
+                        content=payload,
+                        headers={"Content-Type": "application/x-ndjson"}
+                    )
+            except Exception as e:
+                logger.warning(f"Failed to export traces: {e}")
+
+
+# Span new spans attach to while processing an update
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+_exporter: Optional[NdjsonExporter] = None
+
+
+def configure_tracing():
+    """Create the exporter from settings; tracing stays a no-op without one"""
+    global _exporter
+    if _exporter is not None:
+        return
+    if not (settings.trace_export_path or settings.trace_collector_url):
+        return
+
+    if settings.trace_export_path:
+        directory = os.path.dirname(settings.trace_export_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    _exporter = NdjsonExporter(settings.trace_export_path, settings.trace_collector_url)
+    logger.info("Update tracing enabled")
+
+
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    """Open the root span of an update and export the trace when it ends"""
+    if _exporter is None:
+        yield None
+        return
+
+    trace = Trace()
+    root = trace.new_span(name, **attributes)
+    token = current_span.set(root)
+    try:
+        yield root
+    finally:
+        current_span.reset(token)
+        _release(trace)
+
+
+def hold_trace() -> Callable[[], None]:
+    """Keep the current trace open for work handed off to another task; call the result when it is done"""
+    parent = current_span.get()
+    if parent is None:
+        return lambda: None
+    trace = parent.trace
+    trace.holds += 1
+    return lambda: _release(trace)
+
+
+def _release(trace: Trace):
+    trace.holds -= 1
+    if trace.holds == 0:
+        root = trace.spans[0]
+        root.finish()
+        _maybe_export(trace, root)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record a child of the current span; does nothing outside a trace"""
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = parent.trace.new_span(name, parent.span_id, **attributes)
+    token = current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.finish()
+        current_span.reset(token)
+
+
+def record_span(name: str, start: float, end: float, **attributes) -> Optional[Span]:
+    """Record an already measured interval (perf_counter values) under the current span"""
+    parent = current_span.get()
+    if parent is None:
+        return None
+    child = parent.trace.new_span(name, parent.span_id, start, **attributes)
+    child.finish(end)
+    return child
+
+
+def mark_received():
+    """Mark the end of webhook receipt; the gap until the handler starts is queue wait"""
+    parent = current_span.get()
+    if parent is not None:
+        parent.trace.received_at = time.perf_counter()
+
+
+def record_queue_wait():
+    """Record the queue wait span once, when the first handler for the update starts"""
+    parent = current_span.get()
+    if parent is None or parent.trace.received_at is None:
+        return
+    record_span("queue_wait", parent.trace.received_at, time.perf_counter())
+    parent.trace.received_at = None
+
+
+def start_child_span(name: str, **attributes) -> Optional[Span]:
+    """Start a child span that is finished explicitly, for callback-style hooks"""
+    parent = current_span.get()
+    if parent is None:
+        return None
+    return parent.trace.new_span(name, parent.span_id, **attributes)
+
+
+def _maybe_export(trace: Trace, root: Span):
+    # Keep a random sample plus every slow trace, so tail outliers are never lost
+    slow = root.duration_ms >= settings.trace_slow_threshold_ms
+    if not slow and random.random() >= settings.trace_sample_rate:
+        return
+    for s in trace.spans:
+        if s.end is None:
+            s.finish()
+    _exporter.export([s.to_dict() for s in trace.spans])
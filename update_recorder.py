@@ -0,0 +1,113 @@
+"""
+Capture raw webhook updates to compressed, rotating NDJSON files.
+
+Each line is ``{"t": <arrival unix time>, "update": <raw update JSON>}``.
+Files are named ``updates-<UTC timestamp>.ndjson.gz`` inside the capture
+directory and rotate by size; the oldest are removed beyond the file limit.
+Writing happens on a background thread so the webhook only enqueues.
+"""
+
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_PATTERN = "updates-*.ndjson.gz"
+
+
+class UpdateRecorder:
+    def __init__(self, directory: str, max_bytes: int, max_files: int, max_queue: int = 100000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+        self._queue: "queue.Queue[Tuple[float, dict]]" = queue.Queue(maxsize=max_queue)
+        self._file: Optional[gzip.GzipFile] = None
+        self._raw = None
+        self._thread = threading.Thread(target=self._run, name="update-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, update_data: dict, arrived_at: Optional[float] = None):
+        try:
+            self._queue.put_nowait((arrived_at or time.time(), update_data))
+        except queue.Full:
+            logger.warning("Update capture queue full, dropping update")
+
+    def _open_new_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._raw.close()
+        name = f"updates-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}.ndjson.gz"
+        self._raw = open(os.path.join(self.directory, name), "wb")
+        self._file = gzip.GzipFile(fileobj=self._raw, mode="wb")
+
+        # Drop the oldest captures beyond the retention limit
+        captures = sorted(glob.glob(os.path.join(self.directory, CAPTURE_PATTERN)))
+        for old in captures[:-self.max_files]:
+            os.remove(old)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                if self._file is None or self._raw.tell() >= self.max_bytes:
+                    self._open_new_file()
+                for arrived_at, update_data in batch:
+                    self._file.write((json.dumps({"t": arrived_at, "update": update_data}) + "\n").encode())
+                # Flush each batch so a crash loses at most the batch in flight
+                self._file.flush()
+            except Exception as e:
+                logger.warning(f"Failed to write update capture: {e}")
+
+
+def read_captures(paths: List[str]) -> Iterator[Tuple[float, dict]]:
+    """Yield (arrival time, update) from capture files or directories, in arrival order"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, CAPTURE_PATTERN))))
+        else:
+            files.append(path)
+
+    for path in files:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        yield entry["t"], entry["update"]
+            except EOFError:
+                # The capture currently being written has no gzip trailer yet
+                continue
+
+
+recorder: Optional[UpdateRecorder] = None
+
+
+def get_recorder() -> Optional[UpdateRecorder]:
+    """Get the recorder when capture is enabled in settings"""
+    global recorder
+    if recorder is None and settings.update_capture_dir:
+        recorder = UpdateRecorder(
+            settings.update_capture_dir,
+            settings.update_capture_max_mb * 1024 * 1024,
+            settings.update_capture_max_files
+        )
+        logger.info(f"Recording webhook updates to {settings.update_capture_dir}")
+    return recorder
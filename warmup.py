@@ -0,0 +1,107 @@
+"""
+Warm start: pay the cold-start costs before taking traffic.
+
+After a restart the first players would otherwise wait for new database
+connections, the first question bank query, rendering every question and
+TLS handshakes to the Bot API. Startup runs these as named stages:
+
+- ``timeout_schedule``: live runs and their deadlines loaded into the hot
+  state (only with HOT_STATE_BACKEND);
+- ``database_pool``: WARMUP_DB_CONNECTIONS connections opened at once and
+  returned to the pool;
+- ``question_bank``: every question loaded into the cache and, with
+  WARMUP_RENDER_QUESTIONS, rendered in every option order;
+- ``telegram_pool``: WARMUP_TELEGRAM_CONNECTIONS concurrent getMe calls, so
+  that many connections to the Bot API are open.
+
+``readiness`` records how long each stage took and whether it failed. The
+/ready endpoint answers 200 once warm-up has finished with the required
+stages done, and 503 before that, after a required stage failed, and while
+draining; /health stays a liveness check.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+from app.database import engine
+from app.metrics import WARMUP_STAGE_SECONDS
+from app.question_cache import question_cache
+
+logger = logging.getLogger(__name__)
+
+# Stages without which the process should not take traffic
+REQUIRED_STAGES = ("question_bank",)
+
+
+class Readiness:
+    def __init__(self):
+        # stage -> {"ok": bool, "seconds": float, "error": str or None}
+        self.stages: Dict[str, dict] = {}
+        self.finished = False
+
+    async def stage(self, name: str, function: Callable, *args) -> Optional[Any]:
+        """Run one warm-up stage, sync functions in a thread; failures are recorded, not raised"""
+        started = time.perf_counter()
+        result = None
+        error = None
+        try:
+            if asyncio.iscoroutinefunction(function):
+                result = await function(*args)
+            else:
+                result = await asyncio.to_thread(function, *args)
+        except Exception as e:
+            error = str(e)
+            logger.warning(f"Warm-up stage {name} failed: {e}")
+        seconds = time.perf_counter() - started
+        WARMUP_STAGE_SECONDS.set(seconds, stage=name)
+        self.stages[name] = {"ok": error is None, "seconds": round(seconds, 3), "error": error}
+        return result
+
+    def finish(self):
+        self.finished = True
+        logger.info(f"Warm-up finished: {self.report()}")
+
+    @property
+    def ready(self) -> bool:
+        return self.finished and all(
+            self.stages.get(name, {}).get("ok", False) for name in REQUIRED_STAGES
+        )
+
+    def report(self) -> dict:
+        return {name: dict(stage) for name, stage in self.stages.items()}
+
+
+def open_database_connections(count: Optional[int] = None) -> int:
+    """Open ``count`` pool connections at once, then return them all to the pool"""
+    count = settings.warmup_db_connections if count is None else count
+    connections = []
+    try:
+        for _ in range(count):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.exec_driver_sql("SELECT 1")
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def load_question_bank() -> int:
+    """Load the question cache and pre-render the question messages"""
+    question_cache.load()
+    if settings.warmup_render_questions:
+        return question_cache.prerender()
+    return 0
+
+
+async def prime_telegram_connections(bot, count: Optional[int] = None):
+    """Open up to ``count`` Bot API connections with concurrent getMe calls"""
+    count = settings.warmup_telegram_connections if count is None else count
+    await asyncio.gather(*(bot.get_me() for _ in range(count)))
+
+
+# Global readiness instance
+readiness = Readiness()